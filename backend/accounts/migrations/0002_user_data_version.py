@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Incremented on every expense or recurring expense write'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recurring_version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Incremented on every recurring expense write'),
+        ),
+    ]
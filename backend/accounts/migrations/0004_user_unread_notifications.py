@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_recurring_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0, help_text='Number of unread notifications, kept in step by Notification writes'),
+        ),
+    ]
@@ -76,6 +76,18 @@ class User(AbstractUser):
         blank=True,
         help_text='Password reset token expiration'
     )
+    data_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Incremented on every expense or recurring expense write'
+    )
+    recurring_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Incremented on every recurring expense write'
+    )
+    unread_notifications = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of unread notifications, kept in step by Notification writes'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -88,9 +100,22 @@ class User(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
 
+    # Incremented in place with F() by other writers; a full save of an
+    # instance loaded earlier must not write back the stale value
+    COUNTER_FIELDS = ('data_version', 'recurring_version', 'unread_notifications')
+
     def __str__(self):
         return f"{self.username} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        """Save every field except the counters, unless they are named."""
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def full_name(self):
         """Return the user's full name."""
@@ -17,7 +17,8 @@ from .serializers import (
     UserSettingsSerializer,
     ChangePasswordSerializer
 )
-from expenses.models import Expense
+from expenses.models import DailyCategoryTotal
+from expenses.caching import cached_report, etag_for_data_version, today_extra
 
 
 # ============================================================
@@ -116,6 +117,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    @etag_for_data_version('profile', extra=lambda request: [request.user.updated_at])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 # ============================================================
 # ✅ CHANGE PASSWORD
@@ -225,23 +230,37 @@ def user_settings(request):
 # ============================================================
 # ✅ BUDGET MANAGEMENT DASHBOARD
 # ============================================================
+def budget_extra(request):
+    """Budget payload also depends on today and the user's settings."""
+    return today_extra(request) + [request.user.updated_at]
+
+
 class BudgetManagementView(generics.GenericAPIView):
     """
     View for getting and updating user's budget statistics
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @etag_for_data_version('budget', extra=budget_extra)
     def get(self, request):
         user = request.user
         today = timezone.now().date()
+
+        return Response(cached_report(
+            request, 'budget', lambda: self.build_budget(user, today),
+            extra=budget_extra(request)
+        ))
+
+    def build_budget(self, user, today):
+        """Compute the budget dashboard payload for ``user``."""
         month_start = today.replace(day=1)
 
         # Monthly expense calculation
-        current_month_expenses = Expense.objects.filter(
+        current_month_expenses = DailyCategoryTotal.objects.filter(
             user=user,
             date__gte=month_start,
             date__lte=today
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        ).aggregate(amount_sum=Sum('total'))['amount_sum'] or 0
 
         monthly_budget = user.monthly_budget
         budget_remaining = monthly_budget - current_month_expenses
@@ -256,7 +275,7 @@ class BudgetManagementView(generics.GenericAPIView):
         is_alert_threshold_reached = budget_percentage >= alert_threshold
         is_budget_exceeded = current_month_expenses > monthly_budget
 
-        return Response({
+        return {
             'monthly_budget': float(monthly_budget),  # ✅ Add top-level field for compatibility
             'user': {
                 'id': user.id,
@@ -285,7 +304,7 @@ class BudgetManagementView(generics.GenericAPIView):
                 'is_budget_exceeded': is_budget_exceeded,
                 'alert_threshold': alert_threshold,
             }
-        })
+        }
 
     def put(self, request):
         user = request.user
@@ -0,0 +1,133 @@
+"""
+Logging helpers wired up by ``LOGGING`` in settings.
+
+``QueueStreamHandler`` puts records on an in-memory queue and a background
+``QueueListener`` thread writes them out, so a logging call in a request
+never waits on stdout/stderr. ``RequestSamplingMiddleware`` decides once
+per request whether its DEBUG/INFO records are kept (``LOG_SAMPLE_RATE``),
+and ``RequestSampleFilter`` applies that decision; warnings and errors are
+always kept.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from django.conf import settings
+
+_sampled = contextvars.ContextVar('log_sampled', default=True)
+
+
+def request_sampled():
+    """Whether DEBUG/INFO records of the current request are kept."""
+    return _sampled.get()
+
+
+def debug_enabled(logger):
+    """
+    Whether a DEBUG record on ``logger`` would be kept; check it before
+    computing values (such as query counts) that exist only to be logged.
+    """
+    return logger.isEnabledFor(logging.DEBUG) and request_sampled()
+
+
+class RequestSamplingMiddleware:
+    """Sample each request's DEBUG/INFO logging at ``LOG_SAMPLE_RATE``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _sampled.set(random.random() < settings.LOG_SAMPLE_RATE)
+        try:
+            return self.get_response(request)
+        finally:
+            _sampled.reset(token)
+
+
+class RequestSampleFilter(logging.Filter):
+    """Drop DEBUG/INFO records of requests that were not sampled."""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or request_sampled()
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Write records to ``stream`` (default stderr) from a background thread.
+
+    The writer thread is started by the first record a process logs, and
+    again in a forked child (a fork does not copy threads), each time with
+    a fresh queue. The queue holds at most ``queue_size`` records; when the
+    writer falls that far behind, new records are dropped and counted in
+    ``dropped`` rather than blocking the caller. The count is logged as a
+    warning once the queue has room again, and when the handler stops.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(None)
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self.unreported = 0
+        self.listener = None
+        self.pid = None
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # Records are formatted by the writer thread
+        self.target.setFormatter(fmt)
+
+    def start(self):
+        """Start this process's writer thread if it is not running."""
+        # Called under the handler lock, which logging resets after a fork
+        if self.pid != os.getpid():
+            self.queue = queue.Queue(self.queue_size)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def prepare(self, record):
+        # Render the message and traceback now: args may change, and
+        # exc_info cannot be used once the frames are gone
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def dropped_record(self):
+        """A warning record reporting the records dropped since the last one."""
+        return logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.WARNING,
+            'levelname': logging.getLevelName(logging.WARNING),
+            'msg': f'Dropped {self.unreported} log records: the log queue was full',
+        })
+
+    def enqueue(self, record):
+        self.start()
+        try:
+            if self.unreported:
+                self.queue.put_nowait(self.dropped_record())
+                self.unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self.unreported += 1
+
+    def stop(self):
+        """Write out the queued records and the drop count, and stop the writer thread."""
+        if self.listener is not None and self.pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+        if self.unreported:
+            self.target.handle(self.dropped_record())
+            self.unreported = 0
+
+    def close(self):
+        self.stop()
+        super().close()
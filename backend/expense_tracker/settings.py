@@ -5,6 +5,7 @@ Django settings for expense_tracker project.
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'expense_tracker.logs.RequestSamplingMiddleware',
 ]
 
 ROOT_URLCONF = 'expense_tracker.urls'
@@ -81,6 +83,28 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory by default; set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache (with CACHE_LOCATION
+# pointing at a directory) to share entries between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='expense-tracker'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    }
+}
+
+# Cache alias and TTL (seconds) for per-user report responses
+REPORT_CACHE_ALIAS = 'default'
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=600, cast=int)
+
+# How long (seconds) a stored Idempotency-Key response is replayed
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -175,8 +199,45 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Only for development
 
+# Logging: app loggers write through a background queue (see expense_tracker/logs.py)
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+# Fraction of requests whose DEBUG/INFO records are kept; warnings always are
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=1.0, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_sample': {
+            '()': 'expense_tracker.logs.RequestSampleFilter',
+        },
+    },
+    'formatters': {
+        'standard': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'expense_tracker.logs.QueueStreamHandler',
+            'formatter': 'standard',
+            'filters': ['request_sample'],
+        },
+    },
+    'loggers': {
+        app: {
+            'handlers': ['queue'],
+            'level': config(f'{app.upper()}_LOG_LEVEL', default=LOG_LEVEL),
+            'propagate': False,
+        }
+        for app in ('accounts', 'expenses', 'notifications')
+    },
+}
+
 # Security settings for production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -0,0 +1,274 @@
+"""
+Aggregation helpers for expense analytics.
+
+Each helper takes a ``DailyCategoryTotal`` queryset (already filtered to a
+user and any date range) and builds its figures from grouped or
+conditional aggregates (``GROUP BY`` / ``FILTER`` / ``CASE WHEN``), so a
+whole dashboard or report is answered by one or two queries whose cost
+scales with days x categories rather than with the number of expenses.
+"""
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from django.db.models import Count, Sum, Min, Max, Q
+from django.db.models.functions import Trunc
+from .models import Expense
+
+# Supported trend granularities mapped to the length of one bucket
+TREND_STEPS = {
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+    'quarter': relativedelta(months=3),
+    'year': relativedelta(years=1),
+}
+
+# Hard cap on the number of buckets a single trend request may ask for
+MAX_TREND_PERIODS = 366
+
+
+def category_aggregates(field='total', prefix='category_'):
+    """Return one conditional ``Sum`` per category, keyed ``<prefix><value>``."""
+    return {
+        f'{prefix}{value}': Sum(field, filter=Q(category=value))
+        for value, _ in Expense.CATEGORY_CHOICES
+    }
+
+
+def expense_stats(totals, today):
+    """
+    Compute totals, period windows and the category breakdown from the
+    rollup rows in ``totals`` in one query.
+
+    Returns a dict in the shape expected by ``ExpenseStatsSerializer``
+    (without ``recent_expenses``, which the caller fetches separately).
+    """
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    aggregates = {
+        'total_amount': Sum('total'),
+        'total_count': Sum('count'),
+        'today_total': Sum('total', filter=Q(date=today)),
+        'week_total': Sum('total', filter=Q(date__gte=week_start)),
+        'month_total': Sum('total', filter=Q(date__gte=month_start)),
+    }
+    aggregates.update(category_aggregates())
+    row = totals.aggregate(**aggregates)
+
+    category_breakdown = {}
+    for value, label in Expense.CATEGORY_CHOICES:
+        category_total = row[f'category_{value}'] or 0
+        if category_total > 0:
+            category_breakdown[label] = float(category_total)
+
+    return {
+        'total_expenses': row['total_amount'] or 0,
+        'total_count': row['total_count'] or 0,
+        'today_expenses': row['today_total'] or 0,
+        'this_week_expenses': row['week_total'] or 0,
+        'this_month_expenses': row['month_total'] or 0,
+        'category_breakdown': category_breakdown,
+    }
+
+
+def category_totals(totals):
+    """
+    Group rollup rows by category in one pass.
+
+    Returns a dict keyed by category value with ``total``, ``count``,
+    ``first_date`` and ``last_date`` for each category present.
+    """
+    rows = totals.filter(count__gt=0).order_by().values('category').annotate(
+        amount_sum=Sum('total'),
+        expense_count=Sum('count'),
+        first_date=Min('date'),
+        last_date=Max('date'),
+    )
+    return {
+        row['category']: {
+            'total': row['amount_sum'],
+            'count': row['expense_count'],
+            'first_date': row['first_date'],
+            'last_date': row['last_date'],
+        }
+        for row in rows
+    }
+
+
+def bucket_start(day, granularity):
+    """Return the first day of the ``granularity`` bucket containing ``day``."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def period_totals(totals, granularity, first, periods):
+    """
+    Return ``[(bucket_start, total), ...]`` for ``periods`` consecutive
+    buckets starting at ``first``, oldest first.
+
+    All buckets come from one ``Trunc``-grouped query; empty buckets are
+    filled with 0 in Python.
+    """
+    step = TREND_STEPS[granularity]
+    starts = [first + step * i for i in range(periods)]
+    end = first + step * periods
+
+    rows = totals.filter(date__gte=first, date__lt=end).order_by().annotate(
+        bucket=Trunc('date', granularity)
+    ).values('bucket').annotate(amount_sum=Sum('total'))
+    by_bucket = {row['bucket']: row['amount_sum'] for row in rows}
+
+    return [(start, by_bucket.get(start) or 0) for start in starts]
+
+
+def monthly_totals(totals, first_month, months):
+    """Return ``period_totals`` for ``months`` calendar months."""
+    return period_totals(totals, 'month', first_month, months)
+
+
+def month_summaries(totals, before=None, limit=None):
+    """
+    Return ``[{'month', 'amount_sum', 'expense_count'}, ...]`` for every
+    month with expenses, newest first, from one ``Trunc``-grouped query.
+
+    ``before`` (a month start) skips that month and later ones, so the
+    months can be paged; ``limit`` caps the number returned. Totals are
+    exact ``Decimal`` sums.
+
+    ``totals`` may also be an ``Expense`` queryset, for filters the daily
+    rollups cannot answer (full-text search); its rows are summed directly.
+    """
+    if before is not None:
+        totals = totals.filter(date__lt=before)
+    if totals.model is Expense:
+        aggregates = {'amount_sum': Sum('amount'), 'expense_count': Count('id')}
+    else:
+        aggregates = {'amount_sum': Sum('total'), 'expense_count': Sum('count')}
+    rows = totals.order_by().annotate(month=Trunc('date', 'month')).values('month').annotate(
+        **aggregates
+    ).order_by('-month')
+    if limit is not None:
+        rows = rows[:limit]
+    return list(rows)
+
+
+def period_label(start, granularity):
+    """Return a display label for the bucket starting at ``start``."""
+    if granularity == 'year':
+        return start.strftime('%Y')
+    if granularity == 'quarter':
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    if granularity == 'month':
+        return start.strftime('%b %Y')
+    return start.strftime('%d %b %Y')
+
+
+def spending_trend(totals, today, granularity, periods):
+    """
+    Build trend data for the ``periods`` buckets ending with the one that
+    contains ``today``, oldest first.
+    """
+    periods = max(1, min(periods, MAX_TREND_PERIODS))
+    first = bucket_start(today, granularity) - TREND_STEPS[granularity] * (periods - 1)
+
+    return [
+        {
+            'period': period_label(start, granularity),
+            'amount': float(total),
+            'date': start.isoformat()
+        }
+        for start, total in period_totals(totals, granularity, first, periods)
+    ]
+
+
+def _summarise(by_category):
+    """Return ``(total_amount, total_count)`` across grouped category rows."""
+    total_amount = sum((row['total'] for row in by_category.values()), 0)
+    total_count = sum(row['count'] for row in by_category.values())
+    return total_amount, total_count
+
+
+def _percentage(amount, total):
+    return (float(amount) / float(total)) * 100 if total > 0 else 0
+
+
+def expense_report(totals, today, months=6):
+    """
+    Build the ``ReportsView`` payload from one grouped category pass and
+    one month-bucketed pass over the last ``months`` calendar months.
+    """
+    by_category = category_totals(totals)
+    total_expenses, total_count = _summarise(by_category)
+
+    # Daily average over the span of recorded expenses
+    daily_average = 0
+    if by_category:
+        min_date = min(row['first_date'] for row in by_category.values())
+        max_date = max(row['last_date'] for row in by_category.values())
+        days = (max_date - min_date).days + 1
+        daily_average = total_expenses / days if days > 0 else 0
+
+    # Category breakdown
+    category_breakdown = {}
+    for value, label in Expense.CATEGORY_CHOICES:
+        category_total = by_category.get(value, {}).get('total') or 0
+        if category_total > 0:
+            category_breakdown[label] = {
+                'amount': float(category_total),
+                'percentage': _percentage(category_total, total_expenses)
+            }
+
+    # Top category
+    top_category = None
+    if category_breakdown:
+        name, data = max(category_breakdown.items(), key=lambda x: x[1]['amount'])
+        top_category = {'name': name, 'amount': data['amount']}
+
+    # Monthly trend, oldest to newest
+    first_month = today.replace(day=1) - relativedelta(months=months - 1)
+    monthly_trend = [
+        {'month': month.strftime('%b %Y'), 'amount': float(total)}
+        for month, total in monthly_totals(totals, first_month, months)
+    ]
+
+    return {
+        'total_expenses': float(total_expenses),
+        'total_count': total_count,
+        'daily_average': float(daily_average),
+        'category_breakdown': category_breakdown,
+        'top_category': top_category,
+        'monthly_trend': monthly_trend,
+    }
+
+
+def category_summary(totals):
+    """Build the ``CategorySummaryView`` payload from one grouped pass."""
+    by_category = category_totals(totals)
+    total_amount, _ = _summarise(by_category)
+
+    category_data = []
+    for value, label in Expense.CATEGORY_CHOICES:
+        row = by_category.get(value)
+        if row and row['total'] > 0:
+            category_data.append({
+                'category': label,
+                'amount': float(row['total']),
+                'percentage': _percentage(row['total'], total_amount),
+                'count': row['count']
+            })
+
+    # Sort by amount descending
+    category_data.sort(key=lambda x: x['amount'], reverse=True)
+
+    return {
+        'category_data': category_data,
+        'total_amount': float(total_amount),
+        'total_categories': len(category_data)
+    }
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """Re-create search triggers a SQLite table rebuild may have dropped."""
+    from django.db import connections
+    from .search import install_search_index
+
+    install_search_index(connections[using])
 
 
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'expenses'
\ No newline at end of file
+    name = 'expenses'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_index, sender=self)
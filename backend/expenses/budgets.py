@@ -0,0 +1,78 @@
+"""
+Budget alerts raised as expenses are written.
+
+Every expense write updates the owner's MonthlySpend row for the month
+(see ``rollups``); when the current month's total goes up, the new total
+is compared with the user's ``monthly_budget`` and ``alert_threshold``. A
+Notification is created the first time in a month that spending reaches
+the threshold and the first time it exceeds the budget. The month's
+``alert_level`` is raised with a conditional UPDATE, so concurrent writes
+crossing the same threshold still send one notification.
+"""
+import logging
+from django.utils import timezone
+from .formatting import format_amount
+from .models import MonthlySpend, Notification
+
+logger = logging.getLogger(__name__)
+
+
+def current_month():
+    """First day of the current month."""
+    return timezone.now().date().replace(day=1)
+
+
+def alert_level(total, user):
+    """The MonthlySpend alert level ``total`` reaches for ``user``'s budget."""
+    budget = user.monthly_budget
+    if not user.enable_alerts or budget <= 0:
+        return MonthlySpend.ALERT_NONE
+    if total > budget:
+        return MonthlySpend.ALERT_EXCEEDED
+    if total * 100 >= budget * user.alert_threshold:
+        return MonthlySpend.ALERT_THRESHOLD
+    return MonthlySpend.ALERT_NONE
+
+
+def budget_notification(spend, level):
+    """Build the unsaved Notification for ``spend`` reaching ``level``."""
+    user = spend.user
+    spent = format_amount(spend.total, user.currency)
+    budget = format_amount(user.monthly_budget, user.currency)
+    month = spend.month.strftime('%B %Y')
+    if level == MonthlySpend.ALERT_EXCEEDED:
+        return Notification(
+            user=user, type='budget_exceeded', title='Monthly budget exceeded',
+            message=f'You have spent {spent} in {month}, over your budget of {budget}.'
+        )
+    percentage = spend.total * 100 / user.monthly_budget
+    return Notification(
+        user=user, type='budget_alert', title='Budget alert',
+        message=f'You have spent {spent} in {month}, {percentage:.0f}% of your budget of {budget}.'
+    )
+
+
+def check_budgets(user_ids, month):
+    """
+    Notify the users in ``user_ids`` whose ``month`` spending crossed a
+    threshold they have not been alerted about this month. Call it in the
+    transaction that incremented their MonthlySpend rows.
+    """
+    if not user_ids:
+        return
+
+    # The rows were just incremented, and so locked, by this transaction,
+    # so even a plain read sees the totals of concurrent writers
+    rows = MonthlySpend.objects.filter(user_id__in=user_ids, month=month).select_related('user').only(
+        'total', 'alert_level', 'month', 'user__monthly_budget', 'user__alert_threshold',
+        'user__enable_alerts', 'user__currency'
+    )
+    for spend in rows:
+        level = alert_level(spend.total, spend.user)
+        if level <= spend.alert_level:
+            continue
+        # Only the write that raises the level sends the notification
+        claimed = MonthlySpend.objects.filter(pk=spend.pk, alert_level__lt=level).update(alert_level=level)
+        if claimed:
+            budget_notification(spend, level).save()
+            logger.info('Budget alert level %d for user %s in %s', level, spend.user_id, month)
@@ -0,0 +1,122 @@
+"""
+Per-user response caching for read-heavy endpoints.
+
+Every Expense or RecurringExpense write bumps ``User.data_version``, and a
+RecurringExpense write bumps ``User.recurring_version`` too, for payloads
+that depend on the recurring rules only. Cache keys and ETags embed one of
+the versions, so a write makes all of the user's cached reports
+unreachable at once and stale entries simply age out of the cache backend
+(LRU culling / TTL, see ``CACHES`` in settings).
+"""
+import functools
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def bump_data_version(user_ids, recurring=False):
+    """
+    Increment the data version of every user in ``user_ids``, and their
+    recurring version too for ``recurring`` (RecurringExpense) writes.
+
+    Call it at the start of the write's transaction, before inserting rows
+    that reference the users: the UPDATE then takes the users rows'
+    exclusive lock before any foreign key check takes a shared one.
+    """
+    from accounts.models import User
+
+    user_ids = set(user_ids)
+    if user_ids:
+        versions = {'data_version': F('data_version') + 1}
+        if recurring:
+            versions['recurring_version'] = F('recurring_version') + 1
+        User.objects.filter(pk__in=user_ids).update(**versions)
+
+
+def report_cache_key(user, name, params=(), extra=(), version=None):
+    """
+    Return the cache key for report ``name`` of ``user`` with ``params``, at
+    ``version`` (default the user's data version).
+    """
+    digest = hashlib.sha1(
+        json.dumps([sorted(params), list(extra)], default=str).encode()
+    ).hexdigest()
+    if version is None:
+        version = user.data_version
+    return f'report:{user.pk}:{version}:{name}:{digest}'
+
+
+def _query_params(request):
+    return [
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    ]
+
+
+def cached_report(request, name, build, extra=(), version=None):
+    """
+    Return the cached payload for report ``name``, building and storing it
+    with ``build()`` on a miss.
+
+    The key covers the user, their data version (or ``version``), the query
+    parameters and any ``extra`` values the payload depends on (such as
+    today's date).
+    """
+    cache = caches[settings.REPORT_CACHE_ALIAS]
+    key = report_cache_key(request.user, name, _query_params(request), extra, version)
+
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.REPORT_CACHE_TIMEOUT)
+    return data
+
+
+def data_etag(request, name, extra=()):
+    """Return a strong ETag for resource ``name`` at the user's data version."""
+    key = report_cache_key(request.user, name, _query_params(request), extra)
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def etag_for_data_version(name, extra=None):
+    """
+    Decorate a view method with ``If-None-Match`` handling.
+
+    The ETag is derived from the user's data version, the query parameters
+    and ``extra(request)``, so it is computed without touching the data.
+    A matching request gets ``304 Not Modified`` before the view runs.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = data_etag(request, name, extra(request) if extra else ())
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                for header, value in headers.items():
+                    response[header] = value
+            return response
+        return wrapper
+    return decorator
+
+
+def today_extra(request):
+    """ETag/cache ``extra`` for payloads that depend on today's date."""
+    return [timezone.now().date()]
+
+
+def currency_extra(request):
+    """ETag/cache ``extra`` for payloads with amounts formatted in the user's currency."""
+    return [request.user.currency]
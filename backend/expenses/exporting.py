@@ -0,0 +1,120 @@
+"""
+CSV and XLSX exports of expenses and report summaries.
+
+Expense rows are read in keyset batches (see ``iterate_keyset``), so an
+export never holds more than one batch of rows. CSV is streamed to the
+client a batch at a time; XLSX is written with openpyxl's write-only
+workbook, which spools rows to disk instead of building the sheet in
+memory, and the finished file is then streamed from disk.
+"""
+import csv
+import io
+import tempfile
+from django.utils import timezone
+from openpyxl import Workbook
+from .pagination import iterate_keyset
+
+# Rows fetched per keyset batch by the streaming export endpoints
+EXPORT_BATCH_SIZE = 1000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (model field, column heading) for expense exports
+EXPENSE_COLUMNS = (
+    ('id', 'ID'),
+    ('date', 'Date'),
+    ('title', 'Title'),
+    ('category', 'Category'),
+    ('amount', 'Amount'),
+    ('description', 'Description'),
+    ('created_at', 'Created at'),
+)
+
+
+def expense_rows(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Yield one tuple per expense, newest first, in EXPENSE_COLUMNS order."""
+    names = [name for name, _ in EXPENSE_COLUMNS]
+    queryset = queryset.only(*names)
+    for expense in iterate_keyset(queryset, batch_size=batch_size):
+        yield (
+            expense.id,
+            expense.date,
+            expense.title,
+            expense.category,
+            expense.amount,
+            expense.description or '',
+            timezone.localtime(expense.created_at).replace(tzinfo=None),
+        )
+
+
+def expense_header():
+    """Column headings; they are the names ``import_expenses`` reads back."""
+    return [heading for _, heading in EXPENSE_COLUMNS]
+
+
+def report_sections(report):
+    """
+    Flatten a ``ReportsView`` payload into ``(title, header, rows)``
+    sections, one per CSV block or XLSX sheet.
+    """
+    top = report.get('top_category') or {}
+    date_range = report.get('date_range') or {}
+    summary = [
+        ('Total expenses', report['total_expenses']),
+        ('Number of expenses', report['total_count']),
+        ('Daily average', round(report['daily_average'], 2)),
+        ('Top category', top.get('name', '')),
+        ('Top category amount', top.get('amount', '')),
+        ('From', date_range.get('start') or ''),
+        ('To', date_range.get('end') or ''),
+    ]
+    categories = [
+        (name, data['amount'], round(data['percentage'], 2))
+        for name, data in report['category_breakdown'].items()
+    ]
+    trend = [(row['month'], row['amount']) for row in report['monthly_trend']]
+    return [
+        ('Summary', ['Metric', 'Value'], summary),
+        ('Categories', ['Category', 'Amount', 'Percentage'], categories),
+        ('Monthly trend', ['Month', 'Amount'], trend),
+    ]
+
+
+def stream_csv(header, rows, batch_size=EXPORT_BATCH_SIZE):
+    """Yield CSV text for ``header`` and ``rows``, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_csv_sections(sections):
+    """Yield CSV text with each section as a titled block."""
+    for index, (title, header, rows) in enumerate(sections):
+        if index:
+            yield '\r\n'
+        yield from stream_csv([title], ())
+        yield from stream_csv(header, rows)
+
+
+def write_xlsx(sections):
+    """
+    Write ``(title, header, rows)`` sections to a new XLSX file, one sheet
+    each, in write-only mode. Returns the open temporary file, rewound.
+    """
+    workbook = Workbook(write_only=True)
+    for title, header, rows in sections:
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+
+    target = tempfile.TemporaryFile()
+    workbook.save(target)
+    target.seek(0)
+    return target
@@ -0,0 +1,99 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .models import Expense
+from .search import search_expenses
+
+
+class ExpenseFilterBackend(BaseFilterBackend):
+    """
+    Server-side expense filters.
+
+    ``category`` (repeat the parameter or comma-separate values),
+    ``min_amount``/``max_amount``, ``start_date``/``end_date`` (YYYY-MM-DD)
+    and ``title`` (case-insensitive substring). Every combination is served
+    by a range scan on one of the ``(user, ...)`` indexes on Expense.
+    ``search`` restricts to full-text matches without changing the order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        categories = [
+            value.strip()
+            for raw in params.getlist('category')
+            for value in raw.split(',') if value.strip()
+        ]
+        if categories:
+            valid = {value for value, _ in Expense.CATEGORY_CHOICES}
+            unknown = [value for value in categories if value not in valid]
+            if unknown:
+                raise ValidationError({'category': f"Unknown categories: {', '.join(unknown)}"})
+            queryset = queryset.filter(category__in=categories)
+
+        min_amount = self.parse(params, 'min_amount', Decimal, 'Use a number')
+        if min_amount is not None:
+            queryset = queryset.filter(amount__gte=min_amount)
+        max_amount = self.parse(params, 'max_amount', Decimal, 'Use a number')
+        if max_amount is not None:
+            queryset = queryset.filter(amount__lte=max_amount)
+
+        start_date = self.parse(params, 'start_date', self.parse_date, 'Use YYYY-MM-DD')
+        if start_date is not None:
+            queryset = queryset.filter(date__gte=start_date)
+        end_date = self.parse(params, 'end_date', self.parse_date, 'Use YYYY-MM-DD')
+        if end_date is not None:
+            queryset = queryset.filter(date__lte=end_date)
+
+        title = params.get('title', '').strip()
+        if title:
+            queryset = queryset.filter(title__icontains=title)
+
+        search = params.get('search', '').strip()
+        if search:
+            queryset = search_expenses(queryset, search)
+
+        return queryset
+
+    @staticmethod
+    def parse_date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    @staticmethod
+    def parse(params, name, convert, hint):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return convert(value)
+        except (ValueError, InvalidOperation):
+            raise ValidationError({name: f'Invalid {name} format. {hint}'})
+
+
+class ExpenseOrderingFilter(BaseFilterBackend):
+    """
+    ``?ordering=`` on amount or date, ascending or descending (``-``).
+
+    Each choice maps to a complete keyset ordering ending in ``id`` so
+    KeysetPagination can page through it.
+    """
+    ordering_param = 'ordering'
+    orderings = {
+        '-date': ('-date', '-created_at', '-id'),
+        'date': ('date', 'created_at', 'id'),
+        '-amount': ('-amount', '-id'),
+        'amount': ('amount', 'id'),
+    }
+    default_ordering = '-date'
+
+    def get_keyset_ordering(self, request, view=None):
+        choice = request.query_params.get(self.ordering_param, self.default_ordering)
+        if choice not in self.orderings:
+            raise ValidationError({
+                self.ordering_param: f"Invalid ordering. Use one of: {', '.join(self.orderings)}"
+            })
+        return self.orderings[choice]
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset.order_by(*self.get_keyset_ordering(request, view))
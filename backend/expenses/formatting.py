@@ -0,0 +1,62 @@
+"""
+Locale-free currency formatting.
+
+``locale.setlocale`` is slow and process-global, so amounts are formatted
+with small precompiled per-currency functions instead. Formatters are
+built once per currency and are safe to share between threads.
+"""
+from functools import lru_cache
+
+# Currency code -> (symbol, decimal places, digit grouping)
+CURRENCY_FORMATS = {
+    'INR': ('₹', 2, 'indian'),
+    'USD': ('$', 2, 'western'),
+    'EUR': ('€', 2, 'western'),
+    'GBP': ('£', 2, 'western'),
+    'CAD': ('C$', 2, 'western'),
+    'AUD': ('A$', 2, 'western'),
+    'JPY': ('¥', 0, 'western'),
+}
+DEFAULT_CURRENCY = 'INR'
+
+
+def _indian_grouping(whole):
+    """Group digits as 12,34,56,789 (lakh/crore style)."""
+    if len(whole) <= 3:
+        return whole
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ','.join(groups + [tail])
+
+
+@lru_cache(maxsize=None)
+def currency_formatter(currency):
+    """Return a function formatting an amount in ``currency``."""
+    symbol, places, grouping = CURRENCY_FORMATS.get(currency, CURRENCY_FORMATS[DEFAULT_CURRENCY])
+
+    if grouping == 'western':
+        template = f'{{sign}}{symbol}{{value:,.{places}f}}'
+
+        def format_western(amount):
+            return template.format(sign='-' if amount < 0 else '', value=abs(amount))
+        return format_western
+
+    spec = f'.{places}f'
+
+    def format_indian(amount):
+        whole, _, fraction = format(abs(amount), spec).partition('.')
+        text = f"{symbol}{_indian_grouping(whole)}"
+        if fraction:
+            text = f"{text}.{fraction}"
+        return f"-{text}" if amount < 0 else text
+    return format_indian
+
+
+def format_amount(amount, currency=DEFAULT_CURRENCY):
+    """Format ``amount`` in ``currency``, e.g. ``₹1,23,456.50``."""
+    return currency_formatter(currency)(amount)
@@ -0,0 +1,145 @@
+"""
+``Idempotency-Key`` support for create endpoints.
+
+A client that may retry a create (after a timeout or a dropped connection)
+sends a unique ``Idempotency-Key`` header with it. The first request with a
+key claims an IdempotencyKey row and stores its response in the same
+transaction as the write itself, so either both are committed or neither
+is. Retries with the same key and body get the stored response back without
+running the view again. Each attempt first locks the user's row, which
+the create's own writes lock anyway, so a retry that arrives while the
+first request is still running waits there until that request commits or
+rolls back, and concurrent duplicates are serialised by the database.
+Keys are kept for ``IDEMPOTENCY_KEY_TTL`` seconds.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+class _KeyTaken(Exception):
+    """Another request already holds the key."""
+
+
+def request_hash(request):
+    """Return a digest of the method, path and body of ``request``."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.path, data], sort_keys=True, cls=JSONEncoder
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def expiry_cutoff():
+    """Keys created before this time have expired."""
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def purge_expired_keys(batch_size=1000):
+    """Delete expired keys in batches. Returns the number deleted."""
+    cutoff = expiry_cutoff()
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+
+
+def replay(record, digest):
+    """Return the stored response for ``record``, or an error if the body differs."""
+    if record.request_hash != digest:
+        return Response(
+            {'error': f'{HEADER} has already been used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(
+        record.response_body,
+        status=record.status_code,
+        headers={'Idempotent-Replayed': 'true'}
+    )
+
+
+def idempotent(view_method):
+    """
+    Decorate a create view method so requests carrying an ``Idempotency-Key``
+    header run at most once per user and key.
+
+    Requests without the header are passed straight through. Responses with
+    a 5xx status and raised exceptions are not stored, so the request can be
+    retried with the same key.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be between 1 and {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = request_hash(request)
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    # Lock the owner before the key insert takes a shared
+                    # lock on it through the foreign key; upgrading that when
+                    # the view bumps the data version deadlocks with a
+                    # concurrent request holding the same shared lock
+                    list(
+                        get_user_model().objects.select_for_update()
+                        .filter(pk=request.user.pk).values_list('pk')
+                    )
+                    try:
+                        with transaction.atomic():
+                            record = IdempotencyKey.objects.create(
+                                user=request.user, key=key, request_hash=digest,
+                                status_code=0
+                            )
+                    except IntegrityError:
+                        raise _KeyTaken
+
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code >= 500:
+                        record.delete()
+                    else:
+                        record.status_code = response.status_code
+                        record.response_body = response.data
+                        record.save(update_fields=['status_code', 'response_body'])
+                    return response
+            except _KeyTaken:
+                pass
+
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                # The holder rolled back; claim the key again
+                continue
+            if record.created_at >= expiry_cutoff():
+                return replay(record, digest)
+            IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+
+        return Response(
+            {'error': f'A request with this {HEADER} is already in progress'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return wrapper
@@ -0,0 +1,120 @@
+"""
+Streaming CSV import of expenses.
+
+Rows are read one at a time, validated with ExpenseCreateSerializer's own
+field rules (``validate_amount``, ``validate_title`` and the model field
+validators) and written with ``bulk_create`` one batch at a time, so memory
+is bounded by the batch size whatever the size of the file. Invalid rows
+are skipped and reported by line number. If the file cannot be read past
+some point (bad encoding, malformed CSV), the rows before it are still
+imported and the result records where reading stopped, so a client knows
+what was committed instead of retrying the whole file.
+"""
+import csv
+from django.db import transaction
+from rest_framework import serializers
+from .models import Expense
+from .serializers import ExpenseCreateSerializer
+
+REQUIRED_COLUMNS = ('title', 'amount', 'date')
+OPTIONAL_COLUMNS = ('category', 'description')
+DEFAULT_BATCH_SIZE = 1000
+# Only the first errors are kept, so a bad file cannot exhaust memory
+MAX_REPORTED_ERRORS = 100
+
+
+class CSVImportError(Exception):
+    """The file cannot be imported at all (e.g. required columns are missing)."""
+
+
+class ImportResult:
+    """Counts and the first MAX_REPORTED_ERRORS row errors of an import."""
+
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+        # Set when the file could not be read to the end
+        self.failure = None
+        self.stopped_after_line = None
+
+    def fail(self, line, error):
+        self.failure = str(error)
+        self.stopped_after_line = line
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        data = {
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+        if self.failure is not None:
+            data['stopped_after_line'] = self.stopped_after_line
+        return data
+
+
+def read_rows(lines):
+    """
+    Yield ``(line_number, data)`` for each CSV record in ``lines``, with
+    ``data`` holding the non-empty known columns.
+    """
+    reader = csv.DictReader(lines)
+    header = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise CSVImportError(f"Missing required columns: {', '.join(missing)}")
+    reader.fieldnames = header
+
+    columns = REQUIRED_COLUMNS + tuple(name for name in OPTIONAL_COLUMNS if name in header)
+    for row in reader:
+        data = {}
+        for name in columns:
+            value = row.get(name)
+            if value is not None and value.strip():
+                data[name] = value.strip()
+        yield reader.line_num, data
+
+
+def import_expenses(user, lines, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    """
+    Import expenses for ``user`` from an iterable of CSV text lines.
+
+    Each batch is committed in its own transaction. ``on_batch(result)`` is
+    called after every batch. Returns an ImportResult; a decoding or CSV
+    error stops the import after the rows read so far are committed, and
+    is recorded with ``ImportResult.fail``.
+    """
+    validator = ExpenseCreateSerializer()
+    result = ImportResult()
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            Expense.objects.bulk_create(batch)
+        result.imported += len(batch)
+        batch.clear()
+        if on_batch:
+            on_batch(result)
+
+    line = 0
+    try:
+        for line, data in read_rows(lines):
+            try:
+                attrs = validator.run_validation(data)
+            except serializers.ValidationError as exc:
+                result.add_error(line, exc.detail)
+                continue
+            batch.append(Expense(user=user, **attrs))
+            if len(batch) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.fail(line, e)
+
+    if batch:
+        flush()
+    return result
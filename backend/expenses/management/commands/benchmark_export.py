@@ -0,0 +1,59 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import User
+from expenses.exporting import expense_header, expense_rows, stream_csv, write_xlsx
+from expenses.models import Expense
+
+
+class Command(BaseCommand):
+    """
+    Measure CSV and XLSX export throughput on N rows.
+
+    Rows are created inside a transaction that is rolled back afterwards.
+    """
+    help = 'Benchmark the streaming CSV and XLSX expense exports (rows/sec)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='benchmark-export', email='benchmark-export@example.com',
+                password=None
+            )
+            start = date.today()
+            Expense.objects.bulk_create(
+                [
+                    Expense(
+                        user=user, title=f'Expense {i}', amount=Decimal('12.50') + i % 500,
+                        category='food', date=start - timedelta(days=i % 730),
+                        description='Benchmark row'
+                    )
+                    for i in range(rows)
+                ],
+                batch_size=1000
+            )
+            expenses = Expense.objects.filter(user=user)
+
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in stream_csv(expense_header(), expense_rows(expenses)))
+            self.report('csv', rows, time.perf_counter() - started, size)
+
+            started = time.perf_counter()
+            with write_xlsx([('Expenses', expense_header(), expense_rows(expenses))]) as workbook:
+                size = workbook.seek(0, 2)
+            self.report('xlsx', rows, time.perf_counter() - started, size)
+
+            transaction.set_rollback(True)
+
+    def report(self, label, rows, elapsed, size):
+        self.stdout.write(
+            f'{label:>5}: {rows} rows in {elapsed:.3f}s '
+            f'({rows / elapsed:,.0f} rows/s, {size / 1024 / 1024:.1f} MiB)'
+        )
@@ -0,0 +1,98 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from expenses.models import Expense
+from expenses.serializers import ExpenseSerializer
+
+
+class LegacyExpenseSerializer(serializers.ModelSerializer):
+    """
+    The previous ExpenseSerializer: StringRelatedField owner, ``obj.user.id``
+    and ``locale.setlocale`` per row
+    """
+    user = serializers.StringRelatedField(read_only=True)
+    userId = serializers.SerializerMethodField()
+    formatted_amount = serializers.SerializerMethodField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+
+    class Meta:
+        model = Expense
+        fields = [
+            'id', 'user', 'userId', 'title', 'amount', 'category', 'date',
+            'description', 'formatted_amount', 'created_at', 'updated_at'
+        ]
+
+    def get_userId(self, obj):
+        return str(obj.user.id)
+
+    def get_formatted_amount(self, obj):
+        import locale
+        try:
+            locale.setlocale(locale.LC_ALL, 'en_IN.UTF-8')
+            return locale.currency(obj.amount, grouping=True, symbol='₹')
+        except Exception:
+            return f"₹{obj.amount:,.2f}"
+
+
+class Command(BaseCommand):
+    """
+    Time ExpenseSerializer against the legacy serializer on N rows.
+
+    Rows are created inside a transaction that is rolled back afterwards.
+    """
+    help = 'Benchmark expense list serialization before and after the fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='benchmark-serializer', email='benchmark-serializer@example.com',
+                password=None
+            )
+            start = date.today()
+            Expense.objects.bulk_create(
+                [
+                    Expense(
+                        user=user, title=f'Expense {i}', amount=Decimal('1234.50') + i,
+                        category='food', date=start - timedelta(days=i % 365),
+                        description='Benchmark row'
+                    )
+                    for i in range(rows)
+                ],
+                batch_size=1000
+            )
+
+            request = Request(APIRequestFactory().get('/api/expenses/'))
+            request.user = user
+
+            for label, serializer_class in (
+                ('before', LegacyExpenseSerializer),
+                ('after', ExpenseSerializer),
+            ):
+                expenses = list(Expense.objects.filter(user=user))
+                queries = []
+
+                def count_query(execute, sql, params, many, context):
+                    queries.append(sql)
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(count_query):
+                    started = time.perf_counter()
+                    serializer_class(expenses, many=True, context={'request': request}).data
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{label:>6}: {rows} rows in {elapsed:.3f}s '
+                    f'({rows / elapsed:,.0f} rows/s, {len(queries)} queries)'
+                )
+
+            transaction.set_rollback(True)
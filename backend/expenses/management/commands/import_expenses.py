@@ -0,0 +1,65 @@
+import csv
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from expenses.importing import DEFAULT_BATCH_SIZE, CSVImportError, import_expenses
+
+
+class Command(BaseCommand):
+    """
+    Import a CSV of expenses for one user, streaming it in batches
+    """
+    help = 'Import expenses from a CSV file (title, amount, date[, category, description])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or - for standard input')
+        parser.add_argument('--user', required=True, help='Id, email or username of the owner')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        started = time.perf_counter()
+
+        def report(result):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{result.imported} imported, {result.error_count} errors')
+
+        try:
+            if options['path'] == '-':
+                result = import_expenses(user, sys.stdin, options['batch_size'], on_batch=report)
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                    result = import_expenses(user, lines, options['batch_size'], on_batch=report)
+        except (OSError, UnicodeDecodeError, csv.Error, CSVImportError) as e:
+            raise CommandError(f'Could not import {options["path"]}: {e}')
+
+        for error in result.errors:
+            messages = '; '.join(
+                f'{field}: {" ".join(str(message) for message in messages)}'
+                for field, messages in error['errors'].items()
+            )
+            self.stderr.write(f'Line {error["line"]}: {messages}')
+        if result.error_count > len(result.errors):
+            self.stderr.write(f'... and {result.error_count - len(result.errors)} more errors')
+
+        if result.failure is not None:
+            raise CommandError(
+                f'Could not read {options["path"]} after line {result.stopped_after_line}: '
+                f'{result.failure} ({result.imported} expenses before it were imported)'
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} expenses for {user.email} in {elapsed:.1f}s '
+            f'({result.error_count} rows skipped)'
+        ))
+
+    def get_user(self, identifier):
+        lookup = {'pk': int(identifier)} if identifier.isdigit() else (
+            {'email': identifier} if '@' in identifier else {'username': identifier}
+        )
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f'No user matches {identifier}')
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from expenses.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    """
+    Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL
+    """
+    help = 'Delete expired Idempotency-Key records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} idempotency keys older than {settings.IDEMPOTENCY_KEY_TTL}s'
+        ))
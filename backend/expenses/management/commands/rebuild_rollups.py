@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from expenses.rollups import reconcile_user
+
+
+class Command(BaseCommand):
+    """
+    Reconcile DailyCategoryTotal rows with the expenses table
+    """
+    help = 'Rebuild the daily per-category expense rollup from raw expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild the given user id (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or User.objects.order_by('id').values_list('id', flat=True)
+
+        users = created = updated = deleted = 0
+        for user_id in user_ids:
+            c, u, d = reconcile_user(user_id)
+            users += 1
+            created += c
+            updated += u
+            deleted += d
+            if c or u or d:
+                self.stdout.write(f'User {user_id}: {c} created, {u} updated, {d} deleted')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {users} users: {created} created, {updated} updated, {deleted} deleted'
+        ))
@@ -0,0 +1,105 @@
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from expenses.recurring import DEFAULT_BATCH_SIZE, generate_due_expenses
+from expenses.workers import init_worker, run_shard
+
+
+class Command(BaseCommand):
+    """
+    Generate the due occurrences of every user's recurring expenses.
+
+    Safe to run from cron on several nodes at once: batches of due rules are
+    locked with SKIP LOCKED, so each rule is processed by one run only. With
+    --workers N, users are sharded by ``user_id % N`` across N processes,
+    each with its own database connection.
+    """
+    help = 'Generate expenses for all due recurring expenses, catching up missed periods'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--date', help='Generate occurrences up to this date (YYYY-MM-DD, default today)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1, help='Worker processes, one shard of users each'
+        )
+
+    def handle(self, *args, **options):
+        # Fixed once, so every shard generates up to the same date
+        through = timezone.now().date()
+        if options['date']:
+            try:
+                through = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Invalid --date. Use YYYY-MM-DD')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] > 1 and connections['default'].vendor == 'sqlite':
+            raise CommandError('--workers needs a database with concurrent writers; SQLite has one')
+        started = time.perf_counter()
+
+        if options['workers'] == 1:
+            def report(rules, expenses):
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{rules} recurring expenses, {expenses} expenses generated')
+
+            rules, expenses = generate_due_expenses(
+                through, batch_size=options['batch_size'], on_batch=report
+            )
+        else:
+            rules, expenses = self.run_workers(options['workers'], through, options)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {expenses} expenses from {rules} recurring expenses in {elapsed:.1f}s'
+        ))
+
+    def run_workers(self, workers, through, options):
+        """Run one shard per worker process and report progress per shard."""
+        context = multiprocessing.get_context('spawn')
+        progress = context.Queue()
+        done = {shard: [0, 0] for shard in range(workers)}
+        totals = [0, 0]
+
+        # Workers must not inherit this process's connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context,
+            initializer=init_worker, initargs=(progress,)
+        ) as executor:
+            pending = {
+                executor.submit(run_shard, shard, workers, through, options['batch_size'])
+                for shard in range(workers)
+            }
+            while pending:
+                finished, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                self.drain(progress, done, options['verbosity'])
+                for future in finished:
+                    shard, rules, expenses, elapsed = future.result()
+                    totals[0] += rules
+                    totals[1] += expenses
+                    self.stdout.write(
+                        f'shard {shard}/{workers}: {expenses} expenses from {rules} recurring '
+                        f'expenses in {elapsed:.1f}s ({rules / elapsed if elapsed else 0:,.0f} rules/s)'
+                    )
+        return totals
+
+    def drain(self, progress, done, verbosity):
+        while True:
+            try:
+                shard, rules, expenses = progress.get_nowait()
+            except queue.Empty:
+                return
+            done[shard][0] += rules
+            done[shard][1] += expenses
+            if verbosity > 1:
+                self.stdout.write(
+                    f'shard {shard}: {done[shard][0]} recurring expenses, '
+                    f'{done[shard][1]} expenses generated'
+                )
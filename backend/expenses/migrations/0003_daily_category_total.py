@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:55
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    """Fill the rollup table from existing expenses."""
+    Expense = apps.get_model('expenses', 'Expense')
+    DailyCategoryTotal = apps.get_model('expenses', 'DailyCategoryTotal')
+
+    rows = Expense.objects.order_by().values('user_id', 'date', 'category').annotate(
+        amount_sum=models.Sum('amount'),
+        row_count=models.Count('id'),
+    )
+    DailyCategoryTotal.objects.bulk_create(
+        (
+            DailyCategoryTotal(
+                user_id=row['user_id'], date=row['date'], category=row['category'],
+                total=row['amount_sum'], count=row['row_count']
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0002_alter_recurringexpense_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('entertainment', 'Entertainment'), ('utilities', 'Utilities'), ('healthcare', 'Healthcare'), ('shopping', 'Shopping'), ('education', 'Education'), ('travel', 'Travel'), ('other', 'Other')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_category_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Category Total',
+                'verbose_name_plural': 'Daily Category Totals',
+                'db_table': 'daily_category_totals',
+                'ordering': ['-date', 'category'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'category'), name='unique_daily_category_total'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_daily_category_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='expenses_user_keyset_idx'),
+        ),
+        # (user, date) is a prefix of the keyset index; drop it after the
+        # keyset index exists so the user foreign key always has an index
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expenses_user_id_513cb5_idx',
+        ),
+    ]
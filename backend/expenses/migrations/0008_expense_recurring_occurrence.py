@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_generated_expenses(apps, schema_editor):
+    """
+    Link expenses generated before the recurring link existed to their rule,
+    using the "<title> (Auto-generated)" title they were created with. Only
+    the first expense per rule and date is linked, so the unique constraint
+    added below holds.
+    """
+    Expense = apps.get_model('expenses', 'Expense')
+    RecurringExpense = apps.get_model('expenses', 'RecurringExpense')
+
+    for recurring in RecurringExpense.objects.only('id', 'user_id', 'title').iterator():
+        generated = Expense.objects.filter(
+            user_id=recurring.user_id,
+            title=f'{recurring.title} (Auto-generated)',
+            recurring__isnull=True
+        ).only('id', 'date').order_by('date', 'id')
+
+        linked = {}
+        for expense in generated:
+            if expense.date not in linked:
+                expense.recurring_id = recurring.id
+                expense.occurrence_date = expense.date
+                linked[expense.date] = expense
+        Expense.objects.bulk_update(
+            linked.values(), ['recurring', 'occurrence_date'], batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='occurrence_date',
+            field=models.DateField(blank=True, help_text='Scheduled date of the recurring occurrence this expense records', null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='recurring',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Recurring expense this expense was generated from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='expenses.recurringexpense'),
+        ),
+        migrations.RunPython(link_generated_expenses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(fields=('recurring', 'occurrence_date'), name='unique_recurring_occurrence'),
+        ),
+    ]
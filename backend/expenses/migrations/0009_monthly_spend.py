@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:38
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_monthly_spend(apps, schema_editor):
+    """Total the existing daily rollup rows per user and month."""
+    DailyCategoryTotal = apps.get_model('expenses', 'DailyCategoryTotal')
+    MonthlySpend = apps.get_model('expenses', 'MonthlySpend')
+
+    months = (
+        DailyCategoryTotal.objects.annotate(month=TruncMonth('date')).order_by()
+        .values('user_id', 'month').annotate(amount=Sum('total'))
+    )
+    MonthlySpend.objects.bulk_create(
+        (
+            MonthlySpend(user_id=row['user_id'], month=row['month'], total=row['amount'])
+            for row in months.iterator()
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0008_expense_recurring_occurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('alert_level', models.PositiveSmallIntegerField(default=0, help_text='Highest budget alert sent for this month')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Monthly Spend',
+                'verbose_name_plural': 'Monthly Spend',
+                'db_table': 'monthly_spend',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyspend',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_monthly_spend'),
+        ),
+        migrations.RunPython(fill_monthly_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:41
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_unread_notifications(apps, schema_editor):
+    """Count the existing unread notifications of every user."""
+    Notification = apps.get_model('expenses', 'Notification')
+    User = apps.get_model('accounts', 'User')
+
+    User.objects.update(unread_notifications=0)
+    counts = (
+        Notification.objects.filter(is_read=False).order_by()
+        .values('user_id').annotate(unread=Count('id'))
+    )
+    for row in counts.iterator():
+        User.objects.filter(pk=row['user_id']).update(unread_notifications=row['unread'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_unread_notifications'),
+        ('expenses', '0009_monthly_spend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notification_feed_idx'),
+        ),
+        migrations.RunPython(fill_unread_notifications, migrations.RunPython.noop),
+    ]
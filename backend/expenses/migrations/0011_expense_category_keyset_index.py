@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_notification_feed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expenses_user_cat_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'category', '-date', '-created_at', '-id'], name='expenses_user_cat_keyset_idx'),
+        ),
+    ]
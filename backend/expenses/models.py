@@ -1,9 +1,71 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-from datetime import timedelta
-from dateutil.relativedelta import relativedelta
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Fields that determine which DailyCategoryTotal row an expense counts toward
+ROLLUP_FIELDS = ('user_id', 'date', 'category', 'amount')
+
+
+class ExpenseQuerySet(models.QuerySet):
+    """
+    QuerySet that keeps DailyCategoryTotal and the owners' data versions in
+    step with bulk writes.
+
+    The owners' versions are bumped before any expense or rollup row is
+    written: the UPDATE takes the users rows' exclusive lock first, so two
+    writers for the same user queue on it instead of both taking the shared
+    lock of an InnoDB foreign key check and deadlocking on the upgrade.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .caching import bump_data_version
+        from .rollups import apply_deltas, deltas_for_instances, refresh_keys
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            bump_data_version(expense.user_id for expense in objs)
+            created = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Which rows were written is unknown, so recount the touched keys
+                refresh_keys(expense.rollup_state()[:3] for expense in created)
+            else:
+                apply_deltas(deltas_for_instances(created))
+        return created
+
+    def update(self, **kwargs):
+        from .caching import bump_data_version
+        from .rollups import apply_deltas, deltas_for_queryset, merge_deltas
+
+        with transaction.atomic(using=self.db):
+            matched = list(self.values_list('pk', 'user_id'))
+            owners = {user_id for _, user_id in matched}
+            bump_data_version(owners)
+            affected = self.model.objects.filter(pk__in=[pk for pk, _ in matched])
+            if any(field in kwargs for field in ROLLUP_FIELDS + ('user',)):
+                before = deltas_for_queryset(affected, sign=-1)
+                rows = super().update(**kwargs)
+                deltas = merge_deltas(before, deltas_for_queryset(affected))
+                # Rows moved to another user
+                bump_data_version({key[0] for key in deltas} - owners)
+                apply_deltas(deltas)
+            else:
+                rows = super().update(**kwargs)
+        return rows
+
+    def delete(self):
+        from .caching import bump_data_version
+        from .rollups import apply_deltas, deltas_for_queryset
+
+        with transaction.atomic(using=self.db):
+            deltas = deltas_for_queryset(self, sign=-1)
+            bump_data_version({key[0] for key in deltas})
+            result = super().delete()
+            apply_deltas(deltas)
+        return result
 
 
 class Expense(models.Model):
@@ -60,6 +122,23 @@ class Expense(models.Model):
         auto_now=True,
         help_text='When this expense record was last updated'
     )
+    recurring = models.ForeignKey(
+        'RecurringExpense',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences',
+        # Covered by unique_recurring_occurrence
+        db_index=False,
+        help_text='Recurring expense this expense was generated from'
+    )
+    occurrence_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Scheduled date of the recurring occurrence this expense records'
+    )
+
+    objects = ExpenseQuerySet.as_manager()
 
     class Meta:
         db_table = 'expenses'
@@ -67,9 +146,22 @@ class Expense(models.Model):
         verbose_name_plural = 'Expenses'
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['user', 'date']),
-            models.Index(fields=['user', 'category']),
+            # Category filters, optionally with a date range, in keyset order
+            models.Index(
+                fields=['user', 'category', '-date', '-created_at', '-id'], name='expenses_user_cat_keyset_idx'
+            ),
+            # Amount ranges and ?ordering=amount
+            models.Index(fields=['user', 'amount'], name='expenses_user_amount_idx'),
             models.Index(fields=['date']),
+            # Matches KeysetPagination's (-date, -created_at, -id) ordering
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='expenses_user_keyset_idx'),
+        ]
+        constraints = [
+            # At most one expense per occurrence of a recurring expense
+            models.UniqueConstraint(
+                fields=['recurring', 'occurrence_date'],
+                name='unique_recurring_occurrence'
+            ),
         ]
 
     def __str__(self):
@@ -77,22 +169,60 @@ class Expense(models.Model):
 
     @property
     def formatted_amount(self):
-        """Return formatted amount with Indian currency formatting."""
-        import locale
-        try:
-            # Set locale for Indian formatting
-            locale.setlocale(locale.LC_ALL, 'en_IN.UTF-8')
-            formatted = locale.currency(self.amount, grouping=True, symbol='₹')
-            return formatted
-        except:
-            # Fallback to simple formatting
-            return f"₹{self.amount:,.2f}"
+        """Return amount formatted in the owner's preferred currency."""
+        from .formatting import format_amount
+        return format_amount(self.amount, self.user.currency)
+
+    def rollup_state(self):
+        """Return the current ``(user_id, date, category, amount)`` tuple."""
+        return tuple(getattr(self, field) for field in ROLLUP_FIELDS)
 
     def save(self, *args, **kwargs):
-        """Override save to ensure amount is positive."""
+        """
+        Override save to ensure amount is positive, update rollups and bump
+        the owner's data version.
+        """
+        from .caching import bump_data_version
+        from .rollups import apply_deltas, deltas_for_states
+
         if self.amount <= 0:
             raise ValueError("Amount must be greater than 0")
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        affects_rollup = update_fields is None or bool(
+            set(update_fields) & {'user', 'date', 'category', 'amount'}
+        )
+
+        with transaction.atomic():
+            previous = None
+            if affects_rollup and not self._state.adding:
+                # The stored row, not the values it was loaded with: it may
+                # have been changed since by update() or another writer
+                previous = self._stored_rollup_state()
+            # Lock the owner rows before writing any row that references them
+            bump_data_version({self.user_id, previous[0] if previous else self.user_id})
+            super().save(*args, **kwargs)
+            if affects_rollup:
+                removed = [previous] if previous else []
+                apply_deltas(deltas_for_states(removed=removed, added=[self.rollup_state()]))
+
+    def delete(self, *args, **kwargs):
+        """Override delete to remove the expense from its rollup."""
+        from .caching import bump_data_version
+        from .rollups import apply_deltas, deltas_for_states
+
+        with transaction.atomic():
+            state = self._stored_rollup_state()
+            if state:
+                bump_data_version([state[0]])
+            result = super().delete(*args, **kwargs)
+            if state:
+                apply_deltas(deltas_for_states(removed=[state]))
+        return result
+
+    def _stored_rollup_state(self):
+        """Lock the stored row and return its rollup tuple (None if it is gone)."""
+        return Expense.objects.select_for_update().filter(pk=self.pk).values_list(*ROLLUP_FIELDS).first()
 
 class RecurringExpense(models.Model):
     """
@@ -170,18 +300,31 @@ class RecurringExpense(models.Model):
     def __str__(self):
         return f"{self.title} - {self.frequency} - ₹{self.amount} ({self.user.username})"
 
+    def save(self, *args, **kwargs):
+        """Override save to bump the owner's data and recurring versions."""
+        from .caching import bump_data_version
+
+        with transaction.atomic():
+            # Before the write, so the owner row is locked first (see ExpenseQuerySet)
+            bump_data_version([self.user_id], recurring=True)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Override delete to bump the owner's data and recurring versions."""
+        from .caching import bump_data_version
+
+        with transaction.atomic():
+            bump_data_version([self.user_id], recurring=True)
+            result = super().delete(*args, **kwargs)
+        return result
+
     # ✅ Auto-calculate next occurrence date based on frequency
-    def calculate_next_date(self):
-        """Calculate the next occurrence date based on frequency."""
-        if self.frequency == 'daily':
-            return self.next_date + timedelta(days=1)
-        elif self.frequency == 'weekly':
-            return self.next_date + timedelta(weeks=1)
-        elif self.frequency == 'monthly':
-            return self.next_date + relativedelta(months=1)
-        elif self.frequency == 'yearly':
-            return self.next_date + relativedelta(years=1)
-        return self.next_date
+    def calculate_next_date(self, from_date=None):
+        """Calculate the occurrence after ``from_date`` (default next_date)."""
+        from .schedule import Schedules
+
+        schedule = Schedules([self.start_date], [self.frequency])
+        return schedule.next_after(from_date or self.next_date).tolist()[0]
 
 # class RecurringExpense(models.Model):
 #     """
@@ -274,6 +417,178 @@ class RecurringExpense(models.Model):
 #         return self.next_date
 
 
+class DailyCategoryTotal(models.Model):
+    """
+    Per-user daily spend per category, maintained incrementally from Expense
+    writes so analytics can aggregate days x categories instead of raw rows
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_category_totals'
+    )
+    date = models.DateField()
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_category_totals'
+        verbose_name = 'Daily Category Total'
+        verbose_name_plural = 'Daily Category Totals'
+        ordering = ['-date', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'category'],
+                name='unique_daily_category_total'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.category}: {self.total} ({self.count})"
+
+
+class MonthlySpend(models.Model):
+    """
+    Per-user running total of expenses per calendar month, maintained with
+    DailyCategoryTotal, and the budget alerts already sent for the month
+    """
+    ALERT_NONE = 0
+    ALERT_THRESHOLD = 1
+    ALERT_EXCEEDED = 2
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='monthly_spend'
+    )
+    month = models.DateField(help_text='First day of the month')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    alert_level = models.PositiveSmallIntegerField(
+        default=ALERT_NONE,
+        help_text='Highest budget alert sent for this month'
+    )
+
+    class Meta:
+        db_table = 'monthly_spend'
+        verbose_name = 'Monthly Spend'
+        verbose_name_plural = 'Monthly Spend'
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_monthly_spend'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}: {self.total}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a create request sent with an ``Idempotency-Key``
+    header, replayed for retries of the same request until it expires
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            # Expired keys are purged by age
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.key}: {self.status_code}"
+
+
+def adjust_unread_counts(changes):
+    """
+    Add ``{user_id: delta}`` to the users' ``unread_notifications`` counters,
+    one UPDATE per distinct delta. Decrements stop at zero.
+
+    Call it before writing the notifications, like ``bump_data_version``:
+    the UPDATE then locks the users rows exclusively before an insert's
+    foreign key check takes a shared lock on them.
+    """
+    from accounts.models import User
+
+    by_delta = {}
+    for user_id, delta in changes.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        count = models.F('unread_notifications') + delta
+        User.objects.filter(pk__in=user_ids).update(
+            unread_notifications=Greatest(count, 0) if delta < 0 else count
+        )
+
+
+def _count_by_user(user_ids):
+    counts = {}
+    for user_id in user_ids:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    return counts
+
+
+class NotificationQuerySet(models.QuerySet):
+    """
+    QuerySet that keeps the owners' ``unread_notifications`` counters in
+    step with bulk writes
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            raise ValueError('Notifications cannot be bulk created with conflict handling')
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            adjust_unread_counts(_count_by_user(
+                notification.user_id for notification in objs if not notification.is_read
+            ))
+            created = super().bulk_create(objs, *args, **kwargs)
+        return created
+
+    def update(self, **kwargs):
+        if 'is_read' not in kwargs:
+            return super().update(**kwargs)
+        is_read = bool(kwargs['is_read'])
+        with transaction.atomic(using=self.db):
+            # Locking read, so concurrent writes flipping the same rows
+            # count each flip once
+            flipped = list(
+                self.filter(is_read=not is_read).select_for_update().values_list('user_id', flat=True)
+            )
+            sign = -1 if is_read else 1
+            adjust_unread_counts({
+                user_id: sign * count for user_id, count in _count_by_user(flipped).items()
+            })
+            rows = super().update(**kwargs)
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            unread = list(
+                self.filter(is_read=False).select_for_update().values_list('user_id', flat=True)
+            )
+            adjust_unread_counts({
+                user_id: -count for user_id, count in _count_by_user(unread).items()
+            })
+            result = super().delete()
+        return result
+
+
 class Notification(models.Model):
     """
     Model for user notifications
@@ -295,9 +610,43 @@ class Notification(models.Model):
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = NotificationQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The feed (unread first, newest first); InnoDB appends the
+            # primary key, which breaks created_at ties for the cursor
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_feed_idx'),
+        ]
         
     def __str__(self):
-        return f"{self.title} - {self.user.username}"
\ No newline at end of file
+        return f"{self.title} - {self.user.username}"
+
+    def save(self, *args, **kwargs):
+        """Override save to keep the owner's unread counter in step."""
+        update_fields = kwargs.get('update_fields')
+        affects_count = update_fields is None or bool(set(update_fields) & {'is_read', 'user'})
+
+        with transaction.atomic():
+            changes = {}
+            if affects_count and not self._state.adding:
+                previous = Notification.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('user_id', 'is_read').first()
+                if previous and not previous[1]:
+                    changes[previous[0]] = -1
+            if affects_count and not self.is_read:
+                changes[self.user_id] = changes.get(self.user_id, 0) + 1
+            adjust_unread_counts(changes)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Override delete to drop an unread notification from the counter."""
+        with transaction.atomic():
+            unread = Notification.objects.select_for_update().filter(pk=self.pk, is_read=False).exists()
+            if unread:
+                adjust_unread_counts({self.user_id: -1})
+            result = super().delete(*args, **kwargs)
+        return result
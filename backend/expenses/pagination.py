@@ -0,0 +1,193 @@
+import base64
+import copy
+import json
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Build ``(f1, f2, ...) > / < (v1, v2, ...)`` as nested ``OR``s for rows
+    after ``position`` in ``ordering``, which every backend can satisfy
+    with a range scan on the matching composite index.
+    """
+    names = [name.lstrip('-') for name in ordering]
+    condition = Q()
+    for i, name in enumerate(ordering):
+        descending = name.startswith('-') != reverse
+        lookup = 'lt' if descending else 'gt'
+        term = Q(**{f'{names[i]}__{lookup}': position[i]})
+        for prefix, value in zip(names[:i], position[:i]):
+            term &= Q(**{prefix: value})
+        condition |= term
+    return condition
+
+
+def iterate_keyset(queryset, ordering=('-date', '-created_at', '-id'), batch_size=1000):
+    """
+    Yield every row of ``queryset`` in ``ordering`` using keyset batches.
+
+    Unlike ``QuerySet.iterator()``, which the MySQL driver buffers in full,
+    only one batch is held in memory at a time on every backend.
+    """
+    names = [name.lstrip('-') for name in ordering]
+    queryset = queryset.order_by(*ordering)
+    batch = list(queryset[:batch_size])
+    while batch:
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        position = [getattr(last, name) for name in names]
+        batch = list(queryset.filter(keyset_filter(ordering, position))[:batch_size])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a composite ordering.
+
+    Each page is fetched with ``WHERE (ordering) < (cursor) ORDER BY ...
+    LIMIT n``, so the cost of a page does not depend on how deep it is.
+    The ordering must end in a unique field and should be backed by a
+    matching composite index.
+    """
+    ordering = ('-date', '-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        self.fields = [self.get_field(queryset, name.lstrip('-')) for name in self.ordering]
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.reversed_ordering() if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, view):
+        """
+        Use the keyset ordering chosen by the view's ordering filter, if
+        it has one, so ``?ordering=`` and the cursor always agree.
+        """
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_keyset_ordering'):
+                return tuple(backend().get_keyset_ordering(request, view))
+        return type(self).ordering
+
+    @staticmethod
+    def get_field(queryset, name):
+        """Return the model field, or an annotation's output field, for ``name``."""
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = copy.copy(queryset.query.annotations[name].output_field)
+            field.set_attributes_from_name(name)
+            return field
+
+    def reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def after(self, position, reverse):
+        return keyset_filter(self.ordering, position, reverse)
+
+    def encode_cursor(self, obj, reverse):
+        values = [field.value_to_string(obj) for field in self.fields]
+        token = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(token.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = token['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return position, bool(token.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, obj, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(obj, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class RankedKeysetPagination(KeysetPagination):
+    """
+    Keyset pages over a ``rank`` annotation, most relevant first, for
+    search results.
+    """
+    ordering = ('-rank', '-id')
+
+    def get_ordering(self, request, view):
+        return type(self).ordering
+
+
+class NotificationPagination(KeysetPagination):
+    """
+    Keyset pages of a user's notifications, unread first and newest first,
+    along ``notification_feed_idx``.
+    """
+    ordering = ('is_read', '-created_at', '-id')
+    page_size = 10
+    max_page_size = 50
+
+    def get_ordering(self, request, view):
+        return type(self).ordering
@@ -0,0 +1,81 @@
+"""
+Cash-flow projection of recurring expenses.
+
+Active rules are expanded in memory with the vectorised schedule (see
+``schedule.Schedules``), so a projection never writes or reads Expense
+rows. Occurrences are counted per rule and month with one ``np.bincount``
+and multiplied by the rule amounts as Decimals, so totals stay exact.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+import numpy as np
+from .models import Expense
+from .schedule import Schedules
+
+DEFAULT_PROJECTION_MONTHS = 6
+MAX_PROJECTION_MONTHS = 24
+
+
+def projected_totals(rules, after, months):
+    """
+    Total the occurrences of ``rules`` not generated yet, from each rule's
+    ``next_date`` (but no earlier than the month of ``after``, the first
+    month) to the end of the ``months``-th month. Occurrences still due in
+    the first month are included; generated ones are in its actual spend.
+
+    Returns ``{(month_offset, category): (amount, count)}``.
+    """
+    rules = list(rules)
+    if not rules:
+        return {}
+    first_month = after.replace(day=1)
+    end = first_month + relativedelta(months=months, days=-1)
+    starts = [max(rule.next_date, first_month) for rule in rules]
+    indexes, dates = Schedules.from_rules(rules).between(starts, end)
+
+    offsets = dates.astype('datetime64[M]').astype(np.int64) - np.datetime64(first_month, 'M').astype(np.int64)
+    counts = np.bincount(indexes * months + offsets, minlength=len(rules) * months)
+
+    totals = defaultdict(lambda: (Decimal('0'), 0))
+    for rule, row in zip(rules, counts.reshape(len(rules), months).tolist()):
+        for offset, count in enumerate(row):
+            if count:
+                amount, total_count = totals[(offset, rule.category)]
+                totals[(offset, rule.category)] = (amount + rule.amount * count, total_count + count)
+    return dict(totals)
+
+
+def projection_report(projected, actual, first_month, months):
+    """
+    Merge ``projected_totals`` with ``actual`` (``{category: amount}`` spent
+    so far in the first month) into one row per month.
+    """
+    rows = []
+    for offset in range(months):
+        month = first_month + relativedelta(months=offset)
+        categories = {}
+        for value, _ in Expense.CATEGORY_CHOICES:
+            projected_amount, count = projected.get((offset, value), (Decimal('0'), 0))
+            actual_amount = actual.get(value, Decimal('0')) if offset == 0 else Decimal('0')
+            if projected_amount or actual_amount:
+                categories[value] = {
+                    'actual': actual_amount,
+                    'projected': projected_amount,
+                    'total': actual_amount + projected_amount,
+                    'occurrences': count,
+                }
+        actual_total = sum((row['actual'] for row in categories.values()), Decimal('0'))
+        projected_total = sum((row['projected'] for row in categories.values()), Decimal('0'))
+        rows.append({
+            'month': month.strftime('%Y-%m'),
+            'month_name': month.strftime('%B %Y'),
+            'actual': actual_total,
+            'projected': projected_total,
+            'total': actual_total + projected_total,
+            'categories': categories,
+        })
+    return {
+        'months': rows,
+        'projected_total': sum((row['projected'] for row in rows), Decimal('0')),
+    }
@@ -0,0 +1,175 @@
+"""
+Materialising recurring expenses into Expense rows.
+
+Due rules are claimed a batch at a time in ``next_date`` order (the
+``next_date`` index) with ``SELECT ... FOR UPDATE SKIP LOCKED``, so several
+schedulers can run at once: each batch is locked by exactly one of them and
+the others move on to the next unlocked rules. Every missed occurrence up
+to the run date is generated, the expenses of a batch are written with one
+``bulk_create`` and the rules' ``next_date`` with one ``bulk_update``, all
+in the batch's transaction.
+
+A backlog can also be split across processes by user (``shard_queryset``):
+every rule belongs to exactly one ``user_id % shards`` shard, and the
+occurrences generated only depend on the rule and the run date, so the
+result is the same whatever the number of shards.
+"""
+from django.db import IntegrityError, connections, transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+from .caching import bump_data_version
+from .models import Expense, RecurringExpense
+from .schedule import Schedules
+
+DEFAULT_BATCH_SIZE = 500
+# Batched inserts tried before create_occurrences falls back to single rows
+INSERT_ATTEMPTS = 3
+
+
+def build_expense(recurring, date):
+    return Expense(
+        user_id=recurring.user_id,
+        recurring=recurring,
+        occurrence_date=date,
+        title=f"{recurring.title} (Auto-generated)",
+        amount=recurring.amount,
+        category=recurring.category,
+        date=date,
+        description=f"Auto-generated from recurring expense: {recurring.description or ''}"
+    )
+
+
+def existing_occurrences(occurrences, lock=False):
+    """
+    The ``(recurring_id, date)`` pairs of ``occurrences`` that already have
+    an expense, read with one query on the ``unique_recurring_occurrence``
+    index (a locking read with ``lock``).
+    """
+    dates = [date for _, date in occurrences]
+    existing = Expense.objects.filter(
+        recurring_id__in={recurring.id for recurring, _ in occurrences},
+        occurrence_date__range=(min(dates), max(dates))
+    )
+    if lock:
+        existing = existing.select_for_update()
+    return set(existing.values_list('recurring_id', 'occurrence_date'))
+
+
+def _insert_missing(occurrences, lock=False):
+    existing = existing_occurrences(occurrences, lock=lock)
+    expenses = []
+    for recurring, date in occurrences:
+        if (recurring.id, date) not in existing:
+            existing.add((recurring.id, date))
+            expenses.append(build_expense(recurring, date))
+    # A plain insert, so the rollups are updated with batched deltas
+    Expense.objects.bulk_create(expenses, batch_size=DEFAULT_BATCH_SIZE)
+    return expenses
+
+
+def _insert_each(occurrences):
+    """Insert the missing occurrences one row at a time, skipping conflicts."""
+    existing = existing_occurrences(occurrences, lock=True)
+    expenses = []
+    for recurring, date in occurrences:
+        if (recurring.id, date) in existing:
+            continue
+        existing.add((recurring.id, date))
+        expense = build_expense(recurring, date)
+        try:
+            with transaction.atomic():
+                Expense.objects.bulk_create([expense])
+        except IntegrityError:
+            if not Expense.objects.filter(recurring=recurring, occurrence_date=date).exists():
+                raise
+            continue
+        expenses.append(expense)
+    return expenses
+
+
+def create_occurrences(occurrences):
+    """
+    Create an expense for each ``(recurring, date)`` in ``occurrences`` that
+    does not have one yet, and return the new expenses.
+
+    Existing occurrences are read without locks and the rest inserted. If
+    another writer inserted some of them in the meantime, the insert fails
+    on the ``unique_recurring_occurrence`` constraint and is rolled back to
+    a savepoint, and the occurrences are read again with a locking read,
+    which waits for a writer that has inserted but not yet committed them.
+    Django runs MySQL at READ COMMITTED, where that read takes no gap locks
+    and cannot stop newer inserts, so the insert may conflict again: after
+    ``INSERT_ATTEMPTS`` conflicts the occurrences still missing are inserted
+    one at a time, each in its own savepoint, and the ones that conflict are
+    skipped.
+    """
+    occurrences = list(occurrences)
+    if not occurrences:
+        return []
+    with transaction.atomic():
+        for attempt in range(INSERT_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return _insert_missing(occurrences, lock=attempt > 0)
+            except IntegrityError:
+                pass
+        return _insert_each(occurrences)
+
+
+def generate_batch(rules, through):
+    """
+    Generate the due expenses of ``rules`` and advance them. Returns the
+    number of expenses created.
+    """
+    schedules = Schedules.from_rules(rules)
+    indexes, dates = schedules.between([recurring.next_date for recurring in rules], through)
+    occurrences = [(rules[index], date) for index, date in zip(indexes.tolist(), dates.tolist())]
+    now = timezone.now()
+    for recurring, next_date in zip(rules, schedules.next_after(through).tolist()):
+        recurring.next_date = next_date
+        if recurring.end_date and next_date > recurring.end_date:
+            recurring.is_active = False
+        recurring.updated_at = now
+
+    expenses = create_occurrences(occurrences)
+    RecurringExpense.objects.bulk_update(
+        rules, ['next_date', 'is_active', 'updated_at'], batch_size=DEFAULT_BATCH_SIZE
+    )
+    bump_data_version((recurring.user_id for recurring in rules), recurring=True)
+    return len(expenses)
+
+
+def generate_due_expenses(through=None, queryset=None, batch_size=DEFAULT_BATCH_SIZE,
+                          on_batch=None):
+    """
+    Generate every occurrence due on or before ``through`` (default today)
+    for the active rules in ``queryset`` (default all users' rules).
+
+    ``on_batch(rules, expenses)`` is called after each committed batch.
+    Returns ``(rules, expenses)`` totals.
+    """
+    through = through or timezone.now().date()
+    if queryset is None:
+        queryset = RecurringExpense.objects.all()
+    due = queryset.filter(is_active=True, next_date__lte=through).order_by('next_date', 'id')
+    features = connections[due.db].features
+    if features.has_select_for_update:
+        due = due.select_for_update(skip_locked=features.has_select_for_update_skip_locked)
+
+    total_rules = total_expenses = 0
+    while True:
+        with transaction.atomic():
+            rules = list(due[:batch_size])
+            if not rules:
+                break
+            created = generate_batch(rules, through)
+        total_rules += len(rules)
+        total_expenses += created
+        if on_batch:
+            on_batch(len(rules), created)
+    return total_rules, total_expenses
+
+
+def shard_queryset(shard, shards):
+    """The recurring expenses of users with ``user_id % shards == shard``."""
+    return RecurringExpense.objects.alias(shard=Mod('user_id', shards)).filter(shard=shard)
@@ -0,0 +1,346 @@
+"""
+Incremental maintenance of the DailyCategoryTotal rollup.
+
+Expense writes are translated into *deltas* keyed by
+``(user_id, date, category)`` holding ``[amount, count]`` changes, which are
+then applied with atomic ``F()`` increments. The same changes are summed
+per month into MonthlySpend, whose current-month totals drive the budget
+alerts (see ``budgets.check_budgets``). ``reconcile_user`` recomputes a
+user's rollups from scratch for the ``rebuild_rollups`` command.
+"""
+from collections import defaultdict
+from datetime import date as date_type
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from .models import DailyCategoryTotal, Expense, MonthlySpend
+
+
+def _new_deltas():
+    return defaultdict(lambda: [Decimal('0'), 0])
+
+
+def _as_decimal(amount):
+    return amount if isinstance(amount, Decimal) else Decimal(str(amount))
+
+
+def deltas_for_states(removed=(), added=()):
+    """Build deltas from ``(user_id, date, category, amount)`` tuples."""
+    deltas = _new_deltas()
+    for sign, states in ((-1, removed), (1, added)):
+        for user_id, date, category, amount in states:
+            delta = deltas[(user_id, date, category)]
+            delta[0] += sign * _as_decimal(amount)
+            delta[1] += sign
+    return deltas
+
+
+def deltas_for_instances(expenses, sign=1):
+    """Build deltas for in-memory Expense instances."""
+    states = [expense.rollup_state() for expense in expenses]
+    if sign > 0:
+        return deltas_for_states(added=states)
+    return deltas_for_states(removed=states)
+
+
+def deltas_for_queryset(queryset, sign=1):
+    """Build deltas for the rows matched by an Expense queryset in one query."""
+    deltas = _new_deltas()
+    rows = queryset.order_by().values('user_id', 'date', 'category').annotate(
+        amount_sum=Sum('amount'),
+        row_count=Count('id'),
+    )
+    for row in rows:
+        delta = deltas[(row['user_id'], row['date'], row['category'])]
+        delta[0] += sign * row['amount_sum']
+        delta[1] += sign * row['row_count']
+    return deltas
+
+
+def merge_deltas(*all_deltas):
+    """Sum several delta mappings into one."""
+    merged = _new_deltas()
+    for deltas in all_deltas:
+        for key, (amount, count) in deltas.items():
+            merged[key][0] += amount
+            merged[key][1] += count
+    return merged
+
+
+def apply_deltas(deltas):
+    """
+    Apply deltas to DailyCategoryTotal with atomic increments.
+
+    Rows that drop to a zero count are removed so the rollup only holds
+    days that actually have expenses. Several keys at once are applied in
+    one batch (see ``_apply_batch``) rather than key by key.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if len(deltas) > 1:
+        _apply_batch(deltas)
+    else:
+        for key, (amount, count) in deltas.items():
+            _apply_one(key, amount, count)
+    _check_budgets(_apply_month_deltas((key, amount) for key, (amount, _) in deltas.items()))
+
+
+def _apply_one(key, amount, count):
+    user_id, date, category = key
+    rows = DailyCategoryTotal.objects.filter(user_id=user_id, date=date, category=category)
+    updated = rows.update(total=F('total') + amount, count=F('count') + count)
+    if not updated:
+        try:
+            with transaction.atomic():
+                DailyCategoryTotal.objects.create(
+                    user_id=user_id, date=date, category=category,
+                    total=amount, count=count
+                )
+        except IntegrityError:
+            # Another writer created the row first; increment it instead
+            rows.update(total=F('total') + amount, count=F('count') + count)
+
+    if count < 0:
+        rows.filter(count__lte=0).delete()
+
+
+def _apply_batch(deltas):
+    """
+    Apply many deltas with a constant number of queries: lock the existing
+    rows, ``bulk_update`` them, ``bulk_create`` the missing ones and delete
+    the emptied ones.
+    """
+    existing = DailyCategoryTotal.objects.select_for_update().filter(
+        user_id__in={key[0] for key in deltas},
+        date__in={key[1] for key in deltas},
+    )
+    rows = {(row.user_id, row.date, row.category): row for row in existing}
+
+    changed, missing = [], {}
+    for key, (amount, count) in deltas.items():
+        row = rows.get(key)
+        if row is not None:
+            row.total += amount
+            row.count += count
+            changed.append(row)
+        elif count > 0:
+            missing[key] = (amount, count)
+
+    if changed:
+        DailyCategoryTotal.objects.bulk_update(changed, ['total', 'count'], batch_size=500)
+    if missing:
+        try:
+            with transaction.atomic():
+                DailyCategoryTotal.objects.bulk_create(
+                    [
+                        DailyCategoryTotal(
+                            user_id=user_id, date=date, category=category,
+                            total=amount, count=count
+                        )
+                        for (user_id, date, category), (amount, count) in missing.items()
+                    ],
+                    batch_size=500
+                )
+        except IntegrityError:
+            # Another writer created some of these rows first
+            for key, (amount, count) in missing.items():
+                _apply_one(key, amount, count)
+
+    emptied = [row.pk for row in changed if row.count <= 0]
+    if emptied:
+        DailyCategoryTotal.objects.filter(pk__in=emptied).delete()
+
+
+def _month_of(value):
+    if isinstance(value, str):
+        value = date_type.fromisoformat(value)
+    return value.replace(day=1)
+
+
+def _apply_month_deltas(changes):
+    """
+    Add ``((user_id, date, category), amount)`` changes to the users'
+    MonthlySpend rows, with one increment for a single month or one batch
+    for several (as ``apply_deltas`` does for days).
+
+    Returns the ids of the users whose spending this month went up.
+    """
+    from .budgets import current_month
+
+    months = defaultdict(Decimal)
+    for (user_id, date, _), amount in changes:
+        months[(user_id, _month_of(date))] += _as_decimal(amount)
+    months = {key: amount for key, amount in months.items() if amount}
+
+    if len(months) > 1:
+        _apply_month_batch(months)
+    else:
+        for (user_id, month), amount in months.items():
+            _apply_month_one(user_id, month, amount)
+
+    this_month = current_month()
+    return {user_id for (user_id, month), amount in months.items() if amount > 0 and month == this_month}
+
+
+def _apply_month_one(user_id, month, amount):
+    rows = MonthlySpend.objects.filter(user_id=user_id, month=month)
+    if not rows.update(total=F('total') + amount):
+        try:
+            with transaction.atomic():
+                MonthlySpend.objects.create(user_id=user_id, month=month, total=amount)
+        except IntegrityError:
+            # Another writer created the row first; increment it instead
+            rows.update(total=F('total') + amount)
+
+
+def _apply_month_batch(months):
+    """Lock the existing rows, ``bulk_update`` them and ``bulk_create`` the rest."""
+    existing = MonthlySpend.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, _ in months},
+        month__in={month for _, month in months},
+    )
+    rows = {(row.user_id, row.month): row for row in existing}
+
+    changed, missing = [], {}
+    for key, amount in months.items():
+        row = rows.get(key)
+        if row is not None:
+            row.total += amount
+            changed.append(row)
+        else:
+            missing[key] = amount
+
+    if changed:
+        MonthlySpend.objects.bulk_update(changed, ['total'], batch_size=500)
+    if missing:
+        try:
+            with transaction.atomic():
+                MonthlySpend.objects.bulk_create(
+                    [
+                        MonthlySpend(user_id=user_id, month=month, total=amount)
+                        for (user_id, month), amount in missing.items()
+                    ],
+                    batch_size=500
+                )
+        except IntegrityError:
+            # Another writer created some of these rows first
+            for (user_id, month), amount in missing.items():
+                _apply_month_one(user_id, month, amount)
+
+
+def _check_budgets(user_ids):
+    from .budgets import check_budgets, current_month
+
+    if user_ids:
+        check_budgets(user_ids, current_month())
+
+
+def refresh_keys(keys):
+    """
+    Recompute the given ``(user_id, date, category)`` rollup rows exactly
+    from the expenses table.
+
+    Used after writes whose effect is not known row by row, such as
+    ``bulk_create(ignore_conflicts=True)``.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    by_user = defaultdict(set)
+    for user_id, date, category in keys:
+        by_user[user_id].add(date)
+
+    raised = set()
+    for user_id, dates in by_user.items():
+        with transaction.atomic():
+            # Lock the rows first, so increments by concurrent writers wait
+            # for the absolute totals written here instead of being lost
+            current = {
+                (user_id, row.date, row.category): row
+                for row in DailyCategoryTotal.objects.select_for_update().filter(
+                    user_id=user_id, date__in=dates
+                )
+            }
+            expected = deltas_for_queryset(
+                Expense.objects.filter(user_id=user_id, date__in=dates)
+            )
+            _, _, _, user_raised = _sync_user(
+                user_id, expected, current, {key for key in keys if key[0] == user_id}
+            )
+        raised |= user_raised
+    _check_budgets(raised)
+
+
+def _sync_user(user_id, expected, current, scope=None):
+    """
+    Make the rollup rows in ``current`` match ``expected``.
+
+    Returns ``(created, updated, deleted)`` row counts and the users whose
+    spending this month went up; the caller decides whether to check their
+    budgets.
+    """
+    to_create, to_update, to_delete = [], [], []
+    changes = []
+    for key in set(expected) | set(current):
+        if scope is not None and key not in scope:
+            continue
+        amount, count = expected.get(key, (Decimal('0'), 0))
+        row = current.get(key)
+        if row is None:
+            if count:
+                to_create.append(DailyCategoryTotal(
+                    user_id=user_id, date=key[1], category=key[2],
+                    total=amount, count=count
+                ))
+                changes.append((key, amount))
+        elif not count:
+            to_delete.append(row.pk)
+            changes.append((key, -row.total))
+        elif row.total != amount or row.count != count:
+            changes.append((key, amount - row.total))
+            row.total, row.count = amount, count
+            to_update.append(row)
+
+    with transaction.atomic():
+        if to_delete:
+            DailyCategoryTotal.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            DailyCategoryTotal.objects.bulk_update(to_update, ['total', 'count'])
+        if to_create:
+            DailyCategoryTotal.objects.bulk_create(to_create)
+        raised = _apply_month_deltas(changes)
+    return len(to_create), len(to_update), len(to_delete), raised
+
+
+def reconcile_user(user_id):
+    """
+    Rebuild one user's rollup from their expenses. Budgets are not
+    checked: a rebuild corrects totals, it is not new spending.
+
+    Returns ``(created, updated, deleted)`` row counts.
+    """
+    with transaction.atomic():
+        current = {
+            (user_id, row.date, row.category): row
+            for row in DailyCategoryTotal.objects.select_for_update().filter(user_id=user_id)
+        }
+        expected = deltas_for_queryset(Expense.objects.filter(user_id=user_id))
+        counts = _sync_user(user_id, expected, current)[:3]
+        reconcile_months(user_id)
+        return counts
+
+
+def reconcile_months(user_id):
+    """Set the user's MonthlySpend totals from their DailyCategoryTotal rows."""
+    months = dict(
+        DailyCategoryTotal.objects.filter(user_id=user_id)
+        .annotate(month=TruncMonth('date')).order_by()
+        .values_list('month').annotate(amount=Sum('total'))
+    )
+    rows = {row.month: row for row in MonthlySpend.objects.select_for_update().filter(user_id=user_id)}
+    for month, row in rows.items():
+        row.total = months.pop(month, Decimal('0'))
+    MonthlySpend.objects.bulk_update(rows.values(), ['total'])
+    MonthlySpend.objects.bulk_create(
+        [MonthlySpend(user_id=user_id, month=month, total=total) for month, total in months.items()]
+    )
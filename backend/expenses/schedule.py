@@ -0,0 +1,158 @@
+"""
+Vectorised occurrence calculation for recurring expense schedules.
+
+Occurrences are anchored on the rule's ``start_date``: occurrence ``k`` of
+a daily or weekly rule is ``start_date + k`` days or weeks, and of a
+monthly or yearly rule the same day of the month ``k`` months or years
+later, clamped to the last day of shorter months (a rule starting on
+Jan 31 falls on Feb 28/29, then Mar 31). ``end_date`` is inclusive.
+
+Rules are handled as NumPy arrays: the first and last occurrence index
+inside a window is computed in closed form for every rule at once and the
+occurrences are then expanded with ``np.repeat``, so no calendar is
+stepped through day by day and the cost is proportional to the number of
+occurrences rather than days x rules.
+"""
+import numpy as np
+
+# frequency -> (days, months) per occurrence
+FREQUENCY_STEPS = {
+    'daily': (1, 0),
+    'weekly': (7, 0),
+    'monthly': (0, 1),
+    'yearly': (0, 12),
+}
+
+# Stands in for "no end date"
+_NO_END = np.datetime64('9999-12-31', 'D')
+
+
+def _days(values):
+    """``values`` (dates, or one date) as a datetime64[D] array."""
+    return np.array(values, dtype='datetime64[D]')
+
+
+def _steps(frequencies):
+    try:
+        steps = [FREQUENCY_STEPS[frequency] for frequency in frequencies]
+    except KeyError as e:
+        raise ValueError(f'Unknown frequency {e.args[0]!r}')
+    steps = np.array(steps, dtype=np.int64).reshape(-1, 2)
+    return steps[:, 0], steps[:, 1]
+
+
+def _month_index(days):
+    return days.astype('datetime64[M]').astype(np.int64)
+
+
+def _month_day(months, day):
+    """Day ``day`` of month index ``months``, clamped to the month's length."""
+    first = months.astype('datetime64[M]').astype('datetime64[D]')
+    length = ((months + 1).astype('datetime64[M]').astype('datetime64[D]') - first).astype(np.int64)
+    return first + (np.minimum(day, length) - 1)
+
+
+class Schedules:
+    """
+    The schedules of a sequence of rules, as arrays.
+
+    ``start_dates`` and ``frequencies`` are sequences with one item per
+    rule; ``end_dates`` may contain ``None``.
+    """
+
+    def __init__(self, start_dates, frequencies, end_dates=None):
+        self.start = _days(list(start_dates))
+        self.step_days, self.step_months = _steps(list(frequencies))
+        if end_dates is None:
+            self.end = np.full(len(self.start), _NO_END)
+        else:
+            self.end = _days([_NO_END if end is None else end for end in end_dates])
+        self.monthly = self.step_months > 0
+        self.start_month = _month_index(self.start)
+        self.start_day = (self.start - self.start.astype('datetime64[M]')).astype(np.int64) + 1
+
+    @classmethod
+    def from_rules(cls, rules):
+        """Build the schedules of RecurringExpense-like objects."""
+        rules = list(rules)
+        return cls(
+            [rule.start_date for rule in rules],
+            [rule.frequency for rule in rules],
+            [rule.end_date for rule in rules]
+        )
+
+    def __len__(self):
+        return len(self.start)
+
+    def occurrence(self, k, rules=slice(None)):
+        """Date of occurrence ``k`` of each rule (or of the ``rules`` index)."""
+        months = self.start_month[rules] + k * self.step_months[rules]
+        by_month = _month_day(months, self.start_day[rules])
+        by_day = self.start[rules] + k * self.step_days[rules]
+        return np.where(self.monthly[rules], by_month, by_day)
+
+    def _first_index(self, on_or_after):
+        """Index of each rule's first occurrence on or after ``on_or_after``."""
+        elapsed_days = (on_or_after - self.start).astype(np.int64)
+        elapsed_months = _month_index(on_or_after) - self.start_month
+        step_days = np.maximum(self.step_days, 1)
+        step_months = np.maximum(self.step_months, 1)
+        k = np.where(
+            self.monthly,
+            -(-elapsed_months // step_months),
+            -(-elapsed_days // step_days)
+        )
+        k = np.maximum(k, 0)
+        # A clamped monthly date can still fall before on_or_after in its month
+        return k + (self.occurrence(k) < on_or_after)
+
+    def _last_index(self, on_or_before):
+        """Index of each rule's last occurrence on or before ``on_or_before`` (-1 if none)."""
+        elapsed_days = (on_or_before - self.start).astype(np.int64)
+        elapsed_months = _month_index(on_or_before) - self.start_month
+        k = np.where(
+            self.monthly,
+            elapsed_months // np.maximum(self.step_months, 1),
+            elapsed_days // np.maximum(self.step_days, 1)
+        )
+        k = np.maximum(k, -1)
+        k = k - ((k >= 0) & (self.occurrence(np.maximum(k, 0)) > on_or_before))
+        return k
+
+    def between(self, start, end):
+        """
+        Every occurrence from ``start`` to ``end`` (inclusive; a date or one
+        per rule), clipped to each rule's ``end_date``.
+
+        Returns ``(rule_indexes, dates)`` arrays ordered by rule, then date;
+        ``dates.tolist()`` gives ``datetime.date`` objects.
+        """
+        start = np.broadcast_to(_days(start), self.start.shape)
+        end = np.minimum(np.broadcast_to(_days(end), self.start.shape), self.end)
+        first = self._first_index(start)
+        counts = np.maximum(self._last_index(end) - first + 1, 0)
+
+        rules = np.repeat(np.arange(len(self)), counts)
+        offsets = np.cumsum(counts) - counts
+        k = first[rules] + (np.arange(counts.sum()) - offsets[rules])
+        return rules, self.occurrence(k, rules)
+
+    def next_after(self, after):
+        """
+        Each rule's first occurrence strictly after ``after`` (a date or one
+        per rule). It may lie beyond the rule's ``end_date``.
+        """
+        after = np.broadcast_to(_days(after), self.start.shape)
+        return self.occurrence(self._first_index(after + 1))
+
+
+def expand(rules, start, end):
+    """
+    Return ``(rule, date)`` for every occurrence of ``rules`` from ``start``
+    to ``end`` (a date or one per rule), in rule order.
+    """
+    rules = list(rules)
+    if not rules:
+        return []
+    indexes, dates = Schedules.from_rules(rules).between(start, end)
+    return [(rules[index], day) for index, day in zip(indexes.tolist(), dates.tolist())]
@@ -0,0 +1,142 @@
+"""
+Full-text search over expense titles and descriptions.
+
+MySQL uses a ``FULLTEXT`` index on ``expenses(title, description)``, which
+InnoDB keeps current on every write. SQLite (local runs) uses an external
+content FTS5 table, ``expenses_fts``, kept in sync by triggers so that
+``save()``, ``bulk_create()``, ``update()`` and raw SQL writes are all
+indexed. Other backends fall back to unindexed ``icontains`` matching.
+
+Every query term must match, as a prefix, and results carry a ``rank``
+annotation where higher means more relevant. On MySQL, words shorter than
+the FULLTEXT minimum token size are matched with ``icontains`` instead.
+"""
+import re
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FULLTEXT_INDEX = 'expenses_title_description_ft'
+FTS_TABLE = 'expenses_fts'
+MAX_TERMS = 8
+# innodb_ft_min_token_size: shorter words are never indexed
+MYSQL_MIN_TERM_LENGTH = 3
+
+SQLITE_SEARCH_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='expenses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def install_search_index(connection, rebuild=False):
+    """
+    Create the backend's search index if it is missing.
+
+    Idempotent. On SQLite the triggers are dropped whenever a migration
+    rebuilds the expenses table, so this also runs after every migrate;
+    ``rebuild`` re-reads all rows into the FTS table.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'expenses' AND index_name = %s",
+                [FULLTEXT_INDEX]
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(
+                    f'ALTER TABLE expenses ADD FULLTEXT INDEX {FULLTEXT_INDEX} (title, description)'
+                )
+        elif connection.vendor == 'sqlite':
+            for statement in SQLITE_SEARCH_SQL:
+                cursor.execute(statement)
+            if rebuild:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(connection):
+    """Remove everything ``install_search_index`` created."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ALTER TABLE expenses DROP INDEX {FULLTEXT_INDEX}')
+        elif connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def search_terms(query):
+    """Split ``query`` into at most MAX_TERMS lower-cased words."""
+    return [term.lower() for term in re.findall(r'\w+', query)][:MAX_TERMS]
+
+
+def search_expenses(queryset, query):
+    """
+    Filter an Expense queryset to rows matching every term of ``query``
+    and annotate each with its relevance as ``rank``.
+    """
+    terms = search_terms(query)
+    vendor = connections[queryset.db].vendor
+    if not terms:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+    if vendor == 'mysql':
+        # Words shorter than innodb_ft_min_token_size are not in the index;
+        # match them with icontains on the rows the indexed terms select
+        indexed = [term for term in terms if len(term) >= MYSQL_MIN_TERM_LENGTH]
+        short = [term for term in terms if len(term) < MYSQL_MIN_TERM_LENGTH]
+        queryset = queryset.filter(_contains_all(short))
+        if not indexed:
+            return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+        rank = RawSQL(
+            'MATCH (expenses.title, expenses.description) AGAINST (%s IN BOOLEAN MODE)',
+            [' '.join(f'+{term}*' for term in indexed)],
+            output_field=FloatField()
+        )
+        return queryset.annotate(rank=rank).filter(rank__gt=0)
+
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matching_ids = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        # bm25() is negative; more negative is more relevant
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = expenses.id',
+            [match],
+            output_field=FloatField()
+        )
+        return queryset.filter(id__in=matching_ids).annotate(rank=rank)
+
+    return queryset.filter(_contains_all(terms)).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def _contains_all(terms):
+    """Rows whose title or description contains every one of ``terms``."""
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return condition
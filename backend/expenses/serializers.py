@@ -1,10 +1,41 @@
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
 from rest_framework import serializers
 from .models import Expense
 from .models import RecurringExpense
+from .formatting import currency_formatter
 from decimal import Decimal
 
 
-class RecurringExpenseSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin accepting ``fields=[...]`` to render only a subset
+    of its fields (sparse fieldsets)
+    """
+    # Serializer field -> model fields it reads, where not simply its source
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def model_fields_for(cls, names):
+        """Return the model fields needed to render serializer fields ``names``"""
+        concrete = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        fields = cls().fields
+        needed = set()
+        for name in names:
+            sources = cls.field_sources.get(name, (fields[name].source,))
+            needed.update(source for source in sources if source in concrete)
+        return needed
+
+
+class RecurringExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for RecurringExpense model
     """
@@ -48,14 +79,23 @@ class RecurringExpenseSerializer(serializers.ModelSerializer):
             validated_data['next_date'] = validated_data['start_date']
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Expense model
+
+    The owner is taken from the request when it matches ``user_id``, so
+    listing a user's expenses never joins or fetches ``auth_user`` per row.
     """
-    user = serializers.StringRelatedField(read_only=True)
+    user = serializers.SerializerMethodField()
     userId = serializers.SerializerMethodField()
-    formatted_amount = serializers.ReadOnlyField()
+    formatted_amount = serializers.SerializerMethodField()
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+
+    field_sources = {
+        'user': ('user',),
+        'userId': ('user',),
+        'formatted_amount': ('amount', 'user'),
+    }
     
     class Meta:
         model = Expense
@@ -65,9 +105,24 @@ class ExpenseSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'userId', 'created_at', 'updated_at']
     
+    def get_owner(self, obj):
+        """Return the expense owner, reusing the request user when possible"""
+        request = self.context.get('request')
+        if request is not None and request.user.pk == obj.user_id:
+            return request.user
+        return obj.user
+
+    def get_user(self, obj):
+        """Return the owner's display string (same as StringRelatedField)"""
+        return str(self.get_owner(obj))
+
     def get_userId(self, obj):
         """Return user ID as string to match frontend expectations"""
-        return str(obj.user.id)
+        return str(obj.user_id)
+
+    def get_formatted_amount(self, obj):
+        """Return amount formatted in the owner's preferred currency"""
+        return currency_formatter(self.get_owner(obj).currency)(obj.amount)
 
     def validate_amount(self, value):
         """
@@ -93,6 +148,37 @@ class ExpenseSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ExpenseBulkCreateListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` ExpenseCreateSerializer writing every item with
+    ``bulk_create`` (one INSERT per batch) instead of one INSERT per item
+    """
+    batch_size = 500
+
+    def create(self, validated_data):
+        expenses = [Expense(**attrs) for attrs in validated_data]
+        using = Expense.objects.db
+        with transaction.atomic(using=using):
+            if connections[using].features.can_return_rows_from_bulk_insert:
+                return Expense.objects.bulk_create(expenses, batch_size=self.batch_size)
+
+            # MySQL does not report the ids of a multi-row INSERT. Lock the
+            # owners first: every expense write bumps its owner's
+            # data_version, so none of theirs can commit before the new rows
+            # are read back below.
+            counts = defaultdict(int)
+            for expense in expenses:
+                counts[expense.user_id] += 1
+            list(get_user_model().objects.select_for_update().filter(pk__in=counts).values_list('pk'))
+            Expense.objects.bulk_create(expenses, batch_size=self.batch_size)
+
+            created = {
+                user_id: reversed(list(Expense.objects.filter(user_id=user_id).order_by('-id')[:count]))
+                for user_id, count in counts.items()
+            }
+            return [next(created[expense.user_id]) for expense in expenses]
+
+
 class ExpenseCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating expenses (simplified)
@@ -100,6 +186,7 @@ class ExpenseCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = ['title', 'amount', 'category', 'date', 'description']
+        list_serializer_class = ExpenseBulkCreateListSerializer
 
     def validate_amount(self, value):
         """
@@ -0,0 +1,1854 @@
+import csv
+import json
+import logging
+import os
+import random
+import sys
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from concurrent.futures import Future
+from unittest import mock
+from logging.handlers import QueueListener
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, models
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from expense_tracker.logs import QueueStreamHandler, RequestSampleFilter, RequestSamplingMiddleware
+from .models import Expense, RecurringExpense, DailyCategoryTotal, IdempotencyKey, MonthlySpend, Notification
+from .formatting import format_amount
+from .pagination import iterate_keyset
+from .recurring import generate_due_expenses, shard_queryset
+from .schedule import FREQUENCY_STEPS, Schedules
+
+
+class ExpenseAPITestCase(TestCase):
+    """
+    Base test case with an authenticated API client
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+
+    def add_expense(self, amount, category='food', days_ago=0, user=None, **kwargs):
+        return Expense.objects.create(
+            user=user or self.user,
+            title=kwargs.pop('title', f'{category} expense'),
+            amount=Decimal(amount),
+            category=category,
+            date=self.today - timedelta(days=days_ago),
+            **kwargs
+        )
+
+
+class ExpenseStatsTests(ExpenseAPITestCase):
+
+    def test_stats_values(self):
+        self.add_expense('10.00', 'food')
+        self.add_expense('5.50', 'transport')
+        self.add_expense('100.00', 'travel', days_ago=400)
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        self.add_expense('999.00', 'food', user=other)
+
+        response = self.client.get('/api/expenses/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(Decimal(data['total_expenses']), Decimal('115.50'))
+        self.assertEqual(data['total_count'], 3)
+        self.assertEqual(Decimal(data['today_expenses']), Decimal('15.50'))
+        self.assertEqual(Decimal(data['this_week_expenses']), Decimal('15.50'))
+        self.assertEqual(Decimal(data['this_month_expenses']), Decimal('15.50'))
+        self.assertEqual(data['category_breakdown'], {'Food': 10.0, 'Transport': 5.5, 'Travel': 100.0})
+        self.assertEqual(len(data['recent_expenses']), 3)
+
+    def test_stats_empty(self):
+        response = self.client.get('/api/expenses/stats/')
+
+        self.assertEqual(Decimal(response.data['total_expenses']), Decimal('0'))
+        self.assertEqual(response.data['category_breakdown'], {})
+
+    def test_stats_query_count(self):
+        for i in range(12):
+            self.add_expense('1.00', Expense.CATEGORY_CHOICES[i % 9][0], days_ago=i)
+
+        # One aggregate query plus one query for the recent expenses
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/expenses/stats/')
+        self.assertEqual(response.status_code, 200)
+
+
+class ReportsTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_expense('30.00', 'food', days_ago=0)
+        self.add_expense('10.00', 'food', days_ago=3)
+        self.add_expense('60.00', 'travel', days_ago=9)
+
+    def test_report_values(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reports/')
+
+        data = response.data
+        self.assertEqual(data['total_expenses'], 100.0)
+        self.assertEqual(data['total_count'], 3)
+        self.assertAlmostEqual(data['daily_average'], 10.0)
+        self.assertEqual(data['category_breakdown'], {
+            'Food': {'amount': 40.0, 'percentage': 40.0},
+            'Travel': {'amount': 60.0, 'percentage': 60.0},
+        })
+        self.assertEqual(data['top_category'], {'name': 'Travel', 'amount': 60.0})
+        self.assertEqual(len(data['monthly_trend']), 6)
+        self.assertEqual(data['monthly_trend'][-1]['month'], self.today.strftime('%b %Y'))
+        self.assertEqual(sum(m['amount'] for m in data['monthly_trend']), 100.0)
+
+    def test_report_monthly_trend_is_calendar_correct(self):
+        months = [m['month'] for m in self.client.get('/api/reports/').data['monthly_trend']]
+
+        self.assertEqual(len(set(months)), 6)
+
+    def test_report_date_filter(self):
+        start = (self.today - timedelta(days=3)).isoformat()
+        response = self.client.get('/api/reports/', {'start_date': start})
+
+        self.assertEqual(response.data['total_expenses'], 40.0)
+        self.assertEqual(response.data['date_range']['start'], start)
+
+    def test_category_summary(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reports/category_summary/')
+
+        data = response.data
+        self.assertEqual(data['total_amount'], 100.0)
+        self.assertEqual(data['total_categories'], 2)
+        self.assertEqual(data['category_data'][0], {
+            'category': 'Travel', 'amount': 60.0, 'percentage': 60.0, 'count': 1
+        })
+        self.assertEqual(data['category_data'][1]['count'], 2)
+
+
+class SpendingTrendTests(ExpenseAPITestCase):
+
+    def test_monthly_default(self):
+        self.add_expense('20.00', days_ago=0)
+        self.add_expense('5.00', days_ago=400)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reports/spending_trend/')
+
+        data = response.data
+        self.assertEqual(data['granularity'], 'month')
+        self.assertEqual(data['total_periods'], 12)
+        self.assertEqual(data['trend_data'][-1]['date'], self.today.replace(day=1).isoformat())
+        self.assertEqual(data['trend_data'][-1]['amount'], 20.0)
+        self.assertEqual(len({item['period'] for item in data['trend_data']}), 12)
+
+    def test_daily_zero_filled(self):
+        self.add_expense('7.00', days_ago=2)
+
+        response = self.client.get('/api/reports/spending_trend/', {'granularity': 'day', 'periods': 5})
+
+        amounts = [item['amount'] for item in response.data['trend_data']]
+        self.assertEqual(amounts, [0.0, 0.0, 7.0, 0.0, 0.0])
+
+    def test_quarter_and_year(self):
+        self.add_expense('3.00')
+
+        quarter = self.client.get('/api/reports/spending_trend/', {'granularity': 'quarter', 'periods': 4}).data
+        year = self.client.get('/api/reports/spending_trend/', {'view': 'yearly', 'months': 36}).data
+
+        self.assertEqual(quarter['trend_data'][-1]['period'], f"Q{(self.today.month - 1) // 3 + 1} {self.today.year}")
+        self.assertEqual(quarter['trend_data'][-1]['amount'], 3.0)
+        self.assertEqual(year['total_periods'], 3)
+        self.assertEqual(year['trend_data'][-1]['period'], str(self.today.year))
+
+    def test_periods_are_capped(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reports/spending_trend/', {'months': 10000})
+
+        self.assertEqual(response.data['total_periods'], 366)
+
+    def test_invalid_granularity(self):
+        response = self.client.get('/api/reports/spending_trend/', {'granularity': 'hour'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyCategoryTotalTests(ExpenseAPITestCase):
+
+    def rollup(self):
+        return {
+            (row.date, row.category): (row.total, row.count)
+            for row in DailyCategoryTotal.objects.filter(user=self.user)
+        }
+
+    def test_create_update_delete(self):
+        expense = self.add_expense('10.00', 'food')
+        self.add_expense('2.50', 'food')
+        self.assertEqual(self.rollup(), {(self.today, 'food'): (Decimal('12.50'), 2)})
+
+        yesterday = self.today - timedelta(days=1)
+        expense = Expense.objects.get(pk=expense.pk)
+        expense.category = 'travel'
+        expense.date = yesterday
+        expense.amount = Decimal('11.00')
+        expense.save()
+        self.assertEqual(self.rollup(), {
+            (self.today, 'food'): (Decimal('2.50'), 1),
+            (yesterday, 'travel'): (Decimal('11.00'), 1),
+        })
+
+        expense.delete()
+        self.assertEqual(self.rollup(), {(self.today, 'food'): (Decimal('2.50'), 1)})
+
+    def test_update_through_api(self):
+        expense = self.add_expense('10.00', 'food')
+
+        self.client.patch(f'/api/expenses/{expense.pk}/', {'category': 'shopping'}, format='json')
+        self.assertEqual(self.rollup(), {(self.today, 'shopping'): (Decimal('10.00'), 1)})
+
+        self.client.delete(f'/api/expenses/{expense.pk}/')
+        self.assertEqual(self.rollup(), {})
+
+    def test_bulk_paths(self):
+        Expense.objects.bulk_create([
+            Expense(user=self.user, title='a', amount=Decimal('1.00'), category='food', date=self.today),
+            Expense(user=self.user, title='b', amount=Decimal('2.00'), category='food', date=self.today),
+            Expense(user=self.user, title='c', amount=Decimal('4.00'), category='other', date=self.today),
+        ])
+        self.assertEqual(self.rollup(), {
+            (self.today, 'food'): (Decimal('3.00'), 2),
+            (self.today, 'other'): (Decimal('4.00'), 1),
+        })
+
+        Expense.objects.filter(user=self.user, category='food').update(category='other')
+        self.assertEqual(self.rollup(), {(self.today, 'other'): (Decimal('7.00'), 3)})
+
+        Expense.objects.filter(user=self.user, title='c').delete()
+        self.assertEqual(self.rollup(), {(self.today, 'other'): (Decimal('3.00'), 2)})
+
+    def test_save_after_update_and_refresh(self):
+        expense = self.add_expense('40.00', 'food')
+        Expense.objects.filter(pk=expense.pk).update(amount=Decimal('30.00'))
+        expense.refresh_from_db()
+        expense.title = 'renamed'
+        expense.save()
+        self.assertEqual(self.rollup(), {(self.today, 'food'): (Decimal('30.00'), 1)})
+
+    def test_write_after_concurrent_change(self):
+        expense = self.add_expense('40.00', 'food')
+        loaded = Expense.objects.get(pk=expense.pk)
+        # Another writer moves the row after it was loaded here
+        Expense.objects.filter(pk=expense.pk).update(amount=Decimal('30.00'), category='travel')
+
+        loaded.amount = Decimal('25.00')
+        loaded.save()
+        self.assertEqual(self.rollup(), {(self.today, 'food'): (Decimal('25.00'), 1)})
+
+        Expense.objects.filter(pk=expense.pk).update(category='travel')
+        loaded.delete()
+        self.assertEqual(self.rollup(), {})
+
+    def test_rebuild_rollups(self):
+        self.add_expense('10.00', 'food')
+        self.add_expense('5.00', 'travel', days_ago=1)
+        expected = self.rollup()
+        DailyCategoryTotal.objects.filter(category='food').update(total=Decimal('99.00'))
+        DailyCategoryTotal.objects.filter(category='travel').delete()
+        DailyCategoryTotal.objects.create(user=self.user, date=self.today, category='other', total=1, count=1)
+
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+
+        self.assertEqual(self.rollup(), expected)
+        self.assertIn('1 created, 1 updated, 1 deleted', out.getvalue())
+
+
+class ReportCacheTests(ExpenseAPITestCase):
+
+    def get(self, url, **params):
+        # Authentication reloads the user on every request
+        self.user.refresh_from_db()
+        return self.client.get(url, params)
+
+    def test_repeat_loads_hit_cache(self):
+        self.add_expense('10.00')
+        urls = [
+            '/api/expenses/stats/', '/api/reports/', '/api/reports/spending_trend/',
+            '/api/reports/category_summary/', '/api/budget/',
+        ]
+        for url in urls:
+            first = self.get(url).data
+            with self.assertNumQueries(1):  # refresh_from_db only
+                self.assertEqual(self.get(url).data, first)
+
+    def test_writes_invalidate(self):
+        self.add_expense('10.00')
+        self.assertEqual(self.get('/api/reports/category_summary/').data['total_amount'], 10.0)
+
+        self.add_expense('5.00')
+        self.assertEqual(self.get('/api/reports/category_summary/').data['total_amount'], 15.0)
+
+        Expense.objects.filter(user=self.user).update(title='renamed')
+        stats = self.get('/api/expenses/stats/').data
+        self.assertEqual({e['title'] for e in stats['recent_expenses']}, {'renamed'})
+
+    def test_params_are_part_of_key(self):
+        self.add_expense('10.00', days_ago=5)
+
+        self.assertEqual(self.get('/api/reports/').data['total_expenses'], 10.0)
+        start = self.today.isoformat()
+        self.assertEqual(self.get('/api/reports/', start_date=start).data['total_expenses'], 0.0)
+
+    def test_recurring_write_bumps_version(self):
+        version = self.user.data_version
+        RecurringExpense.objects.create(
+            user=self.user, title='Rent', amount=Decimal('100.00'),
+            start_date=self.today, next_date=self.today
+        )
+
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.data_version, version)
+
+    def test_owner_row_is_locked_before_child_writes(self):
+        def first_write(action):
+            with CaptureQueriesContext(connection) as queries:
+                action()
+            writes = [
+                query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            ]
+            return writes[0]
+
+        expense = Expense(user=self.user, title='t', amount=Decimal('5.00'), category='food', date=self.today)
+        rule = RecurringExpense(
+            user=self.user, title='Rent', amount=Decimal('100.00'), start_date=self.today, next_date=self.today
+        )
+        actions = [
+            expense.save,
+            lambda: Expense.objects.filter(pk=expense.pk).update(amount=Decimal('6.00')),
+            expense.delete,
+            lambda: Expense.objects.bulk_create([
+                Expense(user=self.user, title='b', amount=Decimal('1.00'), category='food', date=self.today)
+            ]),
+            lambda: Expense.objects.filter(user=self.user).delete(),
+            rule.save,
+            rule.delete,
+        ]
+        for action in actions:
+            self.assertTrue(first_write(action).startswith('UPDATE "auth_user"'), action)
+
+    def test_stale_user_save_keeps_version(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.add_expense('10.00')
+        self.assertEqual(self.get('/api/reports/category_summary/').data['total_amount'], 10.0)
+
+        stale.currency = 'USD'
+        stale.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.currency, 'USD')
+        self.assertGreater(self.user.data_version, stale.data_version)
+
+        self.add_expense('5.00')
+        self.assertEqual(self.get('/api/reports/category_summary/').data['total_amount'], 15.0)
+
+
+class ConditionalGetTests(ExpenseAPITestCase):
+
+    URLS = [
+        '/api/expenses/', '/api/expenses/monthly_grouped/', '/api/expenses/stats/',
+        '/api/reports/', '/api/reports/spending_trend/', '/api/reports/category_summary/',
+        '/api/budget/', '/api/profile/',
+    ]
+
+    def test_not_modified(self):
+        self.add_expense('10.00')
+        self.user.refresh_from_db()
+
+        for url in self.URLS:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response['ETag']
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], etag)
+            self.assertFalse(response.content)
+
+    def test_currency_change_invalidates_formatted_payloads(self):
+        self.add_expense('10.00')
+        urls = ['/api/expenses/', '/api/expenses/monthly_grouped/', '/api/expenses/stats/']
+        self.user.refresh_from_db()
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        User.objects.filter(pk=self.user.pk).update(currency='USD')
+        self.user.refresh_from_db()
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+        self.assertTrue(response.data['recent_expenses'][0]['formatted_amount'].startswith('$'))
+
+    def test_etag_changes_on_write_and_params(self):
+        self.user.refresh_from_db()
+        etag = self.client.get('/api/expenses/')['ETag']
+
+        self.assertNotEqual(self.client.get('/api/expenses/', {'page_size': 5})['ETag'], etag)
+
+        self.add_expense('10.00')
+        self.user.refresh_from_db()
+        response = self.client.get('/api/expenses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class KeysetPaginationTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Several expenses share a date so ties are broken by created_at/id
+        self.expenses = [self.add_expense('1.00', days_ago=i // 3) for i in range(10)]
+        self.expected = [
+            e.id for e in sorted(
+                self.expenses, key=lambda e: (e.date, e.created_at, e.id), reverse=True
+            )
+        ]
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            data = self.client.get(url).data
+            pages.append(data)
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids, pages
+
+    def test_forward_walk(self):
+        ids, pages = self.walk('/api/expenses/?page_size=3')
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(p['results']) for p in pages], [3, 3, 3, 1])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIsNotNone(pages[1]['previous'])
+
+    def test_previous_link(self):
+        first = self.client.get('/api/expenses/', {'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+
+        self.assertEqual([i['id'] for i in back['results']], self.expected[:3])
+        self.assertIsNone(back['previous'])
+
+    def test_page_cost_does_not_depend_on_depth(self):
+        _, pages = self.walk('/api/expenses/?page_size=3')
+        counts = []
+        for url in ['/api/expenses/?page_size=3', pages[1]['next']]:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_unpaginated_opt_in(self):
+        response = self.client.get('/api/expenses/', {'all': 'true'})
+
+        self.assertEqual([item['id'] for item in response.data], self.expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/expenses/', {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ExpenseSerializationTests(ExpenseAPITestCase):
+
+    def test_list_does_not_query_owner_per_row(self):
+        for i in range(5):
+            self.add_expense('1.00', days_ago=i)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/expenses/')
+
+        item = response.data['results'][0]
+        self.assertEqual(item['user'], str(self.user))
+        self.assertEqual(item['userId'], str(self.user.pk))
+
+    def test_formatted_amount_uses_user_currency(self):
+        self.add_expense('123456.50')
+        self.assertEqual(self.client.get('/api/expenses/').data['results'][0]['formatted_amount'], '₹1,23,456.50')
+
+        self.user.currency = 'USD'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/expenses/').data['results'][0]['formatted_amount'], '$123,456.50')
+
+    def test_format_amount(self):
+        self.assertEqual(format_amount(Decimal('5.00')), '₹5.00')
+        self.assertEqual(format_amount(Decimal('12345678.9')), '₹1,23,45,678.90')
+        self.assertEqual(format_amount(Decimal('-1500'), 'EUR'), '-€1,500.00')
+        self.assertEqual(format_amount(Decimal('1500.40'), 'JPY'), '¥1,500')
+
+
+class ExportJSONTests(ExpenseAPITestCase):
+
+    def test_streams_all_matching_rows(self):
+        for i in range(7):
+            self.add_expense('2.00', 'food' if i % 2 else 'travel', days_ago=i)
+
+        # Small batches so the stream spans several keyset queries
+        with mock.patch('expenses.views.EXPORT_BATCH_SIZE', 3):
+            response = self.client.get('/api/expenses/export_json/')
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(content)
+        self.assertEqual(len(data), 7)
+        self.assertEqual(data[0]['date'], self.today.isoformat())
+        self.assertEqual(len({item['id'] for item in data}), 7)
+
+    def test_filters(self):
+        for i in range(6):
+            self.add_expense('2.00', 'food' if i % 2 else 'travel', days_ago=i)
+
+        response = self.client.get('/api/expenses/export_json/', {
+            'category': 'food',
+            'start_date': (self.today - timedelta(days=3)).isoformat(),
+        })
+
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), 2)
+        self.assertTrue(all(item['category'] == 'food' for item in data))
+
+    def test_empty_and_invalid(self):
+        response = self.client.get('/api/expenses/export_json/')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+        response = self.client.get('/api/expenses/export_json/', {'end_date': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsetTests(ExpenseAPITestCase):
+
+    FIELDS = 'id,title,amount,date,category'
+
+    def setUp(self):
+        super().setUp()
+        self.add_expense('10.00', description='long text ' * 50)
+        self.add_expense('4.00', 'travel', days_ago=40)
+
+    def test_list_returns_only_requested_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/expenses/', {'fields': self.FIELDS})
+
+        self.assertEqual(set(response.data['results'][0]), set(self.FIELDS.split(',')))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0]['sql'])
+        self.assertNotIn('updated_at', queries[0]['sql'])
+
+    def test_grouped_endpoints(self):
+        by_category = self.client.get('/api/expenses/by_category/', {'fields': 'id,amount'}).data
+        monthly = self.client.get('/api/expenses/monthly_grouped/', {'fields': 'id,amount'}).data
+        month_expenses = self.client.get(monthly['grouped_expenses'][0]['expenses_url']).data
+
+        self.assertEqual(set(by_category['Travel'][0]), {'id', 'amount'})
+        self.assertEqual(set(month_expenses['results'][0]), {'id', 'amount'})
+
+    def test_recurring(self):
+        RecurringExpense.objects.create(
+            user=self.user, title='Rent', amount=Decimal('100.00'),
+            start_date=self.today, next_date=self.today
+        )
+
+        response = self.client.get('/api/recurring/', {'fields': 'id,title,frequency'})
+
+        self.assertEqual(response.data, [{'id': response.data[0]['id'], 'title': 'Rent', 'frequency': 'monthly'}])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/expenses/', {'fields': 'id,secret'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ExpenseFilterTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lunch = self.add_expense('12.00', 'food', days_ago=1, title='Team lunch')
+        self.taxi = self.add_expense('30.00', 'transport', days_ago=5, title='Airport taxi')
+        self.rent = self.add_expense('900.00', 'utilities', days_ago=20, title='Rent')
+        self.snack = self.add_expense('3.50', 'food', days_ago=40, title='Snack')
+
+    def ids(self, params):
+        response = self.client.get('/api/expenses/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.ids({'category': 'food,utilities'}), [self.lunch.id, self.rent.id, self.snack.id])
+        self.assertEqual(self.ids({'category': ['food', 'transport']}), [self.lunch.id, self.taxi.id, self.snack.id])
+        self.assertEqual(self.ids({'min_amount': '10', 'max_amount': '100'}), [self.lunch.id, self.taxi.id])
+        self.assertEqual(
+            self.ids({'start_date': str(self.today - timedelta(days=30)), 'end_date': str(self.today - timedelta(days=2))}),
+            [self.taxi.id, self.rent.id]
+        )
+        self.assertEqual(self.ids({'title': 'TAXI'}), [self.taxi.id])
+        self.assertEqual(self.ids({'category': 'food', 'min_amount': '5'}), [self.lunch.id])
+
+    def test_ordering_by_amount_pages_with_cursor(self):
+        ids, url = [], '/api/expenses/?ordering=-amount&page_size=2'
+        while url:
+            data = self.client.get(url).data
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+
+        self.assertEqual(ids, [self.rent.id, self.taxi.id, self.lunch.id, self.snack.id])
+        self.assertEqual(self.ids({'ordering': 'date'}), [self.snack.id, self.rent.id, self.taxi.id, self.lunch.id])
+
+    def test_invalid_params(self):
+        for params in ({'category': 'yachts'}, {'min_amount': 'lots'}, {'start_date': '01/02/2024'}, {'ordering': 'title'}):
+            self.assertEqual(self.client.get('/api/expenses/', params).status_code, 400, params)
+
+    def test_every_filter_combination_uses_a_user_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN')
+        from itertools import combinations
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from .filters import ExpenseFilterBackend, ExpenseOrderingFilter
+
+        filters = {
+            'category': 'food,utilities', 'min_amount': '5', 'max_amount': '500',
+            'start_date': str(self.today - timedelta(days=30)), 'title': 'lunch',
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                for ordering in ('-date', 'amount'):
+                    params = {name: filters[name] for name in names}
+                    params['ordering'] = ordering
+                    request = Request(APIRequestFactory().get('/api/expenses/', params))
+                    queryset = Expense.objects.filter(user=self.user)
+                    for backend in (ExpenseFilterBackend, ExpenseOrderingFilter):
+                        queryset = backend().filter_queryset(request, queryset, None)
+
+                    plan = queryset.explain()
+                    self.assertRegex(plan, r'SEARCH expenses USING (COVERING )?INDEX \w+ \(user_id=?', params)
+                    self.assertNotIn('SCAN expenses', plan, params)
+
+    def test_each_filter_seeks_on_its_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan assertions are written against SQLite EXPLAIN QUERY PLAN')
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from .filters import ExpenseFilterBackend, ExpenseOrderingFilter
+
+        start, end = str(self.today - timedelta(days=30)), str(self.today)
+        cases = [
+            ({'category': 'food'}, 'expenses_user_cat_keyset_idx', 'user_id=? AND category=?'),
+            ({'category': 'food', 'start_date': start}, 'expenses_user_cat_keyset_idx',
+             'user_id=? AND category=? AND date>?'),
+            ({'start_date': start}, 'expenses_user_keyset_idx', 'user_id=? AND date>?'),
+            ({'end_date': end}, 'expenses_user_keyset_idx', 'user_id=? AND date<?'),
+            ({'min_amount': '5', 'ordering': 'amount'}, 'expenses_user_amount_idx', 'user_id=? AND amount>?'),
+            ({'max_amount': '500', 'ordering': 'amount'}, 'expenses_user_amount_idx', 'user_id=? AND amount<?'),
+            ({'min_amount': '5', 'max_amount': '500', 'ordering': '-amount'}, 'expenses_user_amount_idx',
+             'user_id=? AND amount>? AND amount<?'),
+        ]
+        for params, index, seek in cases:
+            request = Request(APIRequestFactory().get('/api/expenses/', params))
+            queryset = Expense.objects.filter(user=self.user)
+            for backend in (ExpenseFilterBackend, ExpenseOrderingFilter):
+                queryset = backend().filter_queryset(request, queryset, None)
+
+            plan = queryset.explain()
+            self.assertIn(f'USING INDEX {index} ({seek})', plan, params)
+            self.assertNotIn('TEMP B-TREE', plan, params)
+
+
+class ExpenseSearchTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lunch = self.add_expense('12.00', title='Team lunch', description='Lunch with the design team')
+        self.dinner = self.add_expense('40.00', title='Dinner', description='Client dinner after lunch meeting')
+        self.taxi = self.add_expense('30.00', 'transport', title='Airport taxi', description='')
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.add_expense('5.00', title='Lunch', user=other)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/expenses/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranked_prefix_matches_for_current_user(self):
+        self.assertEqual(self.search('lunch'), [self.lunch.id, self.dinner.id])
+        self.assertEqual(self.search('airp'), [self.taxi.id])
+        self.assertEqual(self.search('team LUNCH'), [self.lunch.id])
+        self.assertEqual(self.search('lunch', category='transport'), [])
+
+    def test_index_follows_writes(self):
+        self.taxi.title = 'Airport shuttle lunch'
+        self.taxi.save()
+        Expense.objects.filter(pk=self.dinner.pk).update(description='Client meeting')
+        self.lunch.delete()
+        Expense.objects.bulk_create([
+            Expense(user=self.user, title='Lunch box', amount=Decimal('3.00'), category='food', date=self.today)
+        ])
+
+        self.assertEqual(len(self.search('lunch')), 2)
+        self.assertEqual(self.search('shuttle'), [self.taxi.id])
+
+    def test_cursor_pagination(self):
+        for i in range(5):
+            self.add_expense('1.00', title=f'Lunch {i}')
+        ids, url = [], '/api/expenses/search/?q=lunch&page_size=2'
+        while url:
+            data = self.client.get(url).data
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+
+        self.assertEqual(sorted(ids), sorted(self.search('lunch', page_size=100)))
+        self.assertEqual(len(ids), 7)
+
+    def test_short_terms_on_mysql_match_with_icontains(self):
+        mysql = mock.Mock(vendor='mysql')
+        with mock.patch('expenses.search.connections', {'default': mysql}):
+            self.assertEqual(self.search('ai'), [self.taxi.id])
+            self.assertEqual(self.search('ai TE'), [])
+
+    def test_list_search_filter_and_missing_query(self):
+        response = self.client.get('/api/expenses/', {'search': 'dinner'})
+
+        self.assertEqual([item['id'] for item in response.data['results']], [self.dinner.id])
+        self.assertEqual(self.client.get('/api/expenses/search/').status_code, 400)
+        self.assertEqual(self.search('!!!'), [])
+
+
+class MonthlyGroupedTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.this_month = self.today.replace(day=1)
+        for months_ago in range(4):
+            day = self.this_month - relativedelta(months=months_ago)
+            for amount in ('0.10', '0.20', '0.30'):
+                self.add_expense(amount, days_ago=(self.today - day).days)
+
+    def test_one_query_with_exact_totals(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/expenses/monthly_grouped/').data
+
+        self.assertEqual(len(data['grouped_expenses']), 4)
+        first = data['grouped_expenses'][0]
+        self.assertEqual(first['year_month'], self.this_month.strftime('%Y-%m'))
+        self.assertEqual(first['total_amount'], Decimal('0.60'))
+        self.assertEqual(first['formatted_total'], '₹0.60')
+        self.assertEqual(first['expense_count'], 3)
+        self.assertNotIn('expenses', first)
+        self.assertIsNone(data['next'])
+        self.assertEqual(len([q for q in queries if 'daily_category_totals' in q['sql']]), 1)
+        self.assertFalse([q for q in queries if 'FROM "expenses"' in q['sql']])
+
+    def test_months_are_paginated(self):
+        months, url = [], '/api/expenses/monthly_grouped/?page_size=3'
+        while url:
+            data = self.client.get(url).data
+            months.extend(group['year_month'] for group in data['grouped_expenses'])
+            url = data['next']
+
+        expected = [(self.this_month - relativedelta(months=i)).strftime('%Y-%m') for i in range(4)]
+        self.assertEqual(months, expected)
+
+    def test_expenses_are_fetched_lazily_per_month(self):
+        group = self.client.get('/api/expenses/monthly_grouped/').data['grouped_expenses'][1]
+        page = self.client.get(group['expenses_url'] + '&page_size=2').data
+        rest = self.client.get(page['next']).data
+
+        dates = {item['date'][:7] for item in page['results'] + rest['results']}
+        self.assertEqual(dates, {group['year_month']})
+        self.assertEqual(len(page['results']) + len(rest['results']), group['expense_count'])
+
+    def test_filters_narrow_summaries_and_links(self):
+        self.add_expense('5.00', 'transport', title='Airport taxi')
+        self.add_expense('7.00', 'transport', days_ago=(self.today - self.this_month).days + 40, title='Taxi home')
+
+        for params in ({'category': 'transport'}, {'search': 'taxi'}):
+            groups = self.client.get('/api/expenses/monthly_grouped/', params).data['grouped_expenses']
+            self.assertEqual(len(groups), 2)
+            self.assertEqual(groups[0]['year_month'], self.this_month.strftime('%Y-%m'))
+            self.assertEqual((groups[0]['total_amount'], groups[0]['expense_count']), (Decimal('5.00'), 1))
+            for group in groups:
+                page = self.client.get(group['expenses_url']).data
+                self.assertEqual(len(page['results']), group['expense_count'])
+
+        groups = self.client.get(
+            '/api/expenses/monthly_grouped/', {'search': 'taxi', 'category': 'food'}
+        ).data['grouped_expenses']
+        self.assertEqual(groups, [])
+
+    def test_invalid_params(self):
+        for params in ({'month': '13'}, {'year': 'abcd'}, {'before': '2024/01'}):
+            self.assertEqual(self.client.get('/api/expenses/monthly_grouped/', params).status_code, 400)
+
+
+class BulkExpenseTests(ExpenseAPITestCase):
+    URL = '/api/expenses/bulk/'
+
+    def rollup(self):
+        return {
+            (row.date, row.category): (row.total, row.count)
+            for row in DailyCategoryTotal.objects.filter(user=self.user)
+        }
+
+    def assert_rollup_matches_expenses(self):
+        expected = {}
+        for expense in Expense.objects.filter(user=self.user):
+            total, count = expected.get((expense.date, expense.category), (Decimal('0'), 0))
+            expected[(expense.date, expense.category)] = (total + expense.amount, count + 1)
+        self.assertEqual(self.rollup(), expected)
+
+    def items(self, count, **overrides):
+        return [
+            {
+                'title': f'Item {i}', 'amount': f'{i + 1}.25', 'category': ('food', 'travel')[i % 2],
+                'date': str(self.today - timedelta(days=i % 5)), **overrides
+            }
+            for i in range(count)
+        ]
+
+    def test_create_uses_constant_queries(self):
+        counts = []
+        for size in (5, 50):
+            Expense.objects.all().delete()
+            MonthlySpend.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.URL, self.items(size), format='json')
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        results = response.data['results']
+        self.assertEqual([r['index'] for r in results], list(range(50)))
+        self.assertEqual(results[3]['expense']['title'], 'Item 3')
+        self.assertTrue(Expense.objects.filter(pk=results[3]['expense']['id'], title='Item 3').exists())
+        self.assert_rollup_matches_expenses()
+
+    def test_create_is_all_or_nothing(self):
+        items = self.items(3)
+        items[1]['amount'] = '-4'
+        response = self.client.post(self.URL, items, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['skipped', 'invalid', 'skipped'])
+        self.assertIn('amount', response.data['results'][1]['errors'])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_update(self):
+        expenses = [self.add_expense('10.00', 'food', days_ago=i) for i in range(4)]
+        payload = [
+            {'id': expenses[0].id, 'amount': '99.00'},
+            {'id': expenses[1].id, 'category': 'travel', 'date': str(self.today - timedelta(days=9))},
+            {'id': str(expenses[2].id), 'title': '  Renamed  '},
+        ]
+        response = self.client.patch(self.URL, payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']], ['updated'] * 3)
+        self.assertEqual(response.data['results'][2]['expense']['title'], 'Renamed')
+        expenses[0].refresh_from_db()
+        self.assertEqual(expenses[0].amount, Decimal('99.00'))
+        self.assert_rollup_matches_expenses()
+
+    def test_update_failures_change_nothing(self):
+        expense = self.add_expense('10.00')
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        foreign = self.add_expense('5.00', user=other)
+        payload = [
+            {'id': expense.id, 'amount': '20.00'},
+            {'id': foreign.id, 'amount': '1.00'},
+            {'id': expense.id, 'amount': '30.00'},
+            {'amount': '1.00'},
+        ]
+        response = self.client.patch(self.URL, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [r['status'] for r in response.data['results']], ['skipped', 'not_found', 'invalid', 'invalid']
+        )
+        expense.refresh_from_db()
+        self.assertEqual(expense.amount, Decimal('10.00'))
+
+    def test_delete(self):
+        expenses = [self.add_expense('10.00', days_ago=i % 2) for i in range(4)]
+        response = self.client.delete(self.URL, [expenses[0].id, expenses[1].id, 999999], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']], ['deleted', 'deleted', 'not_found'])
+        self.assertEqual(Expense.objects.count(), 2)
+        self.assert_rollup_matches_expenses()
+
+    def test_limits(self):
+        self.assertEqual(self.client.post(self.URL, [], format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.URL, self.items(501), format='json').status_code, 400)
+        self.assertEqual(self.client.delete(self.URL, ['x'], format='json').status_code, 400)
+
+
+class ExpenseImportTests(ExpenseAPITestCase):
+    CSV = (
+        'Title,Amount,Date,Category,Description\n'
+        'Lunch,12.50,2024-03-01,food,With team\n'
+        'Broken,-3,2024-03-02,food,\n'
+        'Taxi,30,2024-03-02,transport,"Airport,\nlate night"\n'
+        '   ,5,2024-03-03,food,\n'
+        'Cinema,15,03/04/2024,entertainment,\n'
+        'Books,40,2024-03-05,,\n'
+    )
+
+    def upload(self, text, name='expenses.csv'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile(name, text.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+
+    def test_upload_imports_valid_rows_and_reports_lines(self):
+        response = self.upload(self.CSV)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual([e['line'] for e in response.data['errors']], [3, 6, 7])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertIn('title', response.data['errors'][1]['errors'])
+        self.assertIn('date', response.data['errors'][2]['errors'])
+
+        taxi = Expense.objects.get(title='Taxi')
+        self.assertEqual(taxi.description, 'Airport,\nlate night')
+        self.assertEqual(Expense.objects.get(title='Books').category, 'other')
+        self.assertEqual(
+            DailyCategoryTotal.objects.get(user=self.user, category='transport').total, Decimal('30.00')
+        )
+
+    def test_missing_columns(self):
+        response = self.upload('name,cost\nLunch,5\n')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.data['error'])
+        self.assertEqual(self.client.post('/api/expenses/import/', {}, format='multipart').status_code, 400)
+
+    def test_unreadable_tail_reports_committed_rows(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .importing import DEFAULT_BATCH_SIZE
+
+        good = ''.join(f'Item {i},1,2024-01-01,food,\n' for i in range(DEFAULT_BATCH_SIZE + 5))
+        body = ('title,amount,date,category,description\n' + good).encode() + b'Bad \xff\xfe,1,2024-01-01,food,\n'
+        upload = SimpleUploadedFile('expenses.csv', body, content_type='text/csv')
+        response = self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        imported = Expense.objects.filter(user=self.user).count()
+        self.assertGreater(imported, 0)
+        self.assertEqual(response.data['imported'], imported)
+        self.assertLessEqual(response.data['stopped_after_line'], DEFAULT_BATCH_SIZE + 6)
+        self.assertIn(f'{imported} expenses before it were imported', response.data['error'])
+
+    def test_command_reports_malformed_csv(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,amount,date\nLunch,5,2024-01-01\n' + 'x' * 200 + ',5,2024-01-02\n')
+        self.addCleanup(os.remove, f.name)
+        self.addCleanup(csv.field_size_limit, csv.field_size_limit(100))
+
+        with self.assertRaisesMessage(CommandError, 'after line 2'):
+            call_command('import_expenses', f.name, user=self.user.email, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+
+    def test_command_writes_in_batches(self):
+        import tempfile
+
+        rows = ''.join(f'Item {i},{i + 1},2024-01-{i % 28 + 1:02d},food,\n' for i in range(25))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,amount,date,category,description\n' + rows + 'Bad,zero,2024-01-01,food,\n')
+        self.addCleanup(os.remove, f.name)
+
+        out, err = StringIO(), StringIO()
+        batches, bulk_create = [], Expense.objects.bulk_create
+
+        def record(objs, *args, **kwargs):
+            batches.append(len(objs))
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Expense.objects, 'bulk_create', side_effect=record):
+            call_command(
+                'import_expenses', f.name, user=self.user.email, batch_size=10, stdout=out, stderr=err
+            )
+
+        self.assertEqual(batches, [10, 10, 5])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 25)
+        self.assertIn('Imported 25 expenses', out.getvalue())
+        self.assertIn('Line 27: amount', err.getvalue())
+
+
+class ExportFileTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            self.add_expense(f'{i + 1}.50', 'food' if i % 2 else 'travel', days_ago=i, title=f'Item {i}')
+
+    def test_csv_streams_from_keyset_batches_and_round_trips(self):
+        from .importing import read_rows
+
+        with mock.patch('expenses.exporting.iterate_keyset', wraps=iterate_keyset) as iterate:
+            response = self.client.get('/api/expenses/export_csv/', {'category': 'food'})
+            content = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.csv"')
+        iterate.assert_called_once()
+        rows = [data for _, data in read_rows(StringIO(content))]
+        self.assertEqual([row['title'] for row in rows], ['Item 1', 'Item 3', 'Item 5'])
+        self.assertEqual(rows[0], {
+            'title': 'Item 1', 'amount': '2.50', 'category': 'food',
+            'date': str(self.today - timedelta(days=1))
+        })
+
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get('/api/expenses/export_xlsx/', {
+            'start_date': str(self.today - timedelta(days=2))
+        })
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.xlsx"')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0][:5], ('ID', 'Date', 'Title', 'Category', 'Amount'))
+        self.assertEqual([row[2] for row in rows[1:]], ['Item 0', 'Item 1', 'Item 2'])
+        self.assertEqual(rows[1][4], 1.5)
+
+    def test_report_exports(self):
+        csv_response = self.client.get('/api/reports/export/csv/')
+        content = b''.join(csv_response.streaming_content).decode()
+        self.assertEqual(csv_response['Content-Disposition'], 'attachment; filename="report.csv"')
+        self.assertIn('Total expenses,31.5', content)
+        self.assertIn('Food,', content)
+
+        xlsx_response = self.client.get('/api/reports/export/xlsx/')
+        from openpyxl import load_workbook
+        workbook = load_workbook(BytesIO(b''.join(xlsx_response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ['Summary', 'Categories', 'Monthly trend'])
+
+        self.assertEqual(self.client.get('/api/reports/export/pdf/').status_code, 404)
+        self.assertEqual(self.client.get('/api/reports/export/csv/', {'end_date': 'x'}).status_code, 400)
+
+
+class IdempotencyKeyTests(ExpenseAPITestCase):
+    URL = '/api/expenses/'
+
+    def payload(self, **overrides):
+        return {
+            'title': 'Lunch', 'amount': '12.50', 'category': 'food',
+            'date': str(self.today), **overrides
+        }
+
+    def post(self, data, key='key-1', url=URL):
+        return self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_touching_expenses(self):
+        first = self.post(self.payload())
+        self.assertEqual(first.status_code, 201)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.post(self.payload())
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any('"expenses"' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+
+    def test_owner_row_is_locked_before_key_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post(self.payload()).status_code, 201)
+
+        sql = [query['sql'] for query in queries.captured_queries]
+        key_insert = next(i for i, query in enumerate(sql) if query.startswith('INSERT INTO "idempotency_keys"'))
+        self.assertTrue(any(query.startswith('SELECT') and 'FROM "auth_user"' in query for query in sql[:key_insert]))
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self.post(self.payload())
+        response = self.post(self.payload(amount='99.00'))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.post(self.payload())
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.post(self.payload()).status_code, 201)
+        self.assertEqual(Expense.objects.count(), 2)
+
+    def test_failed_request_is_not_stored(self):
+        response = self.post(self.payload(amount='-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post(self.payload())
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_expired_key_runs_again(self):
+        self.post(self.payload())
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        response = self.post(self.payload())
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_invalid_key_is_rejected(self):
+        self.assertEqual(self.post(self.payload(), key='x' * 256).status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post(self.URL, self.payload(), format='json')
+        self.client.post(self.URL, self.payload(), format='json')
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_recurring_create_is_idempotent(self):
+        data = {
+            'title': 'Rent', 'amount': '800.00', 'category': 'utilities',
+            'frequency': 'monthly', 'start_date': str(self.today), 'next_date': str(self.today)
+        }
+        first = self.post(data, url='/api/recurring/')
+        second = self.post(data, url='/api/recurring/')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(RecurringExpense.objects.filter(user=self.user).count(), 1)
+
+    def test_purge_deletes_expired_keys(self):
+        self.post(self.payload(), key='old')
+        self.post(self.payload(), key='new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class RecurringTestCase(ExpenseAPITestCase):
+    """
+    Base test case with helpers for recurring expense generation
+    """
+
+    def add_rule(self, frequency='weekly', days_ago=21, user=None, **kwargs):
+        start = self.today - timedelta(days=days_ago)
+        return RecurringExpense.objects.create(
+            user=user or self.user, title=kwargs.pop('title', 'Gym'), amount=Decimal('20.00'),
+            category='healthcare', frequency=frequency, start_date=start, next_date=start, **kwargs
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('run_recurring', *args, stdout=out)
+        return out.getvalue()
+
+
+class RunRecurringTests(RecurringTestCase):
+
+    def test_catches_up_missed_periods(self):
+        rule = self.add_rule()
+        output = self.run_command()
+
+        self.assertIn('Generated 4 expenses from 1 recurring expenses', output)
+        self.assertEqual(
+            sorted(Expense.objects.filter(user=self.user).values_list('date', flat=True)),
+            [self.today - timedelta(days=days) for days in (21, 14, 7, 0)]
+        )
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, self.today + timedelta(days=7))
+        self.assertTrue(rule.is_active)
+
+        self.assertIn('Generated 0 expenses', self.run_command())
+        self.assertEqual(Expense.objects.count(), 4)
+
+    def test_stops_at_end_date(self):
+        rule = self.add_rule('daily', days_ago=10, end_date=self.today - timedelta(days=5))
+        self.run_command()
+
+        self.assertEqual(Expense.objects.count(), 6)
+        rule.refresh_from_db()
+        self.assertFalse(rule.is_active)
+
+    def test_processes_all_users_in_batches(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        for days_ago in (0, 7, 14):
+            self.add_rule(days_ago=days_ago)
+            self.add_rule(days_ago=days_ago, user=other)
+        self.add_rule(is_active=False)
+        version = User.objects.get(pk=other.pk).data_version
+
+        self.run_command('--batch-size', '2')
+
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(Expense.objects.filter(user=other).count(), 6)
+        self.assertGreater(User.objects.get(pk=other.pk).data_version, version)
+        self.assertEqual(
+            DailyCategoryTotal.objects.filter(user=other).aggregate(total=Sum('count'))['total'], 6
+        )
+
+    def test_batch_uses_constant_queries(self):
+        counts = []
+        for rules in (2, 20):
+            RecurringExpense.objects.all().delete()
+            Expense.objects.all().delete()
+            MonthlySpend.objects.all().delete()
+            for _ in range(rules):
+                self.add_rule()
+            with CaptureQueriesContext(connection) as queries:
+                self.run_command('--batch-size', '100')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_batch_queries_do_not_grow_with_users(self):
+        users = [self.user] + [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pass12345')
+            for i in range(19)
+        ]
+        counts = []
+        for owners in (users[:2], users):
+            RecurringExpense.objects.all().delete()
+            Expense.objects.all().delete()
+            MonthlySpend.objects.all().delete()
+            for user in owners:
+                self.add_rule(user=user)
+            with CaptureQueriesContext(connection) as queries:
+                self.run_command('--batch-size', '100')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(MonthlySpend.objects.aggregate(total=Sum('total'))['total'], Decimal('20.00') * 4 * 20)
+
+    def test_date_option(self):
+        self.add_rule(days_ago=0)
+        self.run_command('--date', str(self.today + timedelta(days=14)))
+        self.assertEqual(Expense.objects.count(), 3)
+
+    def test_generate_expenses_endpoint_only_touches_own_rules(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        self.add_rule()
+        self.add_rule(user=other)
+
+        response = self.client.post('/api/recurring/generate_expenses/')
+        self.assertEqual(response.json()['generated_count'], 4)
+        self.assertFalse(Expense.objects.filter(user=other).exists())
+
+
+class SerialExecutor:
+    """Runs ProcessPoolExecutor submissions in the test process, in order."""
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        initializer(*initargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class ShardedRecurringTests(RecurringTestCase):
+
+    def setUp(self):
+        super().setUp()
+        users = [self.user] + [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pass12345')
+            for i in range(5)
+        ]
+        for i, user in enumerate(users):
+            self.add_rule('daily', days_ago=10 + i, user=user)
+            self.add_rule('weekly', days_ago=30, user=user, end_date=self.today - timedelta(days=i))
+
+    def generated(self):
+        return set(Expense.objects.values_list('recurring_id', 'occurrence_date', 'amount'))
+
+    def reset(self):
+        Expense.objects.all().delete()
+        RecurringExpense.objects.update(next_date=models.F('start_date'), is_active=True)
+
+    def test_results_do_not_depend_on_shard_count(self):
+        results = []
+        for shards in (1, 2, 4):
+            self.reset()
+            for shard in range(shards):
+                generate_due_expenses(self.today, shard_queryset(shard, shards), batch_size=3)
+            results.append(self.generated())
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(
+            DailyCategoryTotal.objects.aggregate(total=Sum('count'))['total'], len(results[0])
+        )
+
+    def test_workers_option_reports_each_shard(self):
+        self.run_command()
+        expected = self.generated()
+        self.reset()
+
+        # The workers run in this process, inside the test transaction, so
+        # their connection cleanup must not close it
+        with mock.patch('expenses.management.commands.run_recurring.ProcessPoolExecutor', SerialExecutor), \
+                mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch('expenses.workers.connections.close_all') as close_all:
+            output = self.run_command('--workers', '3', '-v', '2')
+
+        # The parent before starting the pool, init_worker, then each shard
+        self.assertEqual(close_all.call_count, 1 + 1 + 3)
+        self.assertEqual(self.generated(), expected)
+        for shard in range(3):
+            self.assertIn(f'shard {shard}/3:', output)
+        self.assertIn(f'Generated {len(expected)} expenses from 12 recurring expenses', output)
+
+
+class RecurringOccurrenceTests(RecurringTestCase):
+    URL = '/api/recurring/generate_all_recurring_expenses/'
+
+    def test_generate_all_skips_existing_occurrences_only(self):
+        self.add_rule('daily', days_ago=0)
+        # Overlapping titles on the same day no longer count as duplicates
+        self.add_expense('5.00', title='Gym class')
+
+        first = self.client.post(self.URL).json()
+        second = self.client.post(self.URL).json()
+
+        month_end = (self.today.replace(day=1) + relativedelta(months=1)) - timedelta(days=1)
+        self.assertEqual(first['generated_count'], (month_end - self.today).days + 1)
+        self.assertEqual(second['generated_count'], 0)
+        self.assertEqual(
+            Expense.objects.filter(recurring__isnull=False).count(), first['generated_count']
+        )
+
+    def test_generate_all_uses_one_lookup(self):
+        for _ in range(5):
+            self.add_rule('daily', days_ago=0)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.URL)
+        lookups = [
+            query for query in queries.captured_queries
+            if 'FROM "expenses"' in query['sql'] and '"occurrence_date"' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_monthly_rule_started_before_this_month(self):
+        start = (self.today - relativedelta(months=3)).replace(day=15)
+        RecurringExpense.objects.create(
+            user=self.user, title='Rent', amount=Decimal('800.00'), category='utilities',
+            frequency='monthly', start_date=start, next_date=start
+        )
+        self.client.post(self.URL)
+        self.assertEqual(
+            list(Expense.objects.values_list('occurrence_date', flat=True)),
+            [self.today.replace(day=15)]
+        )
+
+    def test_scheduler_and_endpoint_do_not_duplicate(self):
+        self.add_rule(days_ago=21)
+        self.client.post(self.URL)
+        self.run_command()
+        self.run_command()
+        dates = list(Expense.objects.values_list('recurring_id', 'occurrence_date'))
+        self.assertEqual(len(dates), len(set(dates)))
+        self.assertEqual(
+            DailyCategoryTotal.objects.aggregate(total=Sum('count'))['total'], len(dates)
+        )
+
+    def test_concurrent_insert_returns_only_new_rows(self):
+        from . import recurring
+
+        rule = self.add_rule('daily', days_ago=2)
+        dates = [self.today - timedelta(days=days) for days in (2, 1, 0)]
+        recurring.create_occurrences([(rule, dates[1])])
+
+        real = recurring.existing_occurrences
+        reads = []
+
+        def existing(occurrences, lock=False):
+            # The first read misses the row "another writer" inserted
+            reads.append(lock)
+            return real(occurrences, lock) if len(reads) > 1 else set()
+
+        with mock.patch.object(recurring, 'existing_occurrences', side_effect=existing), \
+                mock.patch('expenses.rollups.refresh_keys') as refresh:
+            created = recurring.create_occurrences([(rule, day) for day in dates])
+
+        self.assertEqual([expense.occurrence_date for expense in created], [dates[0], dates[2]])
+        self.assertEqual(reads, [False, True])
+        refresh.assert_not_called()
+        self.assertEqual(Expense.objects.filter(recurring=rule).count(), 3)
+        self.assertEqual(DailyCategoryTotal.objects.aggregate(total=Sum('count'))['total'], 3)
+
+    def test_repeated_conflicts_fall_back_to_single_rows(self):
+        from . import recurring
+
+        rule = self.add_rule('daily', days_ago=2)
+        dates = [self.today - timedelta(days=days) for days in (2, 1, 0)]
+        recurring.create_occurrences([(rule, dates[1])])
+
+        # Every read misses the row, as if it were inserted again each time
+        def existing(occurrences, lock=False):
+            reads.append(lock)
+            return set()
+
+        reads = []
+        with mock.patch.object(recurring, 'existing_occurrences', side_effect=existing):
+            created = recurring.create_occurrences([(rule, day) for day in dates])
+
+        self.assertEqual([expense.occurrence_date for expense in created], [dates[0], dates[2]])
+        self.assertEqual(reads, [False] + [True] * recurring.INSERT_ATTEMPTS)
+        self.assertEqual(Expense.objects.filter(recurring=rule).count(), 3)
+        self.assertEqual(DailyCategoryTotal.objects.aggregate(total=Sum('count'))['total'], 3)
+
+    def test_deleting_rule_keeps_its_expenses(self):
+        rule = self.add_rule()
+        self.run_command()
+        rule.delete()
+        self.assertEqual(Expense.objects.filter(recurring__isnull=True).count(), 4)
+
+
+class ScheduleTests(TestCase):
+    STEPS = {
+        'daily': relativedelta(days=1),
+        'weekly': relativedelta(weeks=1),
+        'monthly': relativedelta(months=1),
+        'yearly': relativedelta(years=1),
+    }
+
+    def reference(self, start_date, frequency, end_date, start, end):
+        """Occurrences computed one at a time from start_date with dateutil."""
+        dates = []
+        for k in range(5000):
+            occurrence = start_date + self.STEPS[frequency] * k
+            if occurrence > end or (end_date and occurrence > end_date):
+                return dates
+            if occurrence >= start:
+                dates.append(occurrence)
+        return dates
+
+    def between(self, start_date, frequency, start, end, end_date=None):
+        return Schedules([start_date], [frequency], [end_date]).between(start, end)[1].tolist()
+
+    def test_month_end_anchor_is_clamped_not_drifting(self):
+        dates = self.between(date(2024, 1, 31), 'monthly', date(2024, 1, 1), date(2024, 5, 31))
+        self.assertEqual(
+            dates,
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31)]
+        )
+
+    def test_leap_day_yearly(self):
+        dates = self.between(date(2024, 2, 29), 'yearly', date(2024, 1, 1), date(2028, 12, 31))
+        self.assertEqual(
+            dates,
+            [date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)]
+        )
+
+    def test_end_date_is_inclusive(self):
+        dates = self.between(
+            date(2024, 1, 1), 'weekly', date(2024, 1, 1), date(2024, 12, 31), end_date=date(2024, 1, 15)
+        )
+        self.assertEqual(dates, [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)])
+
+    def test_next_after(self):
+        schedules = Schedules(
+            [date(2024, 1, 31), date(2024, 1, 3)], ['monthly', 'weekly']
+        )
+        self.assertEqual(
+            schedules.next_after(date(2024, 2, 29)).tolist(), [date(2024, 3, 31), date(2024, 3, 6)]
+        )
+        self.assertEqual(schedules.next_after(date(2023, 1, 1)).tolist(), [date(2024, 1, 31), date(2024, 1, 3)])
+
+    def test_matches_reference_for_random_rules(self):
+        generator = random.Random(7)
+        rules = []
+        for _ in range(400):
+            start_date = date(2020, 1, 1) + timedelta(days=generator.randrange(1500))
+            end_date = start_date + timedelta(days=generator.randrange(900)) if generator.random() < 0.3 else None
+            start = date(2021, 1, 1) + timedelta(days=generator.randrange(1000))
+            rules.append((start_date, generator.choice(list(FREQUENCY_STEPS)), end_date, start))
+        end = date(2024, 6, 30)
+
+        indexes, dates = Schedules(
+            [rule[0] for rule in rules], [rule[1] for rule in rules], [rule[2] for rule in rules]
+        ).between([rule[3] for rule in rules], end)
+        actual = {}
+        for index, occurrence in zip(indexes.tolist(), dates.tolist()):
+            actual.setdefault(index, []).append(occurrence)
+
+        for index, (start_date, frequency, end_date, start) in enumerate(rules):
+            self.assertEqual(
+                actual.get(index, []), self.reference(start_date, frequency, end_date, start, end),
+                (start_date, frequency, end_date, start)
+            )
+
+    def test_unknown_frequency(self):
+        with self.assertRaises(ValueError):
+            Schedules([date(2024, 1, 1)], ['hourly'])
+
+    def test_calculate_next_date_keeps_month_end(self):
+        rule = RecurringExpense(start_date=date(2024, 1, 31), next_date=date(2024, 2, 29), frequency='monthly')
+        self.assertEqual(rule.calculate_next_date(), date(2024, 3, 31))
+
+
+class RecurringProjectionTests(RecurringTestCase):
+    URL = '/api/recurring/projection/'
+
+    def add_monthly(self, amount, day, category='utilities', **kwargs):
+        start = (self.today.replace(day=1) - relativedelta(months=2)).replace(day=day)
+        return RecurringExpense.objects.create(
+            user=self.user, title='Bill', amount=Decimal(amount), category=category,
+            frequency='monthly', start_date=start, next_date=start, **kwargs
+        )
+
+    def test_projects_months_without_writing(self):
+        self.add_monthly('100.00', 28)
+        self.add_monthly('10.00', 28, category='entertainment', is_active=False)
+        self.add_expense('40.00', category='utilities')
+
+        response = self.client.get(f'{self.URL}?months=3')
+        self.assertEqual(response.status_code, 200)
+        months = response.json()['months']
+
+        self.assertEqual(len(months), 3)
+        self.assertEqual(months[0]['month'], self.today.strftime('%Y-%m'))
+        self.assertEqual(months[0]['actual'], 40.0)
+        # This month's occurrence is not generated yet, even if the 28th has passed
+        self.assertEqual(months[0]['projected'], 100.0)
+        for month in months[1:]:
+            self.assertEqual(month['categories'], {
+                'utilities': {'actual': 0.0, 'projected': 100.0, 'total': 100.0, 'occurrences': 1}
+            })
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def get(self, url=URL):
+        # Authentication reloads the user on every request
+        self.user.refresh_from_db()
+        return self.client.get(url)
+
+    def test_projection_is_cached_by_recurring_version(self):
+        self.add_monthly('100.00', 1)
+        self.get()
+
+        self.add_expense('5.00')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get()
+        self.assertFalse(any('recurring_expenses' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(response.json()['months'][0]['actual'], 5.0)
+
+        self.add_monthly('50.00', 1)
+        # The current month's occurrence on the 1st is due but not generated
+        self.assertEqual(self.get().json()['projected_total'], 150.0 * 6)
+
+    def test_stale_user_save_keeps_recurring_version(self):
+        self.add_monthly('100.00', 1)
+        stale = User.objects.get(pk=self.user.pk)
+        self.get()
+
+        self.add_monthly('50.00', 1)
+        stale.monthly_budget = Decimal('2000.00')
+        stale.save()
+        self.assertEqual(self.get().json()['projected_total'], 150.0 * 6)
+
+    def test_generated_occurrences_move_from_projected_to_actual(self):
+        self.add_monthly('100.00', 1)
+        self.assertEqual(self.get().json()['months'][0]['projected'], 100.0)
+
+        self.run_command()
+        month = self.get().json()['months'][0]
+        self.assertEqual((month['actual'], month['projected']), (100.0, 0))
+
+    def test_invalid_months(self):
+        for value in ('0', '25', 'x'):
+            self.assertEqual(self.client.get(f'{self.URL}?months={value}').status_code, 400)
+
+
+class LoggingTests(RecurringTestCase):
+
+    def record(self, level, message='message'):
+        return logging.LogRecord('expenses', level, __file__, 1, message, None, None)
+
+    def test_no_count_query_unless_debug_logging(self):
+        self.add_rule()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/recurring/')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        with self.assertLogs('expenses.views', 'DEBUG') as logs:
+            self.client.get('/api/recurring/')
+        self.assertIn(f'User {self.user.pk} has 1 recurring expenses', logs.output[0])
+
+    def test_queue_handler_writes_from_background_thread(self):
+        stream = StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('expenses', logging.ERROR, __file__, 1, 'failed %s', ('x',), sys.exc_info())
+        handler.handle(record)
+        handler.close()
+
+        output = stream.getvalue()
+        self.assertTrue(output.startswith('ERROR failed x\n'))
+        self.assertIn('ValueError: boom', output)
+
+    def test_queue_handler_drops_when_full_and_reports_it(self):
+        stream = StringIO()
+        handler = QueueStreamHandler(stream, queue_size=1)
+        # Keep the writer from draining the queue
+        with mock.patch.object(QueueListener, 'start'):
+            for _ in range(3):
+                handler.handle(self.record(logging.INFO))
+        self.assertEqual(handler.dropped, 2)
+        handler.close()
+        self.assertIn('Dropped 2 log records', stream.getvalue())
+
+    def test_queue_handler_starts_writer_per_process(self):
+        stream = StringIO()
+        handler = QueueStreamHandler(stream)
+        self.assertIsNone(handler.listener)
+
+        handler.handle(self.record(logging.INFO, 'parent'))
+        parent = handler.listener
+        self.assertEqual(handler.pid, os.getpid())
+        # A forked child has the parent's handler but not its thread
+        with mock.patch('expense_tracker.logs.os.getpid', return_value=-1):
+            handler.handle(self.record(logging.INFO, 'child'))
+            self.assertIsNot(handler.listener, parent)
+            handler.close()
+        parent.stop()
+        self.assertEqual(sorted(stream.getvalue().split()), ['child', 'parent'])
+
+    @override_settings(LOG_SAMPLE_RATE=0)
+    def test_unsampled_requests_keep_warnings_only(self):
+        sample = RequestSampleFilter()
+        kept = {}
+
+        def view(request):
+            kept['info'] = sample.filter(self.record(logging.INFO))
+            kept['warning'] = sample.filter(self.record(logging.WARNING))
+
+        RequestSamplingMiddleware(view)(None)
+        self.assertEqual(kept, {'info': False, 'warning': True})
+        self.assertTrue(sample.filter(self.record(logging.INFO)))
+
+
+class BudgetAlertTests(ExpenseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.user.pk).update(monthly_budget=Decimal('1000.00'), alert_threshold=80)
+        self.month = self.today.replace(day=1)
+        # Keep every expense in the current month
+        self.days_ago = 0
+
+    def notifications(self):
+        return list(Notification.objects.filter(user=self.user).order_by('id').values_list('type', flat=True))
+
+    def month_total(self, month=None):
+        return MonthlySpend.objects.get(user=self.user, month=month or self.month).total
+
+    def test_one_notification_per_threshold_per_month(self):
+        self.add_expense('500.00')
+        self.assertEqual(self.notifications(), [])
+
+        expense = self.add_expense('350.00')
+        self.assertEqual(self.notifications(), ['budget_alert'])
+        self.add_expense('10.00')
+        self.assertEqual(self.notifications(), ['budget_alert'])
+
+        self.add_expense('200.00')
+        self.assertEqual(self.notifications(), ['budget_alert', 'budget_exceeded'])
+
+        expense.delete()
+        self.add_expense('350.00')
+        self.assertEqual(self.notifications(), ['budget_alert', 'budget_exceeded'])
+        self.assertEqual(MonthlySpend.objects.get(user=self.user).alert_level, MonthlySpend.ALERT_EXCEEDED)
+
+    def test_crossing_both_thresholds_sends_exceeded_only(self):
+        response = self.client.post(
+            '/api/expenses/bulk/',
+            [{'title': 'TV', 'amount': '700.00', 'date': str(self.today), 'category': 'shopping'},
+             {'title': 'Sofa', 'amount': '600.00', 'date': str(self.today), 'category': 'shopping'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.notifications(), ['budget_exceeded'])
+        self.assertIn('over your budget', Notification.objects.get(user=self.user).message)
+
+    def test_update_raising_amount_alerts(self):
+        expense = self.add_expense('100.00')
+        self.client.patch(f'/api/expenses/{expense.pk}/', {'amount': '900.00'}, format='json')
+        self.assertEqual(self.notifications(), ['budget_alert'])
+
+    def test_disabled_alerts_and_other_months(self):
+        last_month = self.month - relativedelta(months=1)
+        Expense.objects.create(
+            user=self.user, title='old', amount=Decimal('5000.00'), category='other', date=last_month
+        )
+        self.assertEqual(self.notifications(), [])
+        self.assertEqual(self.month_total(last_month), Decimal('5000.00'))
+
+        User.objects.filter(pk=self.user.pk).update(enable_alerts=False)
+        self.add_expense('5000.00')
+        self.assertEqual(self.notifications(), [])
+
+    def test_rebuild_does_not_notify(self):
+        self.add_expense('900.00')
+        Notification.objects.all().delete()
+        MonthlySpend.objects.update(total=Decimal('0'), alert_level=MonthlySpend.ALERT_NONE)
+        DailyCategoryTotal.objects.all().delete()
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.month_total(), Decimal('900.00'))
+        self.assertEqual(self.notifications(), [])
+
+    def test_running_total_follows_every_write_path(self):
+        expense = self.add_expense('10.00')
+        Expense.objects.bulk_create([
+            Expense(user=self.user, title='a', amount=Decimal('5.00'), category='food', date=self.today)
+            for _ in range(3)
+        ])
+        Expense.objects.filter(user=self.user, title='a').update(amount=Decimal('6.00'))
+        expense.delete()
+        self.assertEqual(self.month_total(), Decimal('18.00'))
+
+        MonthlySpend.objects.update(total=Decimal('0'))
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.month_total(), Decimal('18.00'))
+
+
+class NotificationFeedTests(ExpenseAPITestCase):
+    URL = '/api/notifications/'
+
+    def notify(self, count, user=None, **kwargs):
+        return Notification.objects.bulk_create([
+            Notification(user=user or self.user, title=f'N{i}', message='m', type='budget_alert', **kwargs)
+            for i in range(count)
+        ])
+
+    def unread(self, user=None):
+        return User.objects.get(pk=(user or self.user).pk).unread_notifications
+
+    def get(self, url=None):
+        self.user.refresh_from_db()
+        return self.client.get(url or self.URL)
+
+    def test_counter_follows_writes(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        created = self.notify(3)
+        self.notify(2, user=other)
+        self.notify(1, is_read=True)
+        single = Notification.objects.create(user=self.user, title='t', message='m', type='budget_alert')
+        self.assertEqual((self.unread(), self.unread(other)), (4, 2))
+
+        created[0].is_read = True
+        created[0].save()
+        created[0].save()
+        self.assertEqual(self.unread(), 3)
+        single.delete()
+        Notification.objects.filter(user=other).delete()
+        self.assertEqual((self.unread(), self.unread(other)), (2, 0))
+
+        Notification.objects.filter(user=self.user).update(is_read=False)
+        self.assertEqual(self.unread(), 4)
+
+    def test_owner_row_is_locked_before_notification_writes(self):
+        created = self.notify(1)
+        actions = [
+            lambda: self.notify(1),
+            lambda: Notification.objects.create(user=self.user, title='t', message='m', type='budget_alert'),
+            lambda: Notification.objects.filter(pk=created[0].pk).update(is_read=True),
+            lambda: Notification.objects.filter(user=self.user).delete(),
+        ]
+        for action in actions:
+            with CaptureQueriesContext(connection) as queries:
+                action()
+            writes = [
+                query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            ]
+            self.assertTrue(writes[0].startswith('UPDATE "auth_user"'), writes[0])
+
+    def test_counter_does_not_go_below_zero(self):
+        created = self.notify(2)
+        User.objects.filter(pk=self.user.pk).update(unread_notifications=1)
+
+        Notification.objects.filter(pk__in=[row.pk for row in created]).delete()
+        self.assertEqual(self.unread(), 0)
+
+    def test_feed_pages_unread_first(self):
+        self.notify(3, is_read=True)
+        self.notify(12)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread_count'], 12)
+        self.assertEqual(len(response.data['notifications']), 10)
+        self.assertIsNotNone(response.data['next'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get(response.data['next'])
+        self.assertEqual(len(queries), 2)  # refresh_from_db, then the page
+        rows = response.data['notifications'] + second.data['notifications']
+        self.assertEqual(len({row['id'] for row in rows}), 15)
+        self.assertEqual([row['is_read'] for row in rows], [False] * 12 + [True] * 3)
+        self.assertIsNone(second.data['next'])
+
+        unread = self.get(self.URL + '?unread=1')
+        self.assertTrue(all(not row['is_read'] for row in unread.data['notifications']))
+        self.assertEqual(self.get(self.URL + '?cursor=bogus').status_code, 404)
+
+    def test_mark_read(self):
+        notification = self.notify(2)[0]
+        for _ in range(2):
+            response = self.client.post(self.URL, {'notification_id': notification.id}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(self.client.post(self.URL, {'notification_id': 'x'}, format='json').status_code, 404)
+        self.assertEqual(self.client.post(self.URL, {'notification_id': 0}, format='json').status_code, 404)
+
+        self.client.post(self.URL, {'all': True}, format='json')
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(self.get().data['unread_count'], 0)
+
+    def test_stale_user_save_then_mark_read(self):
+        stale = User.objects.get(pk=self.user.pk)
+        notification = self.notify(1)[0]
+
+        self.client.force_authenticate(user=stale)
+        response = self.client.put('/api/budget/', {'monthly_budget': '3000.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 1)
+
+        response = self.client.post(self.URL, {'notification_id': notification.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(User.objects.get(pk=self.user.pk).monthly_budget, Decimal('3000.00'))
+
+    def test_budget_alerts_count_as_unread(self):
+        User.objects.filter(pk=self.user.pk).update(monthly_budget=Decimal('100.00'))
+        self.add_expense('150.00')
+        self.assertEqual(self.unread(), 1)
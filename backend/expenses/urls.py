@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -9,6 +9,7 @@ router.register(r'recurring', views.RecurringExpenseViewSet, basename='recurring
 urlpatterns = [
     path('', include(router.urls)),
     path('reports/', views.ReportsView.as_view(), name='reports'),
+    re_path(r'^reports/export/(?P<file_type>csv|xlsx)/$', views.ReportExportView.as_view(), name='reports_export'),
     path('reports/spending_trend/', views.SpendingTrendView.as_view(), name='reports_spending_trend'),
     path('reports/category_summary/', views.CategorySummaryView.as_view(), name='reports_category_summary'),
     path('notifications/', views.NotificationsView.as_view(), name='notifications'),
@@ -1,86 +1,183 @@
+import io
+import logging
 from rest_framework import viewsets, status, permissions
 from rest_framework import viewsets, status, permissions, generics
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db import models
-from django.db.models import Sum, Count, Q
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils import timezone
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from .models import Expense, RecurringExpense
+from .models import Expense, RecurringExpense, DailyCategoryTotal
+from .caching import cached_report, currency_extra, etag_for_data_version, today_extra
+from .analytics import (
+    TREND_STEPS,
+    expense_stats,
+    expense_report,
+    category_summary,
+    month_summaries,
+    spending_trend
+)
+from .formatting import currency_formatter
+from expense_tracker.logs import debug_enabled
 from .serializers import (
     ExpenseSerializer, 
     ExpenseCreateSerializer, 
     ExpenseStatsSerializer,
     RecurringExpenseSerializer
 )
-from rest_framework.pagination import PageNumberPagination
+from .pagination import (
+    KeysetPagination,
+    NotificationPagination,
+    RankedKeysetPagination,
+    iterate_keyset
+)
+from .filters import ExpenseFilterBackend, ExpenseOrderingFilter
+from .idempotency import idempotent
+from .recurring import create_occurrences, generate_due_expenses
+from .schedule import expand
+from .projection import (
+    DEFAULT_PROJECTION_MONTHS,
+    MAX_PROJECTION_MONTHS,
+    projected_totals,
+    projection_report
+)
+from .search import search_expenses
+from .importing import CSVImportError, import_expenses
+from .exporting import (
+    EXPORT_BATCH_SIZE,
+    XLSX_CONTENT_TYPE,
+    expense_header,
+    expense_rows,
+    report_sections,
+    stream_csv,
+    stream_csv_sections,
+    write_xlsx
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin for ``?fields=a,b,c`` on read requests: the serializer is
+    trimmed to those fields and the queryset loads only the columns they
+    need via ``.only()``
+    """
+    fields_query_param = 'fields'
+    always_loaded_fields = ('id', 'user')
+
+    def get_requested_fields(self):
+        """Return the requested field names, or None for all fields."""
+        if not hasattr(self, '_requested_fields'):
+            raw = self.request.query_params.get(self.fields_query_param)
+            requested = None
+            if raw and self.request.method == 'GET':
+                requested = [name.strip() for name in raw.split(',') if name.strip()]
+                available = self.get_serializer_class()().fields
+                unknown = [name for name in requested if name not in available]
+                if unknown:
+                    raise ValidationError({
+                        'fields': f"Unknown fields: {', '.join(unknown)}"
+                    })
+            self._requested_fields = requested
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def only_requested_fields(self, queryset, *required):
+        """Restrict ``queryset`` to the columns the requested fields need."""
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        needed = self.get_serializer_class().model_fields_for(fields)
+        return queryset.only(*self.always_loaded_fields, *required, *needed)
 
 
 class NotificationsView(generics.GenericAPIView):
     """
-    View for user notifications - returns empty list if notifications table doesn't exist
+    View for user notifications.
+
+    The feed is read one keyset page at a time (``?cursor=``), unread first;
+    ``unread_count`` comes from the user's denormalised counter, so neither
+    needs a COUNT.
     """
     permission_classes = [permissions.IsAuthenticated]
-    
+
     def get(self, request):
-        """Get user notifications"""
-        try:
-            # Check if user has notifications attribute (table exists)
-            if not hasattr(request.user, 'notifications'):
-                return Response({
-                    'notifications': [],
-                    'unread_count': 0
-                })
-            
-            notifications = request.user.notifications.all()[:10]  # Latest 10 notifications
-            
-            notification_data = []
-            for notification in notifications:
-                notification_data.append({
+        """Get a page of the user's notifications"""
+        paginator = NotificationPagination()
+        queryset = request.user.notifications.only(
+            'id', 'user_id', 'title', 'message', 'type', 'is_read', 'created_at'
+        )
+        if request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+        notifications = paginator.paginate_queryset(queryset, request, view=self)
+
+        return Response({
+            'notifications': [
+                {
                     'id': notification.id,
                     'title': notification.title,
                     'message': notification.message,
-                    'type': getattr(notification, 'type', 'info'),
+                    'type': notification.type,
                     'is_read': notification.is_read,
                     'created_at': notification.created_at.isoformat()
-                })
-            
-            return Response({
-                'notifications': notification_data,
-                'unread_count': notifications.filter(is_read=False).count()
-            })
-        except Exception as e:
-            # If table doesn't exist or any other error, return empty safely
-            print(f"Notifications error: {e}")
-            return Response({
-                'notifications': [],
-                'unread_count': 0
-            })
-    
+                }
+                for notification in notifications
+            ],
+            'unread_count': request.user.unread_notifications,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
+
     def post(self, request):
-        """Mark notification as read"""
+        """Mark one notification, or all of them (``{"all": true}``), as read"""
+        if request.data.get('all'):
+            request.user.notifications.filter(is_read=False).update(is_read=True)
+            return Response({'message': 'All notifications marked as read'})
+
         try:
-            if not hasattr(request.user, 'notifications'):
-                return Response({'message': 'Notifications not configured'})
-            
-            notification_id = request.data.get('notification_id')
-            notification = request.user.notifications.get(id=notification_id)
-            notification.is_read = True
-            notification.save()
-            return Response({'message': 'Notification marked as read'})
-        except Exception as e:
+            notification_id = int(request.data.get('notification_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Notification not found'}, status=404)
+        if not request.user.notifications.filter(id=notification_id).update(is_read=True):
             return Response({'error': 'Notification not found'}, status=404)
+        return Response({'message': 'Notification marked as read'})
+
+
 class ReportsView(generics.GenericAPIView):
     """
     View for generating expense reports and analytics
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @etag_for_data_version('reports', extra=today_extra)
     def get(self, request):
         """Get comprehensive expense reports"""
+        report, error = self.build_report(request)
+        return error or Response(report)
+
+    def build_report(self, request):
+        """
+        Build (or fetch from cache) the report for the ``start_date`` /
+        ``end_date`` query params, as ``(report, error_response)``.
+        """
         user = request.user
-        expenses = Expense.objects.filter(user=user)
+        totals = DailyCategoryTotal.objects.filter(user=user)
         
         # Date filters
         start_date = request.query_params.get('start_date')
@@ -89,91 +186,52 @@ class ReportsView(generics.GenericAPIView):
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                expenses = expenses.filter(date__gte=start_date)
+                totals = totals.filter(date__gte=start_date)
             except ValueError:
-                return Response({
+                return None, Response({
                     'error': 'Invalid start_date format. Use YYYY-MM-DD'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                expenses = expenses.filter(date__lte=end_date)
+                totals = totals.filter(date__lte=end_date)
             except ValueError:
-                return Response({
+                return None, Response({
                     'error': 'Invalid end_date format. Use YYYY-MM-DD'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calculate statistics
-        total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
-        total_count = expenses.count()
-        
-        # Daily average
-        if expenses.exists():
-            date_range = expenses.aggregate(
-                min_date=models.Min('date'),
-                max_date=models.Max('date')
-            )
-            if date_range['min_date'] and date_range['max_date']:
-                days = (date_range['max_date'] - date_range['min_date']).days + 1
-                daily_average = total_expenses / days if days > 0 else 0
-            else:
-                daily_average = 0
-        else:
-            daily_average = 0
-        
-        # Category breakdown
-        category_breakdown = {}
-        for choice in Expense.CATEGORY_CHOICES:
-            category_total = expenses.filter(category=choice[0]).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            if category_total > 0:
-                category_breakdown[choice[1]] = {
-                    'amount': float(category_total),
-                    'percentage': (float(category_total) / float(total_expenses)) * 100 if total_expenses > 0 else 0
-                }
-        
-        # Top category
-        top_category = None
-        if category_breakdown:
-            top_category = max(category_breakdown.items(), key=lambda x: x[1]['amount'])
-            top_category = {
-                'name': top_category[0],
-                'amount': top_category[1]['amount']
-            }
-        
-        # Monthly trend (last 6 months)
-        monthly_trend = []
         today = timezone.now().date()
-        for i in range(6):
-            month_start = today.replace(day=1) - timedelta(days=i*30)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            month_total = expenses.filter(
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_trend.append({
-                'month': month_start.strftime('%b %Y'),
-                'amount': float(month_total)
-            })
-        
-        monthly_trend.reverse()  # Show oldest to newest
         
-        return Response({
-            'total_expenses': float(total_expenses),
-            'total_count': total_count,
-            'daily_average': float(daily_average),
-            'category_breakdown': category_breakdown,
-            'top_category': top_category,
-            'monthly_trend': monthly_trend,
+        return cached_report(request, 'reports', lambda: {
+            **expense_report(totals, today),
             'date_range': {
                 'start': start_date.isoformat() if start_date else None,
                 'end': end_date.isoformat() if end_date else None
             }
-        })
+        }, extra=[today]), None
+
+
+class ReportExportView(ReportsView):
+    """
+    Download the ``ReportsView`` summary as CSV or XLSX
+    """
+
+    def get(self, request, file_type):
+        """Export the report for the same date filters as ``ReportsView``"""
+        report, error = self.build_report(request)
+        if error:
+            return error
+
+        sections = report_sections(report)
+        if file_type == 'xlsx':
+            return FileResponse(
+                write_xlsx(sections), as_attachment=True, filename='report.xlsx',
+                content_type=XLSX_CONTENT_TYPE
+            )
+        response = StreamingHttpResponse(stream_csv_sections(sections), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="report.csv"'
+        return response
 
 class SpendingTrendView(generics.GenericAPIView):
     """
@@ -181,64 +239,55 @@ class SpendingTrendView(generics.GenericAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    # Legacy ``view`` values mapped onto granularities
+    LEGACY_VIEWS = {'monthly': 'month', 'yearly': 'year'}
+    DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12, 'quarter': 8, 'year': 1}
+
+    @etag_for_data_version('spending_trend', extra=today_extra)
     def get(self, request):
         """Get spending trend data for charts"""
         user = request.user
-        expenses = Expense.objects.filter(user=user)
+        totals = DailyCategoryTotal.objects.filter(user=user)
         
-        # Get view type (monthly or yearly)
+        # Granularity (day, week, month, quarter or year); ``view`` is still
+        # accepted for older clients
         view_type = request.query_params.get('view', 'monthly')
-        months_back = int(request.query_params.get('months', 12))
+        granularity = request.query_params.get(
+            'granularity', self.LEGACY_VIEWS.get(view_type)
+        )
+        if granularity not in TREND_STEPS:
+            return Response({
+                'error': f"Invalid granularity. Use one of: {', '.join(TREND_STEPS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if 'granularity' in request.query_params:
+            view_type = granularity
+        
+        # Number of buckets; ``months`` is kept for monthly/yearly views
+        try:
+            if 'periods' in request.query_params:
+                periods = int(request.query_params['periods'])
+            elif granularity in ('month', 'year'):
+                months_back = int(request.query_params.get('months', 12))
+                periods = months_back if granularity == 'month' else max(1, months_back // 12)
+            else:
+                periods = self.DEFAULT_PERIODS[granularity]
+        except ValueError:
+            return Response({
+                'error': 'Invalid periods/months value. Use a whole number'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         today = timezone.now().date()
-        trend_data = []
-        
-        if view_type == 'monthly':
-            # Monthly trend data
-            for i in range(months_back):
-                if i == 0:
-                    month_start = today.replace(day=1)
-                    month_end = today
-                else:
-                    month_start = (today.replace(day=1) - relativedelta(months=i))
-                    month_end = (month_start + relativedelta(months=1) - timedelta(days=1))
-                
-                month_total = expenses.filter(
-                    date__gte=month_start,
-                    date__lte=month_end
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                trend_data.append({
-                    'period': month_start.strftime('%b %Y'),
-                    'amount': float(month_total),
-                    'date': month_start.isoformat()
-                })
-        
-        elif view_type == 'yearly':
-            # Yearly trend data
-            years_back = max(1, months_back // 12)
-            for i in range(years_back):
-                year_start = today.replace(month=1, day=1) - relativedelta(years=i)
-                year_end = year_start.replace(month=12, day=31)
-                
-                year_total = expenses.filter(
-                    date__gte=year_start,
-                    date__lte=year_end
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                trend_data.append({
-                    'period': year_start.strftime('%Y'),
-                    'amount': float(year_total),
-                    'date': year_start.isoformat()
-                })
-        
-        trend_data.reverse()  # Show oldest to newest
         
-        return Response({
-            'trend_data': trend_data,
-            'view_type': view_type,
-            'total_periods': len(trend_data)
-        })
+        def build():
+            trend_data = spending_trend(totals, today, granularity, periods)
+            return {
+                'trend_data': trend_data,
+                'view_type': view_type,
+                'granularity': granularity,
+                'total_periods': len(trend_data)
+            }
+        
+        return Response(cached_report(request, 'spending_trend', build, extra=[today]))
 
 
 class CategorySummaryView(generics.GenericAPIView):
@@ -247,10 +296,11 @@ class CategorySummaryView(generics.GenericAPIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    @etag_for_data_version('category_summary')
     def get(self, request):
         """Get category summary data for charts"""
         user = request.user
-        expenses = Expense.objects.filter(user=user)
+        totals = DailyCategoryTotal.objects.filter(user=user)
         
         # Date filters
         start_date = request.query_params.get('start_date')
@@ -259,7 +309,7 @@ class CategorySummaryView(generics.GenericAPIView):
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                expenses = expenses.filter(date__gte=start_date)
+                totals = totals.filter(date__gte=start_date)
             except ValueError:
                 return Response({
                     'error': 'Invalid start_date format. Use YYYY-MM-DD'
@@ -268,40 +318,18 @@ class CategorySummaryView(generics.GenericAPIView):
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                expenses = expenses.filter(date__lte=end_date)
+                totals = totals.filter(date__lte=end_date)
             except ValueError:
                 return Response({
                     'error': 'Invalid end_date format. Use YYYY-MM-DD'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calculate category totals
-        category_data = []
-        total_amount = expenses.aggregate(total=Sum('amount'))['total'] or 0
-        
-        for choice in Expense.CATEGORY_CHOICES:
-            category_total = expenses.filter(category=choice[0]).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            if category_total > 0:
-                category_data.append({
-                    'category': choice[1],
-                    'amount': float(category_total),
-                    'percentage': (float(category_total) / float(total_amount)) * 100 if total_amount > 0 else 0,
-                    'count': expenses.filter(category=choice[0]).count()
-                })
-        
-        # Sort by amount descending
-        category_data.sort(key=lambda x: x['amount'], reverse=True)
-        
-        return Response({
-            'category_data': category_data,
-            'total_amount': float(total_amount),
-            'total_categories': len(category_data)
-        })
+        return Response(cached_report(
+            request, 'category_summary', lambda: category_summary(totals)
+        ))
 
 
-class RecurringExpenseViewSet(viewsets.ModelViewSet):
+class RecurringExpenseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing recurring expenses
     """
@@ -311,15 +339,17 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Return recurring expenses for the current user only"""
         queryset = RecurringExpense.objects.filter(user=self.request.user).order_by('-created_at')
-        print(f"📋 RecurringExpenseViewSet.get_queryset() - User: {self.request.user.email}, Count: {queryset.count()}")
+        if debug_enabled(logger):
+            logger.debug('User %s has %d recurring expenses', self.request.user.pk, queryset.count())
         return queryset
     
     def list(self, request, *args, **kwargs):
         """List all recurring expenses for authenticated user"""
-        queryset = self.get_queryset()
+        queryset = self.only_requested_fields(self.get_queryset(), 'created_at')
         serializer = self.get_serializer(queryset, many=True)
-        print(f"📤 Returning {len(serializer.data)} recurring expenses for user {request.user.email}")
-        return Response(serializer.data)
+        data = serializer.data
+        logger.debug('Returning %d recurring expenses for user %s', len(data), request.user.pk)
+        return Response(data)
 
     def perform_create(self, serializer):
         """Save recurring expense with current user"""
@@ -328,11 +358,9 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
             serializer.validated_data['next_date'] = serializer.validated_data['start_date']
         serializer.save(user=self.request.user)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new recurring expense"""
-        print(f"📝 Creating recurring expense for user: {request.user.email}")
-        print(f"📝 Request data: {request.data}")
-        
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -345,8 +373,7 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
         # Return the serialized data directly (includes id, amount as number, etc.)
         response_data = RecurringExpenseSerializer(recurring_expense).data
         
-        print(f"✅ Created recurring expense ID={recurring_expense.id}: {recurring_expense.title} for user {request.user.email}")
-        print(f"✅ Response data: {response_data}")
+        logger.info('Created recurring expense %s for user %s', recurring_expense.id, request.user.pk)
         
         return Response(response_data, status=status.HTTP_201_CREATED)
 
@@ -378,37 +405,46 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
         # Return full serialized data to match frontend expectations
         return Response(RecurringExpenseSerializer(recurring_expense).data)
 
-    @action(detail=False, methods=['post'])
-    def generate_expenses(self, request):
-        """Generate expenses from due recurring expenses"""
+    @action(detail=False, methods=['get'])
+    @etag_for_data_version('recurring_projection', extra=today_extra)
+    def projection(self, request):
+        """
+        Project spend on active recurring expenses per month and category
+        for ``?months=N`` months, merged with this month's actual spend.
+
+        Nothing is generated; the projection is cached by the user's
+        recurring version, the actuals are read from the rollup.
+        """
+        try:
+            months = int(request.query_params.get('months', DEFAULT_PROJECTION_MONTHS))
+            if not 1 <= months <= MAX_PROJECTION_MONTHS:
+                raise ValueError
+        except ValueError:
+            return Response({
+                'error': f'months must be a whole number from 1 to {MAX_PROJECTION_MONTHS}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         today = timezone.now().date()
-        due_recurring = self.get_queryset().filter(
-            is_active=True,
-            next_date__lte=today
+        first_month = today.replace(day=1)
+        rules = RecurringExpense.objects.filter(user=request.user, is_active=True).only(
+            'start_date', 'end_date', 'next_date', 'frequency', 'amount', 'category'
         )
-        
-        generated_count = 0
-        for recurring in due_recurring:
-            # Check if we should stop generating (if end_date is set)
-            if recurring.end_date and recurring.next_date > recurring.end_date:
-                recurring.is_active = False
-                recurring.save()
-                continue
-            
-            # Create expense from recurring
-            Expense.objects.create(
-                user=recurring.user,
-                title=f"{recurring.title} (Auto-generated)",
-                amount=recurring.amount,
-                category=recurring.category,
-                date=recurring.next_date,
-                description=f"Auto-generated from recurring expense: {recurring.description or ''}"
-            )
-            
-            # Update next date
-            recurring.next_date = recurring.calculate_next_date()
-            recurring.save()
-            generated_count += 1
+        projected = cached_report(
+            request, 'recurring_projection',
+            lambda: projected_totals(rules, today, months),
+            extra=[today], version=request.user.recurring_version
+        )
+        actual = dict(
+            DailyCategoryTotal.objects.filter(user=request.user, date__range=(first_month, today))
+            .values_list('category')
+            .annotate(amount=Sum('total'))
+        )
+        return Response(projection_report(projected, actual, first_month, months))
+
+    @action(detail=False, methods=['post'])
+    def generate_expenses(self, request):
+        """Generate every missed occurrence of the user's due recurring expenses"""
+        _, generated_count = generate_due_expenses(queryset=self.get_queryset())
         
         return Response({
             'message': f'Generated {generated_count} expenses from recurring expenses',
@@ -418,63 +454,25 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def generate_all_recurring_expenses(self, request):
         """Generate all recurring expenses for the current month"""
-        print(f"\n🔄 Generate all recurring expenses requested by user: {request.user.email}")
-        
         today = timezone.now().date()
         current_month_start = today.replace(day=1)
         current_month_end = (current_month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        print(f"📅 Current month: {current_month_start} to {current_month_end}")
-        
         active_recurring = self.get_queryset().filter(
             is_active=True,
             start_date__lte=current_month_end
         )
         
-        print(f"📋 Found {active_recurring.count()} active recurring expenses")
-        
-        generated_count = 0
-        generated_expenses = []
-        
-        for recurring in active_recurring:
-            print(f"  Processing: {recurring.title} (next_date: {recurring.next_date})")
-            # Generate expenses for each occurrence in the current month
-            current_date = max(recurring.start_date, current_month_start)
-            
-            while current_date <= current_month_end:
-                # Check if we should stop generating (if end_date is set)
-                if recurring.end_date and current_date > recurring.end_date:
-                    break
-                
-                # Check if this date matches the frequency
-                if self._should_generate_on_date(recurring, current_date):
-                    # Check if expense already exists for this date
-                    existing_expense = Expense.objects.filter(
-                        user=recurring.user,
-                        title__contains=recurring.title,
-                        date=current_date
-                    ).exists()
-                    
-                    if not existing_expense:
-                        new_expense = Expense.objects.create(
-                            user=recurring.user,
-                            title=f"{recurring.title} (Auto-generated)",
-                            amount=recurring.amount,
-                            category=recurring.category,
-                            date=current_date,
-                            description=f"Auto-generated from recurring expense: {recurring.description or ''}"
-                        )
-                        generated_count += 1
-                        generated_expenses.append(new_expense.title)
-                        print(f"    ✅ Generated expense: {new_expense.title} - ₹{new_expense.amount} on {current_date}")
-                    else:
-                        print(f"    ⏭️  Skipped (already exists): {recurring.title} on {current_date}")
-                
-                # Move to next occurrence
-                current_date = self._get_next_occurrence_date(recurring, current_date)
-        
-        print(f"\n✅ Generation complete: {generated_count} expenses created")
-        print(f"📝 Generated expenses: {generated_expenses}")
+        occurrences = expand(active_recurring, current_month_start, current_month_end)
+        # Occurrences that already have an expense are skipped
+        new_expenses = create_occurrences(occurrences)
+        generated_count = len(new_expenses)
+        generated_expenses = [expense.title for expense in new_expenses]
+        
+        logger.info(
+            'Generated %d recurring expenses for user %s from %s to %s',
+            generated_count, request.user.pk, current_month_start, current_month_end
+        )
         
         return Response({
             'message': f'Generated {generated_count} recurring expenses for current month',
@@ -482,41 +480,19 @@ class RecurringExpenseViewSet(viewsets.ModelViewSet):
             'generated_expenses': generated_expenses
         })
 
-    def _should_generate_on_date(self, recurring, date):
-        """Check if a recurring expense should generate on a specific date"""
-        if recurring.frequency == 'daily':
-            return True
-        elif recurring.frequency == 'weekly':
-            return date.weekday() == recurring.start_date.weekday()
-        elif recurring.frequency == 'monthly':
-            return date.day == recurring.start_date.day
-        elif recurring.frequency == 'yearly':
-            return date.month == recurring.start_date.month and date.day == recurring.start_date.day
-        return False
-
-    def _get_next_occurrence_date(self, recurring, current_date):
-        """Get the next occurrence date for a recurring expense"""
-        if recurring.frequency == 'daily':
-            return current_date + timedelta(days=1)
-        elif recurring.frequency == 'weekly':
-            return current_date + timedelta(weeks=1)
-        elif recurring.frequency == 'monthly':
-            return current_date + relativedelta(months=1)
-        elif recurring.frequency == 'yearly':
-            return current_date + relativedelta(years=1)
-        return current_date
-class ExpensePagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-class ExpenseViewSet(viewsets.ModelViewSet):
+
+class ExpenseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing expenses
     """
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = ExpensePagination
+    filter_backends = [ExpenseFilterBackend, ExpenseOrderingFilter]
+    # Largest batch accepted by the bulk endpoint
+    BULK_MAX_ITEMS = 500
+    # Months per monthly_grouped page
+    MONTHS_PAGE_SIZE = 12
+    MAX_MONTHS_PAGE_SIZE = 60
 
     def get_queryset(self):
         """
@@ -524,15 +500,26 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         """
         return Expense.objects.filter(user=self.request.user)
 
+    @etag_for_data_version('expense_list', extra=currency_extra)
     def list(self, request, *args, **kwargs):
         """
-        List all expenses for authenticated user
+        List expenses for authenticated user, newest first, one keyset page
+        at a time (``?all=true`` returns the full unpaginated list).
+
+        Accepts the ExpenseFilterBackend filters and ``?ordering=``.
         """
         queryset = self.filter_queryset(self.get_queryset())
+        ordering = ExpenseOrderingFilter().get_keyset_ordering(request, self)
+        queryset = self.only_requested_fields(queryset, *(name.lstrip('-') for name in ordering))
 
-        # Return unpaginated list for simple API calls
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        if request.query_params.get('all', '').lower() in ('1', 'true', 'yes'):
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def get_serializer_class(self):
         """
@@ -548,6 +535,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         Create a new expense
@@ -557,7 +545,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         expense = serializer.save(user=request.user)
         
         # Return full expense data
-        response_serializer = ExpenseSerializer(expense)
+        response_serializer = ExpenseSerializer(expense, context=self.get_serializer_context())
         return Response({
             'message': 'Expense created successfully',
             'expense': response_serializer.data
@@ -588,64 +576,207 @@ class ExpenseViewSet(viewsets.ModelViewSet):
             'message': 'Expense deleted successfully'
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Create (POST), partially update (PATCH) or delete (DELETE) up to
+        BULK_MAX_ITEMS expenses in one transaction.
+
+        POST takes a list of expenses, PATCH a list of ``{"id": ..., <field>:
+        <value>}`` objects and DELETE a list of ids. Creates and updates are
+        all or nothing. Every response has one result per item, in order.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'Expected a non-empty list of items'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.BULK_MAX_ITEMS:
+            return Response({
+                'error': f'At most {self.BULK_MAX_ITEMS} items per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return self.create_many(items)
+        if request.method == 'PATCH':
+            return self.update_many(items)
+        return self.delete_many(items)
+
+    def create_many(self, items):
+        """Validate every item, then insert them all with ``bulk_create``."""
+        context = self.get_serializer_context()
+        serializer = ExpenseCreateSerializer(data=items, many=True, context=context)
+        if not serializer.is_valid():
+            return self.bulk_failure([
+                {'index': index, 'status': 'invalid', 'errors': errors} if errors
+                else {'index': index, 'status': 'skipped'}
+                for index, errors in enumerate(serializer.errors)
+            ])
+
+        expenses = serializer.save(user=self.request.user)
+        data = ExpenseSerializer(expenses, many=True, context=context).data
+        return Response({
+            'message': f'{len(expenses)} expenses created successfully',
+            'results': [
+                {'index': index, 'status': 'created', 'expense': expense}
+                for index, expense in enumerate(data)
+            ]
+        }, status=status.HTTP_201_CREATED)
+
+    def update_many(self, items):
+        """
+        Lock and load every target in one query, validate the changes, then
+        write them all with ``bulk_update``.
+        """
+        ids = [self.bulk_id(item.get('id')) if isinstance(item, dict) else None for item in items]
+        results, changed, fields, seen = [], [], {'updated_at'}, set()
+
+        with transaction.atomic():
+            instances = self.get_queryset().select_for_update().in_bulk(
+                [pk for pk in ids if pk is not None]
+            )
+            for index, (item, pk) in enumerate(zip(items, ids)):
+                if pk is None:
+                    results.append({'index': index, 'status': 'invalid', 'errors': {'id': ['A valid id is required.']}})
+                    continue
+                if pk in seen:
+                    results.append({'index': index, 'status': 'invalid', 'errors': {'id': ['Duplicate id.']}})
+                    continue
+                seen.add(pk)
+                instance = instances.get(pk)
+                if instance is None:
+                    results.append({'index': index, 'id': pk, 'status': 'not_found'})
+                    continue
+
+                data = {key: value for key, value in item.items() if key != 'id'}
+                serializer = ExpenseCreateSerializer(instance, data=data, partial=True)
+                if not serializer.is_valid():
+                    results.append({'index': index, 'id': pk, 'status': 'invalid', 'errors': serializer.errors})
+                    continue
+                for attr, value in serializer.validated_data.items():
+                    setattr(instance, attr, value)
+                fields.update(serializer.validated_data)
+                changed.append(instance)
+                results.append({'index': index, 'id': pk, 'status': 'updated'})
+
+            if len(changed) < len(items):
+                for result in results:
+                    if result['status'] == 'updated':
+                        result['status'] = 'skipped'
+                return self.bulk_failure(results)
+
+            now = timezone.now()
+            for instance in changed:
+                instance.updated_at = now
+            Expense.objects.bulk_update(changed, sorted(fields), batch_size=self.BULK_MAX_ITEMS)
+
+        data = ExpenseSerializer(changed, many=True, context=self.get_serializer_context()).data
+        for result, expense in zip(results, data):
+            result['expense'] = expense
+        return Response({
+            'message': f'{len(changed)} expenses updated successfully',
+            'results': results
+        })
+
+    def delete_many(self, items):
+        """Delete every listed expense the user owns with one ``DELETE``."""
+        ids = [self.bulk_id(item) for item in items]
+        if None in ids:
+            return Response({
+                'error': 'Expected a list of expense ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            targets = self.get_queryset().filter(pk__in=ids)
+            found = set(targets.values_list('pk', flat=True))
+            if found:
+                self.get_queryset().filter(pk__in=found).delete()
+
+        return Response({
+            'message': f'{len(found)} expenses deleted successfully',
+            'results': [
+                {'index': index, 'id': pk, 'status': 'deleted' if pk in found else 'not_found'}
+                for index, pk in enumerate(ids)
+            ]
+        })
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """
+        Import expenses from an uploaded CSV file (form field ``file``).
+
+        Columns: title, amount, date (YYYY-MM-DD) and optionally category
+        and description. Valid rows are imported in batches; invalid rows
+        are skipped and reported by line number. If the file cannot be read
+        to the end, the response is a 400 that still reports the rows
+        imported and ``stopped_after_line``.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                'error': 'Upload a CSV file in the "file" field'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_expenses(request.user, lines)
+        except CSVImportError as e:
+            return Response({'error': f'Could not import file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if result.failure is not None:
+            # Earlier batches are committed; say so, so a retry does not duplicate them
+            return Response({
+                'error': (
+                    f'Could not read the file after line {result.stopped_after_line}: {result.failure}. '
+                    f'{result.imported} expenses before it were imported'
+                ),
+                **result.as_dict()
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': f'{result.imported} expenses imported successfully',
+            **result.as_dict()
+        }, status=status.HTTP_201_CREATED if result.imported else status.HTTP_200_OK)
+
+    @staticmethod
+    def bulk_id(value):
+        """Return ``value`` as an expense id, or None if it is not one."""
+        if isinstance(value, bool):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def bulk_failure(results):
+        return Response({
+            'error': 'No changes were made; fix the listed items and retry',
+            'results': results
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=['get'])
+    @etag_for_data_version('stats', extra=lambda request: today_extra(request) + currency_extra(request))
     def stats(self, request):
         """
         Get expense statistics for the current user
         """
-        user = request.user
-        expenses = self.get_queryset()
-        
-        # Calculate date ranges
         today = timezone.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        month_start = today.replace(day=1)
-        
-        # Total expenses
-        total_stats = expenses.aggregate(
-            total_amount=Sum('amount'),
-            total_count=Count('id')
-        )
-        
-        # Today's expenses
-        today_expenses = expenses.filter(date=today).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # This week's expenses
-        week_expenses = expenses.filter(date__gte=week_start).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # This month's expenses
-        month_expenses = expenses.filter(date__gte=month_start).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Category breakdown
-        category_breakdown = {}
-        for choice in Expense.CATEGORY_CHOICES:
-            category_total = expenses.filter(category=choice[0]).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            if category_total > 0:
-                category_breakdown[choice[1]] = float(category_total)
-        
-        # Recent expenses (last 5)
-        recent_expenses = expenses[:5]
-        
-        stats_data = {
-            'total_expenses': total_stats['total_amount'] or 0,
-            'total_count': total_stats['total_count'] or 0,
-            'today_expenses': today_expenses,
-            'this_week_expenses': week_expenses,
-            'this_month_expenses': month_expenses,
-            'category_breakdown': category_breakdown,
-            'recent_expenses': recent_expenses
-        }
-        
-        serializer = ExpenseStatsSerializer(stats_data)
-        return Response(serializer.data)
+
+        def build():
+            # Totals, period windows and category breakdown in one rollup query
+            stats_data = expense_stats(
+                DailyCategoryTotal.objects.filter(user=request.user), today
+            )
+
+            # Recent expenses (last 5)
+            stats_data['recent_expenses'] = self.get_queryset()[:5]
+
+            return ExpenseStatsSerializer(stats_data, context=self.get_serializer_context()).data
+
+        return Response(cached_report(
+            request, 'stats', build, extra=[today, *currency_extra(request)]
+        ))
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
@@ -653,18 +784,19 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         Get expenses grouped by category
         """
         category = request.query_params.get('category')
-        expenses = self.get_queryset()
+        expenses = self.only_requested_fields(self.get_queryset(), 'category', 'date', 'created_at')
         
         if category:
             expenses = expenses.filter(category=category)
         
         # Group by category
         categories = {}
+        serializer = self.get_serializer()
         for expense in expenses:
             cat_name = expense.get_category_display()
             if cat_name not in categories:
                 categories[cat_name] = []
-            categories[cat_name].append(ExpenseSerializer(expense).data)
+            categories[cat_name].append(serializer.to_representation(expense))
         
         return Response(categories)
 
@@ -673,17 +805,28 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         """
         Get expenses within a date range
         """
+        expenses, error = self.filter_by_date_range(self.get_queryset(), request)
+        if error:
+            return error
+        
+        serializer = self.get_serializer(expenses, many=True)
+        return Response(serializer.data)
+
+    def filter_by_date_range(self, expenses, request):
+        """
+        Apply ``start_date``/``end_date`` query params to ``expenses``.
+
+        Returns ``(queryset, None)`` or ``(None, error_response)``.
+        """
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
-        expenses = self.get_queryset()
-        
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
                 expenses = expenses.filter(date__gte=start_date)
             except ValueError:
-                return Response({
+                return None, Response({
                     'error': 'Invalid start_date format. Use YYYY-MM-DD'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
@@ -692,19 +835,139 @@ class ExpenseViewSet(viewsets.ModelViewSet):
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
                 expenses = expenses.filter(date__lte=end_date)
             except ValueError:
-                return Response({
+                return None, Response({
                     'error': 'Invalid end_date format. Use YYYY-MM-DD'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = self.get_serializer(expenses, many=True)
-        return Response(serializer.data)
+        return expenses, None
+
+    def filter_for_export(self, request):
+        """
+        Return the user's expenses filtered like ``by_date_range`` plus an
+        optional ``category``, as ``(queryset, error_response)``.
+        """
+        expenses, error = self.filter_by_date_range(self.get_queryset(), request)
+        if error:
+            return None, error
+        
+        category = request.query_params.get('category')
+        if category:
+            expenses = expenses.filter(category=category)
+        return expenses, None
+
+    @action(detail=False, methods=['get'])
+    @etag_for_data_version('expense_search', extra=currency_extra)
+    def search(self, request):
+        """
+        Full-text search over title and description (``?q=``), most
+        relevant first, one keyset page at a time. The list filters
+        (category, amount, dates) may be combined with it.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                'error': 'Query parameter q is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ExpenseFilterBackend().filter_queryset(request, self.get_queryset(), self)
+        queryset = self.only_requested_fields(search_expenses(queryset, query))
+
+        paginator = RankedKeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def export_json(self, request):
+        """
+        Stream all matching expenses as a JSON array.
+
+        Rows are read in keyset batches and encoded as they go, so memory
+        stays bounded regardless of the size of the user's history.
+        """
+        expenses, error = self.filter_for_export(request)
+        if error:
+            return error
+        
+        serializer = ExpenseSerializer(context=self.get_serializer_context())
+        encoder = JSONEncoder(ensure_ascii=False)
+        
+        def stream():
+            # Emit one chunk per batch rather than one per row
+            yield '['
+            chunk, separator = [], ''
+            for expense in iterate_keyset(expenses, batch_size=EXPORT_BATCH_SIZE):
+                chunk.append(encoder.encode(serializer.to_representation(expense)))
+                if len(chunk) == EXPORT_BATCH_SIZE:
+                    yield separator + ','.join(chunk)
+                    chunk, separator = [], ','
+            if chunk:
+                yield separator + ','.join(chunk)
+            yield ']'
+        
+        response = StreamingHttpResponse(stream(), content_type='application/json')
+        response['Content-Disposition'] = 'attachment; filename="expenses.json"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def export_csv(self, request):
+        """
+        Stream matching expenses as CSV (filters as for ``export_json``),
+        one keyset batch at a time.
+        """
+        expenses, error = self.filter_for_export(request)
+        if error:
+            return error
+
+        response = StreamingHttpResponse(
+            stream_csv(expense_header(), expense_rows(expenses)), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = 'attachment; filename="expenses.csv"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def export_xlsx(self, request):
+        """
+        Matching expenses as an XLSX workbook written in constant memory
+        (openpyxl write-only mode) and streamed from a temporary file.
+        """
+        expenses, error = self.filter_for_export(request)
+        if error:
+            return error
+
+        workbook = write_xlsx([('Expenses', expense_header(), expense_rows(expenses))])
+        return FileResponse(
+            workbook, as_attachment=True, filename='expenses.xlsx', content_type=XLSX_CONTENT_TYPE
+        )
 
     @action(detail=False, methods=['get'])
+    @etag_for_data_version('monthly_grouped', extra=currency_extra)
     def monthly_grouped(self, request):
         """
-        Get expenses grouped by month and year
+        Get month summaries (total and count), newest first, a page of
+        months at a time (``page_size``, ``before=YYYY-MM``).
+
+        Each month links to its expenses on the cursor-paginated list
+        endpoint (``expenses_url``) instead of embedding them, so the cost
+        of a page depends on the number of months, not of expenses.
+
+        ``category`` and ``search`` narrow the summaries to the matching
+        expenses and are carried over to ``expenses_url``. A search is
+        summed from the matching expenses rather than the daily rollups.
         """
-        expenses = self.get_queryset()
+        search = request.query_params.get('search', '').strip()
+        if search:
+            totals = search_expenses(self.get_queryset(), search)
+        else:
+            totals = DailyCategoryTotal.objects.filter(user=request.user)
+
+        categories = [
+            value.strip()
+            for raw in request.query_params.getlist('category')
+            for value in raw.split(',') if value.strip()
+        ]
+        if categories:
+            totals = totals.filter(category__in=categories)
         
         # Optional filters
         year = request.query_params.get('year')
@@ -713,7 +976,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         if year:
             try:
                 year_int = int(year)
-                expenses = expenses.filter(date__year=year_int)
+                totals = totals.filter(date__year=year_int)
             except ValueError:
                 return Response({
                     'error': 'Invalid year format. Use YYYY'
@@ -722,45 +985,67 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         if month:
             try:
                 month_int = int(month)
-                expenses = expenses.filter(date__month=month_int)
+                if not 1 <= month_int <= 12:
+                    raise ValueError
+                totals = totals.filter(date__month=month_int)
             except ValueError:
                 return Response({
                     'error': 'Invalid month format. Use MM (1-12)'
                 }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Group expenses by year and month
-        from django.db.models import Sum, Count
-        from collections import defaultdict
-        
-        # Get all expenses ordered by date
-        expenses_list = expenses.order_by('-date')
-        
-        # Group by year-month
-        grouped_expenses = defaultdict(lambda: {'expenses': [], 'total': 0, 'count': 0})
-        
-        for expense in expenses_list:
-            year_month = f"{expense.date.year}-{expense.date.month:02d}"
-            grouped_expenses[year_month]['expenses'].append(ExpenseSerializer(expense).data)
-            grouped_expenses[year_month]['total'] += float(expense.amount)
-            grouped_expenses[year_month]['count'] += 1
-        
-        # Convert to list format with proper month names
+
+        before = request.query_params.get('before')
+        if before:
+            try:
+                before = datetime.strptime(before, '%Y-%m').date()
+            except ValueError:
+                return Response({
+                    'error': 'Invalid before format. Use YYYY-MM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = int(request.query_params.get('page_size', self.MONTHS_PAGE_SIZE))
+        except ValueError:
+            page_size = self.MONTHS_PAGE_SIZE
+        page_size = max(1, min(page_size, self.MAX_MONTHS_PAGE_SIZE))
+        rows = month_summaries(totals, before=before or None, limit=page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        list_url = request.build_absolute_uri(reverse('expense-list'))
+        expense_params = {
+            name: request.query_params[name]
+            for name in ('fields', 'search')
+            if request.query_params.get(name)
+        }
+        if categories:
+            expense_params['category'] = ','.join(categories)
+        formatter = currency_formatter(request.user.currency)
+
         result = []
-        for year_month, data in sorted(grouped_expenses.items(), key=lambda x: x[0], reverse=True):
-            year, month = year_month.split('-')
-            month_name = datetime(int(year), int(month), 1).strftime('%B')
-            
+        for row in rows:
+            start = row['month']
+            end = start + relativedelta(months=1, days=-1)
+            query = urlencode({
+                **expense_params, 'start_date': start.isoformat(), 'end_date': end.isoformat()
+            })
             result.append({
-                'year_month': year_month,
-                'year': int(year),
-                'month': int(month),
-                'month_name': month_name,
-                'expenses': data['expenses'],
-                'total_amount': data['total'],
-                'expense_count': data['count']
+                'year_month': start.strftime('%Y-%m'),
+                'year': start.year,
+                'month': start.month,
+                'month_name': start.strftime('%B'),
+                'total_amount': row['amount_sum'],
+                'formatted_total': formatter(row['amount_sum']),
+                'expense_count': row['expense_count'],
+                'expenses_url': f'{list_url}?{query}',
             })
-        
+
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'before', result[-1]['year_month']
+            )
+
         return Response({
             'grouped_expenses': result,
-            'total_months': len(result)
+            'next': next_link
         })
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Entry points for worker processes started by ``run_recurring --workers``.
+
+Workers are spawned, not forked, so no database connection is shared with
+the parent. This module is imported by each worker before Django is set
+up, so it must not import models at module level.
+"""
+import time
+import django
+from django.db import connections
+
+# Set in each worker process by init_worker
+_progress = None
+
+
+def init_worker(progress):
+    """Set up Django in a worker process; it opens its own connection."""
+    global _progress
+    django.setup()
+    connections.close_all()
+    _progress = progress
+
+
+def run_shard(shard, shards, through, batch_size):
+    """
+    Generate the due expenses of users with ``user_id % shards == shard``.
+    Returns ``(shard, rules, expenses, seconds)``.
+    """
+    from .recurring import generate_due_expenses, shard_queryset
+
+    started = time.perf_counter()
+
+    def report(rules, expenses):
+        _progress.put((shard, rules, expenses))
+
+    rules, expenses = generate_due_expenses(
+        through, shard_queryset(shard, shards), batch_size, on_batch=report
+    )
+    connections.close_all()
+    return shard, rules, expenses, time.perf_counter() - started
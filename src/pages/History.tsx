@@ -19,13 +19,23 @@ interface MonthlyGroup {
   year: number;
   month: number;
   month_name: string;
-  expenses: Expense[];
   total_amount: number;
+  formatted_total: string;
   expense_count: number;
+  expenses_url: string;
+}
+
+// Expenses of one month, loaded a cursor page at a time when it is expanded
+interface MonthExpenses {
+  items: Expense[];
+  next: string | null;
+  loading: boolean;
 }
 
 const History: React.FC = () => {
   const [groupedExpenses, setGroupedExpenses] = useState<MonthlyGroup[]>([]);
+  const [monthExpenses, setMonthExpenses] = useState<Record<string, MonthExpenses>>({});
+  const [expandedMonths, setExpandedMonths] = useState<string[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
@@ -63,15 +73,25 @@ const History: React.FC = () => {
     { value: 12, label: 'December' }
   ];
 
+  // Search and category are applied server-side to the month summaries and
+  // carried in each month's expenses_url, so headers match the listed rows
   useEffect(() => {
     fetchGroupedExpenses();
-  }, [selectedYear, selectedMonth]);
+  }, [selectedYear, selectedMonth, searchTerm, selectedCategory]);
 
   const fetchGroupedExpenses = async () => {
     try {
       setIsLoading(true);
-      const data = await expenseApi.getExpensesGroupedByMonth(selectedYear, selectedMonth);
-      setGroupedExpenses(data.grouped_expenses || []);
+      const data = await expenseApi.getExpensesGroupedByMonth(selectedYear, selectedMonth, {
+        search: searchTerm.trim(),
+        category: selectedCategory.toLowerCase()
+      });
+      const groups: MonthlyGroup[] = data.grouped_expenses || [];
+      setGroupedExpenses(groups);
+      setMonthExpenses({});
+      groups
+        .filter(group => expandedMonths.includes(group.year_month))
+        .forEach(group => loadMonthExpenses(group, true));
     } catch (err) {
       setError('Failed to fetch expenses');
       toast.error('Failed to fetch expenses');
@@ -80,6 +100,45 @@ const History: React.FC = () => {
     }
   };
 
+  const loadMonthExpenses = async (group: MonthlyGroup, reset = false) => {
+    const current = reset ? undefined : monthExpenses[group.year_month];
+    if (current?.loading || (current && !current.next)) return;
+
+    setMonthExpenses(prev => ({
+      ...prev,
+      [group.year_month]: { items: current?.items || [], next: current?.next || null, loading: true }
+    }));
+    try {
+      // expenses_url and the `next` links already carry the filters
+      const page = await expenseApi.getMonthExpenses(current?.next || group.expenses_url);
+      setMonthExpenses(prev => ({
+        ...prev,
+        [group.year_month]: {
+          items: [...(current?.items || []), ...page.results],
+          next: page.next,
+          loading: false
+        }
+      }));
+    } catch (err) {
+      toast.error('Failed to fetch expenses');
+      setMonthExpenses(prev => ({
+        ...prev,
+        [group.year_month]: { items: current?.items || [], next: current?.next || null, loading: false }
+      }));
+    }
+  };
+
+  const toggleMonth = (group: MonthlyGroup) => {
+    if (expandedMonths.includes(group.year_month)) {
+      setExpandedMonths(expandedMonths.filter(month => month !== group.year_month));
+      return;
+    }
+    setExpandedMonths([...expandedMonths, group.year_month]);
+    if (!monthExpenses[group.year_month]) {
+      loadMonthExpenses(group);
+    }
+  };
+
   const getCategoryColor = (category: string) => {
     const colors: Record<string, string> = {
       food: 'bg-orange-100 text-orange-800',
@@ -144,21 +203,17 @@ const History: React.FC = () => {
 
   const handleExportCSV = async () => {
     try {
-      // Flatten all expenses from all months
-      const allExpenses = groupedExpenses.flatMap(group => group.expenses);
-      
-      const csvContent = [
-        ['Title', 'Amount', 'Category', 'Date', 'Description'],
-        ...allExpenses.map(expense => [
-          expense.title,
-          expense.amount.toString(),
-          expense.category,
-          expense.date,
-          expense.description || ''
-        ])
-      ].map(row => row.join(',')).join('\n');
-      
-      const blob = new Blob([csvContent], { type: 'text/csv' });
+      // Built and streamed by the server, filtered like the page
+      const params: Record<string, string> = {};
+      if (selectedCategory) params.category = selectedCategory.toLowerCase();
+      if (selectedYear) {
+        const firstMonth = selectedMonth || 1;
+        const lastMonth = selectedMonth || 12;
+        const lastDay = new Date(selectedYear, lastMonth, 0).getDate();
+        params.start_date = `${selectedYear}-${String(firstMonth).padStart(2, '0')}-01`;
+        params.end_date = `${selectedYear}-${String(lastMonth).padStart(2, '0')}-${lastDay}`;
+      }
+      const blob = await expenseApi.exportExpenses('csv', params);
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
@@ -181,20 +236,6 @@ const History: React.FC = () => {
     setSelectedCategory('');
   };
 
-  const filteredGroups = groupedExpenses.map(group => ({
-    ...group,
-    expenses: group.expenses.filter(expense => {
-      const matchesSearch = !searchTerm || 
-        expense.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        expense.description?.toLowerCase().includes(searchTerm.toLowerCase());
-      
-      const matchesCategory = !selectedCategory || 
-        expense.category.toLowerCase() === selectedCategory.toLowerCase();
-      
-      return matchesSearch && matchesCategory;
-    })
-  })).filter(group => group.expenses.length > 0);
-
   if (isLoading) {
     return (
       <Layout>
@@ -319,7 +360,7 @@ const History: React.FC = () => {
         </div>
 
         {/* Monthly Groups */}
-        {filteredGroups.length === 0 ? (
+        {groupedExpenses.length === 0 ? (
           <div className="bg-white dark:bg-gray-800 rounded-xl shadow-sm border border-gray-200 dark:border-gray-700 p-8 md:p-12 text-center">
             <Calendar className="h-12 w-12 text-gray-400 dark:text-gray-500 mx-auto mb-4" />
             <h3 className="text-lg font-medium text-gray-900 dark:text-white mb-2">No expenses found</h3>
@@ -331,10 +372,13 @@ const History: React.FC = () => {
           </div>
         ) : (
           <div className="space-y-6 sm:space-y-8">
-            {filteredGroups.map((group) => (
+            {groupedExpenses.map((group) => (
               <div key={group.year_month} className="bg-white dark:bg-gray-800 rounded-xl shadow-sm border border-gray-200 dark:border-gray-700 overflow-hidden">
                 {/* Month Header */}
-                <div className="bg-gray-50 dark:bg-gray-800 px-4 sm:px-6 py-4 border-b border-gray-200 dark:border-gray-700">
+                <div
+                  onClick={() => toggleMonth(group)}
+                  className="bg-gray-50 dark:bg-gray-800 px-4 sm:px-6 py-4 border-b border-gray-200 dark:border-gray-700 cursor-pointer"
+                >
                   <div className="flex flex-wrap items-center justify-between gap-3">
                     <div>
                       <h2 className="text-xl font-semibold text-gray-900 dark:text-white">
@@ -346,16 +390,17 @@ const History: React.FC = () => {
                     </div>
                     <div className="text-right">
                       <div className="text-2xl font-bold text-green-600 dark:text-green-400">
-                        {formatIndianCurrency(group.total_amount)}
+                        {group.formatted_total}
                       </div>
                       <p className="text-sm text-gray-600 dark:text-gray-400">Total</p>
                     </div>
                   </div>
                 </div>
 
-                {/* Expenses List */}
+                {/* Expenses List, loaded when the month is expanded */}
+                {expandedMonths.includes(group.year_month) && (
                 <div className="divide-y divide-gray-200 dark:divide-gray-800">
-                  {group.expenses.map((expense) => (
+                  {(monthExpenses[group.year_month]?.items || []).map((expense) => (
                     <div key={expense.id} className="p-4 sm:p-6 hover:bg-gray-50 dark:hover:bg-gray-800 transition-colors">
                       <div className="flex flex-col gap-4 md:flex-row md:items-center md:justify-between">
                         <div className="flex-1">
@@ -402,7 +447,21 @@ const History: React.FC = () => {
                       </div>
                     </div>
                   ))}
+                  {monthExpenses[group.year_month]?.loading && (
+                    <p className="p-4 text-center text-sm text-gray-500 dark:text-gray-400">Loading expenses...</p>
+                  )}
+                  {monthExpenses[group.year_month]?.next && !monthExpenses[group.year_month]?.loading && (
+                    <div className="p-4 text-center">
+                      <button
+                        onClick={() => loadMonthExpenses(group)}
+                        className="text-sm text-blue-600 dark:text-blue-400 hover:text-blue-800 dark:hover:text-blue-300 font-medium"
+                      >
+                        Load more
+                      </button>
+                    </div>
+                  )}
                 </div>
+                )}
               </div>
             ))}
           </div>
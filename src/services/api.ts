@@ -14,6 +14,9 @@ const getAccessToken = () => localStorage.getItem("auth_token");
 const getRefreshToken = () => localStorage.getItem("refresh_token");
 const setAccessToken = (token: string) => localStorage.setItem("auth_token", token);
 
+// One key per logical create, so a retried request is not applied twice
+const idempotencyHeaders = () => ({ "Idempotency-Key": crypto.randomUUID() });
+
 const clearAuth = () => {
   localStorage.removeItem("auth_token");
   localStorage.removeItem("refresh_token");
@@ -96,16 +99,33 @@ api.interceptors.response.use(
 export const expenseApi = {
   async getExpenses(): Promise<Expense[]> {
     try {
-      const res = await api.get("/expenses/");
-      return res.data;
+      // Follow keyset cursors until the last page
+      const expenses: Expense[] = [];
+      let url: string | null = "/expenses/?page_size=100";
+      while (url) {
+        const res: any = await api.get(url);
+        expenses.push(...(res.data.results || []));
+        url = res.data.next;
+      }
+      return expenses;
     } catch (error: any) {
       console.error("Failed to fetch expenses:", error.response?.data || error.message);
       throw error;
     }
   },
+  async searchExpenses(query: string, pageSize = 20): Promise<Expense[]> {
+    try {
+      // Ranked full-text matches, most relevant first
+      const res = await api.get("/expenses/search/", { params: { q: query, page_size: pageSize } });
+      return res.data.results || [];
+    } catch (error: any) {
+      console.error("Failed to search expenses:", error.response?.data || error.message);
+      throw error;
+    }
+  },
   async createExpense(data: Omit<Expense, "id" | "userId" | "createdAt">): Promise<Expense> {
     try {
-      const res = await api.post("/expenses/", data);
+      const res = await api.post("/expenses/", data, { headers: idempotencyHeaders() });
       toast.success("Expense added!");
       return res.data.expense || res.data;
     } catch (error: any) {
@@ -136,18 +156,49 @@ export const expenseApi = {
       throw error;
     }
   },
-  async getExpensesGroupedByMonth(year?: number, month?: number): Promise<any> {
+  async getExpensesGroupedByMonth(
+    year?: number, month?: number, filters: { search?: string; category?: string } = {}
+  ): Promise<any> {
     try {
+      // Month summaries only; follow `next` until every month is loaded.
+      // `search`/`category` narrow the summaries and each month's expenses_url
       const params: any = {};
       if (year) params.year = year;
       if (month) params.month = month;
-      const res = await api.get("/expenses/monthly_grouped/", { params });
-      return res.data;
+      if (filters.search) params.search = filters.search;
+      if (filters.category) params.category = filters.category;
+      const groups: any[] = [];
+      let res: any = await api.get("/expenses/monthly_grouped/", { params });
+      groups.push(...(res.data.grouped_expenses || []));
+      while (res.data.next) {
+        res = await api.get(res.data.next);
+        groups.push(...(res.data.grouped_expenses || []));
+      }
+      return { grouped_expenses: groups };
     } catch (error: any) {
       console.error("Failed to fetch grouped expenses:", error.response?.data || error.message);
       throw error;
     }
   },
+  async exportExpenses(fileType: "csv" | "xlsx", params: Record<string, string> = {}): Promise<Blob> {
+    try {
+      const res = await api.get(`/expenses/export_${fileType}/`, { params, responseType: "blob" });
+      return res.data;
+    } catch (error: any) {
+      console.error("Failed to export expenses:", error.response?.data || error.message);
+      throw error;
+    }
+  },
+  async getMonthExpenses(url: string, params: Record<string, string> = {}): Promise<{ results: Expense[]; next: string | null }> {
+    try {
+      // `url` is a month's expenses_url or a `next` cursor link
+      const res = await api.get(url, { params });
+      return { results: res.data.results || [], next: res.data.next };
+    } catch (error: any) {
+      console.error("Failed to fetch month expenses:", error.response?.data || error.message);
+      throw error;
+    }
+  },
 };
 
 // ✅ User API
@@ -250,13 +301,17 @@ export const reportsApi = {
 
 // ✅ Notifications API
 export const notificationApi = {
-  async getNotifications() {
-    const res = await api.get("/notifications/");
+  // Pass the previous response's `next` link to load the following page
+  async getNotifications(next?: string) {
+    const res = await api.get(next || "/notifications/");
     return res.data;
   },
   async markAsRead(notificationId: string) {
     await api.post("/notifications/", { notification_id: notificationId });
   },
+  async markAllAsRead() {
+    await api.post("/notifications/", { all: true });
+  },
 };
 
 // ✅ Recurring Expenses API
@@ -294,7 +349,7 @@ export const recurringApi = {
   },
   async createRecurringExpense(data: RecurringExpense): Promise<RecurringExpense> {
     try {
-      const res = await api.post("/recurring/", data);
+      const res = await api.post("/recurring/", data, { headers: idempotencyHeaders() });
       console.log('[RecurringAPI] Created recurring expense:', res.data);
       toast.success("Recurring expense created!");
       // Backend now returns data directly, not wrapped
@@ -341,6 +396,16 @@ export const recurringApi = {
       throw error;
     }
   },
+  // Projected spend per month from active rules; generates nothing
+  async getRecurringProjection(months = 6): Promise<any> {
+    try {
+      const res = await api.get("/recurring/projection/", { params: { months } });
+      return res.data;
+    } catch (error: any) {
+      console.error("Failed to fetch recurring projection:", error.response?.data || error.message);
+      throw error;
+    }
+  },
   async generateRecurringExpenses(): Promise<{ generated_count: number }> {
     try {
       const res = await api.post("/recurring/generate_all_recurring_expenses/");